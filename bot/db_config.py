@@ -12,16 +12,49 @@ DB_NAME = os.getenv("POSTGRES_DB", "leadcore_db")
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Connection pool sizing for bursts of concurrent bot handlers. The async
+# engine already uses AsyncAdaptedQueuePool; only its limits are tuned here.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 40))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 5))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# PgBouncer in transaction pooling mode cannot reuse server-side prepared
+# statements, so asyncpg statement caches must be disabled behind it.
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "").lower() in ("1", "true", "yes")
+# Per-connection cache of named prepared statements (keyed on SQL text).
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 500))
+
 
 # Track process ownership to avoid reusing asyncpg state across Celery prefork workers.
 _ENGINE_PID: int | None = None
 
 
+def _connect_args() -> dict:
+    if DB_PGBOUNCER:
+        return {"prepared_statement_cache_size": 0, "statement_cache_size": 0}
+    return {
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        # JIT compilation only adds planning latency for short OLTP queries.
+        "server_settings": {"jit": "off"},
+    }
+
+
 def _create_engine():
     return create_async_engine(
         DATABASE_URL,
         echo=False,
         pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        # Reuse the most recently returned connection. Connections at the
+        # bottom of the stack then stay unused long enough for the server
+        # idle timeout (or PgBouncer) to close them, instead of every
+        # connection being touched just often enough to stay open.
+        pool_use_lifo=True,
+        connect_args=_connect_args(),
     )
 
 
@@ -1,4 +1,6 @@
+import datetime
 import logging
+from functools import lru_cache
 
 from aiogram import F, Router
 from aiogram.filters import Command
@@ -12,20 +14,41 @@ import config
 from bot.models.lead import Lead
 from bot.models.pain import PainCluster
 from bot.models.program import Program
+from bot.models.stats import STATS_SNAPSHOT_ID, StatsSnapshot
 from bot.models.user import User
-from bot.services.subscription import activate_paid_subscription, normalize_subscription
+from bot.services import user_cache
+from bot.services.stats import STATS_REFRESH_INTERVAL
+from bot.services.subscription import (
+    PAID_PERIODS_MONTHS,
+    activate_paid_subscription,
+    normalize_subscription,
+)
 from bot.states import AdminPanel
 from bot.ui.main_menu import get_main_menu_keyboard
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+_USER_PROGRAMS_LIMIT = 30
+
+_DASHBOARD_TMPL = (
+    "📊 Админка LeadCore\n"
+    "━━━━━━━━━━━━━━━━━━━━━\n\n"
+    "👥 Пользователи: {total_users}\n"
+    "├ С подпиской: {paid_users}\n"
+    "└ Без подписки: {free_users}\n\n"
+    "📋 Программы: {total_programs}\n"
+    "🎯 Лиды: {total_leads}\n"
+    "📁 Кластеры: {total_clusters}\n\n"
+    "🕒 Данные на {updated_at:%d.%m.%Y %H:%M} UTC"
+)
+
 
 def _is_admin(telegram_id: int) -> bool:
     return telegram_id in config.ADMIN_TELEGRAM_IDS
 
 
-def _admin_menu_keyboard() -> object:
+def _build_admin_menu_keyboard() -> object:
     builder = InlineKeyboardBuilder()
     builder.button(text="🔄 Обновить", callback_data="admin_panel")
     builder.button(text="🔎 Найти пользователя", callback_data="admin_find_user")
@@ -34,6 +57,22 @@ def _admin_menu_keyboard() -> object:
     return builder.as_markup()
 
 
+def _build_admin_back_keyboard() -> object:
+    builder = InlineKeyboardBuilder()
+    builder.button(text="◀️ К админке", callback_data="admin_panel")
+    builder.adjust(1)
+    return builder.as_markup()
+
+
+_ADMIN_MENU_MARKUP = _build_admin_menu_keyboard()
+_ADMIN_BACK_MARKUP = _build_admin_back_keyboard()
+
+
+def _admin_menu_keyboard() -> object:
+    return _ADMIN_MENU_MARKUP
+
+
+@lru_cache(maxsize=4096)
 def _admin_user_card_keyboard(user_id: int) -> object:
     builder = InlineKeyboardBuilder()
     builder.button(text="➕ 1 мес", callback_data=f"admin_grant_1m_{user_id}")
@@ -46,25 +85,61 @@ def _admin_user_card_keyboard(user_id: int) -> object:
     return builder.as_markup()
 
 
+async def _load_dashboard_stats(
+    session: AsyncSession,
+) -> tuple[tuple[int, ...], datetime.datetime]:
+    """Read totals from the periodically refreshed snapshot row.
+
+    Falls back to live COUNT queries if the snapshot has not been seeded yet.
+
+    Returns:
+        The totals and the UTC time they were counted at.
+    """
+    snapshot = await session.get(StatsSnapshot, STATS_SNAPSHOT_ID)
+    if snapshot and snapshot.updated_at:
+        return (
+            (
+                snapshot.total_users,
+                snapshot.paid_users,
+                snapshot.total_programs,
+                snapshot.total_leads,
+                snapshot.total_clusters,
+            ),
+            snapshot.updated_at,
+        )
+
+    stats_query = select(
+        func.count(User.telegram_id),
+        func.count(User.telegram_id).filter(User.subscription_type == "paid"),
+        select(func.count(Program.id)).scalar_subquery(),
+        select(func.count(Lead.id)).scalar_subquery(),
+        select(func.count(PainCluster.id)).scalar_subquery(),
+    )
+    totals = tuple((await session.execute(stats_query)).one())
+    return totals, datetime.datetime.now(datetime.timezone.utc)
+
+
 async def _render_admin_dashboard(session: AsyncSession) -> str:
-    total_users = (await session.execute(select(func.count(User.telegram_id)))).scalar_one()
-    paid_users = (
-        await session.execute(select(func.count(User.telegram_id)).where(User.subscription_type == "paid"))
-    ).scalar_one()
-    free_users = total_users - paid_users
-    total_programs = (await session.execute(select(func.count(Program.id)))).scalar_one()
-    total_leads = (await session.execute(select(func.count(Lead.id)))).scalar_one()
-    total_clusters = (await session.execute(select(func.count(PainCluster.id)))).scalar_one()
-
-    return (
-        "📊 Админка LeadCore\n"
-        "━━━━━━━━━━━━━━━━━━━━━\n\n"
-        f"👥 Пользователи: {total_users}\n"
-        f"├ С подпиской: {paid_users}\n"
-        f"└ Без подписки: {free_users}\n\n"
-        f"📋 Программы: {total_programs}\n"
-        f"🎯 Лиды: {total_leads}\n"
-        f"📁 Кластеры: {total_clusters}"
+    """Render dashboard text from the stats snapshot, stamped with its age."""
+    (
+        (
+            total_users,
+            paid_users,
+            total_programs,
+            total_leads,
+            total_clusters,
+        ),
+        updated_at,
+    ) = await _load_dashboard_stats(session)
+
+    return _DASHBOARD_TMPL.format(
+        total_users=total_users,
+        paid_users=paid_users,
+        free_users=total_users - paid_users,
+        total_programs=total_programs,
+        total_leads=total_leads,
+        total_clusters=total_clusters,
+        updated_at=updated_at,
     )
 
 
@@ -89,6 +164,12 @@ async def admin_panel_callback(
         return
     await state.clear()
     text = await _render_admin_dashboard(session)
+    # Telegram rejects edits that do not change the message; skip the call.
+    if callback.message.text == text:
+        await callback.answer(
+            f"Статистика пересчитывается раз в {STATS_REFRESH_INTERVAL // 60} мин."
+        )
+        return
     await callback.message.edit_text(text, reply_markup=_admin_menu_keyboard())
     await callback.answer()
 
@@ -99,12 +180,9 @@ async def admin_find_user(callback: CallbackQuery, state: FSMContext) -> None:
         await callback.answer()
         return
     await state.set_state(AdminPanel.waiting_user_query)
-    builder = InlineKeyboardBuilder()
-    builder.button(text="◀️ К админке", callback_data="admin_panel")
-    builder.adjust(1)
     await callback.message.edit_text(
         "🔎 Введите @username или telegram_id пользователя.",
-        reply_markup=builder.as_markup(),
+        reply_markup=_ADMIN_BACK_MARKUP,
     )
     await callback.answer()
 
@@ -127,23 +205,26 @@ async def admin_find_user_input(
         user = await session.get(User, int(query_raw))
     else:
         username = query_raw.lstrip("@")
-        user = (
-            await session.execute(select(User).where(User.username == username))
-        ).scalars().first()
+        user = await session.scalar(
+            select(User).where(User.username == username).limit(1)
+        )
 
     if not user:
         await message.answer("Пользователь не найден.")
         return
 
-    normalize_subscription(user)
-    await session.commit()
+    if normalize_subscription(user):
+        await session.commit()
 
-    program_count = (
-        await session.execute(select(func.count(Program.id)).where(Program.user_id == user.telegram_id))
-    ).scalar_one()
-    lead_count = (
-        await session.execute(select(func.count(Lead.id)).where(Lead.user_id == user.telegram_id))
-    ).scalar_one()
+    counts_query = select(
+        select(func.count(Program.id))
+        .where(Program.user_id == user.telegram_id)
+        .scalar_subquery(),
+        select(func.count(Lead.id))
+        .where(Lead.user_id == user.telegram_id)
+        .scalar_subquery(),
+    )
+    program_count, lead_count = (await session.execute(counts_query)).one()
 
     sub_status = user.subscription_type
     if user.subscription_type == "paid" and user.subscription_expires_at:
@@ -167,13 +248,14 @@ async def admin_grant_subscription(
     if not _is_admin(callback.from_user.id):
         await callback.answer()
         return
-    parts = callback.data.split("_")
-    if len(parts) != 4:
+    period_key, _, user_id_raw = (
+        callback.data.removeprefix("admin_grant_").rpartition("_")
+    )
+    if period_key not in PAID_PERIODS_MONTHS:
         await callback.answer("Некорректная команда.", show_alert=True)
         return
-    period_key = parts[2]
     try:
-        target_user_id = int(parts[3])
+        target_user_id = int(user_id_raw)
     except ValueError:
         await callback.answer("Некорректный user_id.", show_alert=True)
         return
@@ -185,6 +267,7 @@ async def admin_grant_subscription(
 
     expires_at = activate_paid_subscription(user, period_key)
     await session.commit()
+    user_cache.invalidate(target_user_id)
     await callback.answer(
         f"✅ Подписка продлена до {expires_at.strftime('%d.%m.%Y')}",
         show_alert=True,
@@ -199,24 +282,30 @@ async def admin_user_programs(
         await callback.answer()
         return
     try:
-        user_id = int(callback.data.split("_")[-1])
+        user_id = int(callback.data.rpartition("_")[2])
     except ValueError:
         await callback.answer("Некорректный user_id.", show_alert=True)
         return
 
     programs = (
         await session.execute(
-            select(Program)
+            select(
+                Program.id,
+                Program.name,
+                Program.min_score,
+                Program.auto_collect_enabled,
+            )
             .where(Program.user_id == user_id)
             .order_by(Program.id)
+            .limit(_USER_PROGRAMS_LIMIT)
         )
-    ).scalars().all()
+    ).all()
     if not programs:
         await callback.answer("У пользователя нет программ.", show_alert=True)
         return
 
     lines = [f"📋 Программы пользователя {user_id}\n"]
-    for p in programs[:30]:
+    for p in programs:
         status = "вкл" if p.auto_collect_enabled else "выкл"
         lines.append(
             f"• #{p.id} {p.name} | скор≥{p.min_score} | автосбор: {status}"
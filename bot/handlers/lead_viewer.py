@@ -1,30 +1,60 @@
 import logging
+import re
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import bindparam, func, select, update
 
 from bot.models.lead import Lead
+from bot.models.program import Program
 from bot.ui.lead_card import format_lead_card, get_lead_navigation_keyboard, get_lead_card_keyboard
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+_LEAD_NOT_FOUND = "Лид не найден."
+
+# Only the columns the lead card and its keyboard read; rows skip ORM hydration.
+_LEAD_CARD_COLUMNS = (
+    Lead.id,
+    Lead.status,
+    Lead.telegram_username,
+    Lead.qualification_score,
+    Lead.business_summary,
+    Lead.pains_summary,
+    Lead.solution_idea,
+    Lead.recommended_message,
+    Lead.raw_qualification_data,
+    Lead.raw_user_profile_data,
+    Program.name.label("program_name"),
+)
+
+# Built once so every click sends identical SQL text, letting asyncpg reuse
+# its cached prepared statement instead of re-parsing. Bind names must not
+# match column names, which UPDATE reserves for its SET clause.
+_UPDATE_LEAD_STATUS = (
+    update(Lead)
+    .where(Lead.id == bindparam("b_lead_id"), Lead.user_id == bindparam("b_user_id"))
+    .values(status=bindparam("b_status"))
+    .execution_options(synchronize_session=False)
+)
+
+# One compiled alternation replaces a chain of per-handler startswith filters.
+_CALLBACK_PREFIX_RE = re.compile(
+    r"(view_program_leads|lead_page|lead_contacted|lead_skipped|lead_restore)_"
+)
+
 
-@router.callback_query(F.data.startswith("view_program_leads_"))
 async def view_program_leads_handler(callback: CallbackQuery, session: AsyncSession):
     """Shows the first lead in paginated view."""
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data.rpartition("_")[2])
     await show_lead_page(callback, session, program_id, page=0, edit=False)
 
 
-@router.callback_query(F.data.startswith("lead_page_"))
 async def lead_page_navigation_handler(callback: CallbackQuery, session: AsyncSession):
     """Handles pagination navigation between leads."""
-    parts = callback.data.split("_")
-    program_id = int(parts[2])
-    page = int(parts[3])
+    program_id, _, page = callback.data.removeprefix("lead_page_").partition("_")
+    program_id, page = int(program_id), int(page)
     await show_lead_page(callback, session, program_id, page, edit=True)
 
 
@@ -38,29 +68,38 @@ async def show_lead_page(
     """Shows a specific lead page."""
     logger.info(f"Showing lead page {page} for program_id={program_id}")
 
-    query = (
-        select(Lead)
-        .where(
-            Lead.program_id == program_id,
-            Lead.user_id == callback.from_user.id,
-        )
-        .options(selectinload(Lead.program))
-        .order_by(Lead.created_at.desc())
+    lead_filter = (
+        Lead.program_id == program_id,
+        Lead.user_id == callback.from_user.id,
+    )
+    total_leads = await session.scalar(
+        select(func.count(Lead.id)).where(*lead_filter)
     )
-    leads = (await session.execute(query)).scalars().all()
 
-    if not leads:
+    if not total_leads:
         await callback.answer("Для этой программы лиды еще не найдены.", show_alert=True)
         return
 
-    total_leads = len(leads)
-
     if page < 0 or page >= total_leads:
         await callback.answer("Неверная страница.", show_alert=True)
         return
 
-    lead = leads[page]
-    card_text = format_lead_card(lead, page + 1, total_leads)
+    query = (
+        select(*_LEAD_CARD_COLUMNS)
+        .outerjoin(Program, Lead.program_id == Program.id)
+        .where(*lead_filter)
+        .order_by(Lead.created_at.desc(), Lead.id.desc())
+        .offset(page)
+        .limit(1)
+    )
+    lead = (await session.execute(query)).first()
+    if not lead:
+        await callback.answer("Неверная страница.", show_alert=True)
+        return
+
+    card_text = format_lead_card(
+        lead, page + 1, total_leads, program_name=lead.program_name
+    )
     keyboard = get_lead_navigation_keyboard(
         program_id, page, total_leads, lead.id, lead.status
     )
@@ -78,62 +117,79 @@ async def show_lead_page(
 
 # --- Outreach status handlers ---
 
-@router.callback_query(F.data.startswith("lead_contacted_"))
 async def mark_lead_contacted(callback: CallbackQuery, session: AsyncSession):
     """Marks a lead as contacted."""
-    lead_id = int(callback.data.split("_")[-1])
-    lead = await _get_lead(session, lead_id, callback.from_user.id)
-    if lead:
-        lead.status = "contacted"
-        await session.commit()
-        await callback.message.edit_reply_markup(
-            reply_markup=get_lead_card_keyboard(lead_id, "contacted")
-        )
+    lead_id = int(callback.data.rpartition("_")[2])
+    if not await _set_lead_status(session, lead_id, callback.from_user.id, "contacted"):
+        await callback.answer(_LEAD_NOT_FOUND, show_alert=True)
+        return
+    await callback.message.edit_reply_markup(
+        reply_markup=get_lead_card_keyboard(lead_id, "contacted")
+    )
     await callback.answer("✅ Отмечено: написал!", show_alert=False)
 
 
-@router.callback_query(F.data.startswith("lead_skipped_"))
 async def mark_lead_skipped(callback: CallbackQuery, session: AsyncSession):
     """Marks a lead as skipped."""
-    lead_id = int(callback.data.split("_")[-1])
-    lead = await _get_lead(session, lead_id, callback.from_user.id)
-    if lead:
-        lead.status = "skipped"
-        await session.commit()
-        await callback.message.edit_reply_markup(
-            reply_markup=get_lead_card_keyboard(lead_id, "skipped")
-        )
+    lead_id = int(callback.data.rpartition("_")[2])
+    if not await _set_lead_status(session, lead_id, callback.from_user.id, "skipped"):
+        await callback.answer(_LEAD_NOT_FOUND, show_alert=True)
+        return
+    await callback.message.edit_reply_markup(
+        reply_markup=get_lead_card_keyboard(lead_id, "skipped")
+    )
     await callback.answer("❌ Пропущен", show_alert=False)
 
 
-@router.callback_query(F.data.startswith("lead_restore_"))
 async def restore_lead(callback: CallbackQuery, session: AsyncSession):
     """Restores a skipped lead back to new."""
-    lead_id = int(callback.data.split("_")[-1])
-    lead = await _get_lead(session, lead_id, callback.from_user.id)
-    if lead:
-        lead.status = "new"
-        await session.commit()
-        await callback.message.edit_reply_markup(
-            reply_markup=get_lead_card_keyboard(lead_id, "new")
-        )
+    lead_id = int(callback.data.rpartition("_")[2])
+    if not await _set_lead_status(session, lead_id, callback.from_user.id, "new"):
+        await callback.answer(_LEAD_NOT_FOUND, show_alert=True)
+        return
+    await callback.message.edit_reply_markup(
+        reply_markup=get_lead_card_keyboard(lead_id, "new")
+    )
     await callback.answer("↩️ Возвращён в очередь", show_alert=False)
 
 
+_PREFIX_HANDLERS = {
+    "view_program_leads": view_program_leads_handler,
+    "lead_page": lead_page_navigation_handler,
+    "lead_contacted": mark_lead_contacted,
+    "lead_skipped": mark_lead_skipped,
+    "lead_restore": restore_lead,
+}
+
+
+@router.callback_query(F.data.regexp(_CALLBACK_PREFIX_RE).as_("prefix_match"))
+async def lead_callback_dispatcher(
+    callback: CallbackQuery, session: AsyncSession, prefix_match: re.Match
+) -> None:
+    """Routes lead viewer callbacks to their handler by callback_data prefix."""
+    await _PREFIX_HANDLERS[prefix_match.group(1)](callback, session)
+
+
 @router.callback_query(F.data == "noop")
 async def noop_handler(callback: CallbackQuery):
     """Handles the page counter button (does nothing)."""
     await callback.answer()
 
 
-async def _get_lead(
-    session: AsyncSession, lead_id: int, user_id: int
-) -> Lead | None:
-    """Helper to fetch a lead by id."""
+async def _set_lead_status(
+    session: AsyncSession, lead_id: int, user_id: int, status: str
+) -> bool:
+    """Updates the status of a user's lead with a single UPDATE.
+
+    The owner filter doubles as the authorization check, so no SELECT is
+    needed beforehand.
+
+    Returns:
+        True if the lead exists and belongs to the user, otherwise False.
+    """
     result = await session.execute(
-        select(Lead).where(
-            Lead.id == lead_id,
-            Lead.user_id == user_id,
-        )
+        _UPDATE_LEAD_STATUS,
+        {"b_lead_id": lead_id, "b_user_id": user_id, "b_status": status},
     )
-    return result.scalars().first()
+    await session.commit()
+    return result.rowcount > 0
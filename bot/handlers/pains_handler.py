@@ -8,9 +8,11 @@ from sqlalchemy import select, func, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.models.pain import Pain, PainCluster, GeneratedPost
+from bot.models.program import Program
+from bot.services import program_cache
 from bot.ui.main_menu import get_main_menu_keyboard, get_main_menu_text
 from bot.ui.pains_menu import (
-    cluster_score,
+    cluster_score_expr,
     format_pains_summary,
     format_top_pains,
     format_cluster_detail,
@@ -23,6 +25,7 @@ from bot.ui.pains_menu import (
     get_drafts_list_keyboard,
     get_quotes_keyboard,
 )
+from modules.content_generator import generate_post
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -38,10 +41,23 @@ _UNIFIED_POST_TYPE = "single"
 async def _safe_edit_text(
     callback: CallbackQuery, text: str, **kwargs
 ) -> None:
-    """Edit callback message and ignore duplicate-content edit errors."""
+    """Edit callback message, skipping edits that would change nothing.
+
+    The callback carries the message as currently shown, so an identical
+    text and keyboard is detected locally instead of paying a Bot API
+    round-trip just to get "message is not modified" back.
+    """
     if not callback.message:
         return
 
+    if (
+        callback.message.text == text
+        and getattr(callback.message, "reply_markup", None)
+        == kwargs.get("reply_markup")
+    ):
+        logger.debug("Skip edit_text: content is unchanged")
+        return
+
     try:
         await callback.message.edit_text(text, **kwargs)
     except TelegramBadRequest as e:
@@ -58,16 +74,73 @@ async def _get_program_ids_for_user(
 
     `owner_chat_id` is currently used as the auto-collection toggle marker.
     Disabled schedules set it to NULL, but programs still exist and must remain
-    available in this section.
+    available in this section. Results are cached briefly per user.
     """
-    from bot.models.program import Program
+    return await program_cache.get_program_ids(user_id, session)
 
-    result = await session.execute(
-        select(Program.id)
+
+async def _get_owned_cluster(
+    cluster_id: int, user_id: int, session: AsyncSession
+) -> PainCluster | None:
+    """Return the cluster if it belongs to one of the user's programs."""
+    return await session.scalar(
+        select(PainCluster)
+        .join(Program, PainCluster.program_id == Program.id)
+        .where(PainCluster.id == cluster_id, Program.user_id == user_id)
+    )
+
+
+async def _load_pains_summary(
+    user_id: int, session: AsyncSession
+) -> tuple[int, int, int, int]:
+    """Return (programs, pains, clusters, posts) counts in one round-trip.
+
+    A single statement beats gathering three queries on separate pooled
+    sessions: the injected AsyncSession cannot serve concurrent awaits, and
+    one round-trip holds one connection instead of three.
+    """
+    owned_program_ids = select(Program.id).where(Program.user_id == user_id)
+    query = select(
+        select(func.count(Program.id))
         .where(Program.user_id == user_id)
-        .order_by(Program.id)
+        .scalar_subquery(),
+        select(func.count(Pain.id))
+        .where(Pain.program_id.in_(owned_program_ids))
+        .scalar_subquery(),
+        select(func.count(PainCluster.id))
+        .where(PainCluster.program_id.in_(owned_program_ids))
+        .scalar_subquery(),
+        select(func.count(GeneratedPost.id))
+        .join(PainCluster, GeneratedPost.cluster_id == PainCluster.id)
+        .where(PainCluster.program_id.in_(owned_program_ids))
+        .scalar_subquery(),
     )
-    return [row[0] for row in result.all()]
+    return tuple((await session.execute(query)).one())
+
+
+async def _load_ranked_clusters_page(
+    program_ids: list[int], page: int, session: AsyncSession
+) -> tuple[list[PainCluster], int, int, int]:
+    """Return (clusters, page, total_pages, total) for one ranked page.
+
+    Ranking and slicing run in SQL so only `_CLUSTERS_PAGE_SIZE` rows are
+    loaded; the requested page is clamped to the available range.
+    """
+    owned = PainCluster.program_id.in_(program_ids)
+    total = await session.scalar(select(func.count(PainCluster.id)).where(owned))
+    if not total:
+        return [], 0, 1, 0
+
+    total_pages = (total + _CLUSTERS_PAGE_SIZE - 1) // _CLUSTERS_PAGE_SIZE
+    page = max(0, min(page, total_pages - 1))
+    clusters = await session.scalars(
+        select(PainCluster)
+        .where(owned)
+        .order_by(cluster_score_expr().desc(), PainCluster.id)
+        .offset(page * _CLUSTERS_PAGE_SIZE)
+        .limit(_CLUSTERS_PAGE_SIZE)
+    )
+    return list(clusters.all()), page, total_pages, total
 
 
 # --- Main Pains Menu ---
@@ -75,9 +148,11 @@ async def _get_program_ids_for_user(
 @router.callback_query(F.data == "pains_menu")
 async def pains_menu_handler(callback: CallbackQuery, session: AsyncSession) -> None:
     """Display the Pains & Content main screen with aggregate stats."""
-    program_ids = await _get_program_ids_for_user(callback.from_user.id, session)
+    total_programs, total_pains, total_clusters, total_posts = (
+        await _load_pains_summary(callback.from_user.id, session)
+    )
 
-    if not program_ids:
+    if not total_programs:
         await _safe_edit_text(callback, 
             "У вас нет программ. Создайте программу, чтобы начать сбор болей.",
             reply_markup=get_main_menu_keyboard(callback.from_user.language_code),
@@ -85,28 +160,6 @@ async def pains_menu_handler(callback: CallbackQuery, session: AsyncSession) ->
         await callback.answer()
         return
 
-    total_pains = (
-        await session.execute(
-            select(func.count(Pain.id)).where(Pain.program_id.in_(program_ids))
-        )
-    ).scalar_one()
-
-    total_clusters = (
-        await session.execute(
-            select(func.count(PainCluster.id)).where(
-                PainCluster.program_id.in_(program_ids)
-            )
-        )
-    ).scalar_one()
-
-    total_posts = (
-        await session.execute(
-            select(func.count(GeneratedPost.id))
-            .join(PainCluster, GeneratedPost.cluster_id == PainCluster.id)
-            .where(PainCluster.program_id.in_(program_ids))
-        )
-    ).scalar_one()
-
     text = format_pains_summary(total_pains, total_clusters, total_posts)
     await _safe_edit_text(callback, text, reply_markup=get_pains_menu_keyboard())
     await callback.answer()
@@ -131,13 +184,11 @@ async def top_pains_handler(callback: CallbackQuery, session: AsyncSession) -> N
         await callback.answer()
         return
 
-    clusters_result = await session.execute(
-        select(PainCluster).where(PainCluster.program_id.in_(program_ids))
+    page_clusters, page, total_pages, total = await _load_ranked_clusters_page(
+        program_ids, page, session
     )
-    clusters = clusters_result.scalars().all()
-    ranked = sorted(clusters, key=cluster_score, reverse=True)
 
-    if not ranked:
+    if not page_clusters:
         text = format_top_pains([])
         await _safe_edit_text(callback, 
             text,
@@ -147,12 +198,6 @@ async def top_pains_handler(callback: CallbackQuery, session: AsyncSession) -> N
         await callback.answer()
         return
 
-    total = len(ranked)
-    total_pages = (total + _CLUSTERS_PAGE_SIZE - 1) // _CLUSTERS_PAGE_SIZE
-    page = max(0, min(page, total_pages - 1))
-    start = page * _CLUSTERS_PAGE_SIZE
-    page_clusters = ranked[start : start + _CLUSTERS_PAGE_SIZE]
-
     text = format_top_pains(
         page_clusters,
         page=page,
@@ -176,23 +221,16 @@ async def cluster_detail_handler(callback: CallbackQuery, session: AsyncSession)
     """Show detail view of a single pain cluster with sample quotes."""
     cluster_id = int(callback.data.split("_")[-1])
 
-    program_ids = await _get_program_ids_for_user(callback.from_user.id, session)
-    cluster = (
-        await session.execute(
-            select(PainCluster).where(
-                PainCluster.id == cluster_id,
-                PainCluster.program_id.in_(program_ids),
-            )
-        )
-    ).scalars().first()
+    cluster = await _get_owned_cluster(cluster_id, callback.from_user.id, session)
     if not cluster:
         await callback.answer("Кластер не найден.", show_alert=True)
         return
 
-    sample_pains_result = await session.execute(
-        select(Pain).where(Pain.cluster_id == cluster_id).limit(3)
-    )
-    sample_pains = sample_pains_result.scalars().all()
+    sample_pains = (
+        await session.scalars(
+            select(Pain).where(Pain.cluster_id == cluster_id).limit(3)
+        )
+    ).all()
 
     text = format_cluster_detail(cluster, sample_pains)
     await _safe_edit_text(callback, 
@@ -212,32 +250,35 @@ async def cluster_quotes_handler(callback: CallbackQuery, session: AsyncSession)
     cluster_id = int(parts[2])
     page = int(parts[3]) if len(parts) > 3 else 0
 
-    program_ids = await _get_program_ids_for_user(callback.from_user.id, session)
-    cluster = (
-        await session.execute(
-            select(PainCluster).where(
-                PainCluster.id == cluster_id,
-                PainCluster.program_id.in_(program_ids),
-            )
-        )
-    ).scalars().first()
+    cluster = await _get_owned_cluster(cluster_id, callback.from_user.id, session)
     if not cluster:
         await callback.answer("Кластер не найден.", show_alert=True)
         return
 
-    pains_result = await session.execute(
-        select(Pain).where(Pain.cluster_id == cluster_id)
+    total = await session.scalar(
+        select(func.count(Pain.id)).where(Pain.cluster_id == cluster_id)
     )
-    pains = pains_result.scalars().all()
 
-    if not pains:
+    if not total:
         await callback.answer("Нет цитат для этого кластера.", show_alert=True)
         return
 
-    total_pages = (len(pains) + _QUOTES_PAGE_SIZE - 1) // _QUOTES_PAGE_SIZE
+    total_pages = (total + _QUOTES_PAGE_SIZE - 1) // _QUOTES_PAGE_SIZE
     page = max(0, min(page, total_pages - 1))
 
-    text = format_quotes_page(cluster, pains, page, _QUOTES_PAGE_SIZE)
+    pains = (
+        await session.scalars(
+            select(Pain)
+            .where(Pain.cluster_id == cluster_id)
+            .order_by(Pain.id)
+            .offset(page * _QUOTES_PAGE_SIZE)
+            .limit(_QUOTES_PAGE_SIZE)
+        )
+    ).all()
+
+    text = format_quotes_page(
+        cluster, pains, page, _QUOTES_PAGE_SIZE, total=total
+    )
     await _safe_edit_text(callback, 
         text,
         reply_markup=get_quotes_keyboard(cluster_id, page, total_pages),
@@ -269,13 +310,11 @@ async def generate_post_menu_handler(
         await callback.answer()
         return
 
-    clusters_result = await session.execute(
-        select(PainCluster).where(PainCluster.program_id.in_(program_ids))
+    page_clusters, page, total_pages, total = await _load_ranked_clusters_page(
+        program_ids, page, session
     )
-    clusters = clusters_result.scalars().all()
-    ranked = sorted(clusters, key=cluster_score, reverse=True)
 
-    if not ranked:
+    if not page_clusters:
         await _safe_edit_text(callback, 
             "Нет кластеров для генерации поста. Запустите программу сначала.",
             reply_markup=get_pains_menu_keyboard(),
@@ -283,12 +322,6 @@ async def generate_post_menu_handler(
         await callback.answer()
         return
 
-    total = len(ranked)
-    total_pages = (total + _CLUSTERS_PAGE_SIZE - 1) // _CLUSTERS_PAGE_SIZE
-    page = max(0, min(page, total_pages - 1))
-    start = page * _CLUSTERS_PAGE_SIZE
-    page_clusters = ranked[start : start + _CLUSTERS_PAGE_SIZE]
-
     text = (
         "✍️ Выберите кластер для генерации поста:\n\n"
         + format_top_pains(
@@ -315,26 +348,16 @@ async def generate_post_choose_type(
     """Generate post for a specific cluster using unified single post type."""
     await callback.answer()
     cluster_id = int(callback.data.split("_")[-1])
-    program_ids = await _get_program_ids_for_user(callback.from_user.id, session)
-    cluster = (
-        await session.execute(
-            select(PainCluster).where(
-                PainCluster.id == cluster_id,
-                PainCluster.program_id.in_(program_ids),
-            )
-        )
-    ).scalars().first()
+    cluster = await _get_owned_cluster(cluster_id, callback.from_user.id, session)
     if not cluster:
         await callback.answer("Кластер не найден.", show_alert=True)
         return
 
     await _safe_edit_text(callback, "⏳ Генерирую черновик поста...")
 
-    from modules.content_generator import generate_post
-
     try:
         post = await generate_post(
-            cluster_id, session, post_type=_UNIFIED_POST_TYPE
+            cluster_id, session, post_type=_UNIFIED_POST_TYPE, cluster=cluster
         )
     except Exception as e:
         logger.error(f"Content generation failed for cluster_id={cluster_id}: {e}")
@@ -366,26 +389,16 @@ async def generate_post_execute(
     parts = callback.data.split("_")
     cluster_id = int(parts[2])
 
-    program_ids = await _get_program_ids_for_user(callback.from_user.id, session)
-    cluster = (
-        await session.execute(
-            select(PainCluster).where(
-                PainCluster.id == cluster_id,
-                PainCluster.program_id.in_(program_ids),
-            )
-        )
-    ).scalars().first()
+    cluster = await _get_owned_cluster(cluster_id, callback.from_user.id, session)
     if not cluster:
         await callback.answer("Кластер не найден.", show_alert=True)
         return
 
     await _safe_edit_text(callback, "⏳ Генерирую черновик поста...")
 
-    from modules.content_generator import generate_post
-
     try:
         post = await generate_post(
-            cluster_id, session, post_type=_UNIFIED_POST_TYPE
+            cluster_id, session, post_type=_UNIFIED_POST_TYPE, cluster=cluster
         )
     except Exception as e:
         logger.error(f"Content generation failed for cluster_id={cluster_id}: {e}")
@@ -420,15 +433,14 @@ async def my_drafts_handler(callback: CallbackQuery, session: AsyncSession) -> N
         await callback.answer()
         return
 
-    posts_result = await session.execute(
-        select(GeneratedPost)
+    owned = PainCluster.program_id.in_(program_ids)
+    total = await session.scalar(
+        select(func.count(GeneratedPost.id))
         .join(PainCluster, GeneratedPost.cluster_id == PainCluster.id)
-        .where(PainCluster.program_id.in_(program_ids))
-        .order_by(GeneratedPost.generated_at.desc())
+        .where(owned)
     )
-    posts = posts_result.scalars().all()
 
-    if not posts:
+    if not total:
         await _safe_edit_text(callback, 
             "📝 Черновики\n\nПока нет черновиков. Сгенерируйте первый пост!",
             reply_markup=get_pains_menu_keyboard(),
@@ -436,14 +448,26 @@ async def my_drafts_handler(callback: CallbackQuery, session: AsyncSession) -> N
         await callback.answer()
         return
 
-    total = len(posts)
     total_pages = (total + _DRAFTS_PAGE_SIZE - 1) // _DRAFTS_PAGE_SIZE
     page = max(0, min(page, total_pages - 1))
 
+    posts = (
+        await session.scalars(
+            select(GeneratedPost)
+            .join(PainCluster, GeneratedPost.cluster_id == PainCluster.id)
+            .where(owned)
+            .order_by(GeneratedPost.generated_at.desc(), GeneratedPost.id.desc())
+            .offset(page * _DRAFTS_PAGE_SIZE)
+            .limit(_DRAFTS_PAGE_SIZE)
+        )
+    ).all()
+
     text = f"📝 Черновики ({total} шт.)\n\nВыберите черновик для просмотра:"
     await _safe_edit_text(callback, 
         text,
-        reply_markup=get_drafts_list_keyboard(posts, page, _DRAFTS_PAGE_SIZE),
+        reply_markup=get_drafts_list_keyboard(
+            posts, page, _DRAFTS_PAGE_SIZE, total=total
+        ),
     )
     await callback.answer()
 
@@ -455,28 +479,22 @@ async def view_draft_handler(callback: CallbackQuery, session: AsyncSession) ->
     """Show full text of a draft post."""
     post_id = int(callback.data.split("_")[-1])
 
-    program_ids = await _get_program_ids_for_user(callback.from_user.id, session)
-    post = (
+    row = (
         await session.execute(
-            select(GeneratedPost)
+            select(GeneratedPost, PainCluster.name)
             .join(PainCluster, GeneratedPost.cluster_id == PainCluster.id)
+            .join(Program, PainCluster.program_id == Program.id)
             .where(
                 GeneratedPost.id == post_id,
-                PainCluster.program_id.in_(program_ids),
+                Program.user_id == callback.from_user.id,
             )
         )
-    ).scalars().first()
-    if not post:
+    ).first()
+    if not row:
         await callback.answer("Черновик не найден.", show_alert=True)
         return
 
-    cluster = (
-        await session.execute(
-            select(PainCluster).where(PainCluster.id == post.cluster_id)
-        )
-    ).scalars().first()
-    cluster_name = cluster.name if cluster else "Неизвестный кластер"
-
+    post, cluster_name = row
     text = format_draft(post, cluster_name)
     await _safe_edit_text(callback, 
         text,
@@ -492,25 +510,16 @@ async def regen_post_handler(callback: CallbackQuery, session: AsyncSession) ->
     """Regenerate a draft post for cluster in unified mode."""
     await callback.answer()
     cluster_id = int(callback.data.split("_")[-1])
-    program_ids = await _get_program_ids_for_user(callback.from_user.id, session)
-    cluster = (
-        await session.execute(
-            select(PainCluster).where(
-                PainCluster.id == cluster_id,
-                PainCluster.program_id.in_(program_ids),
-            )
-        )
-    ).scalars().first()
+    cluster = await _get_owned_cluster(cluster_id, callback.from_user.id, session)
     if not cluster:
         await callback.answer("Кластер не найден.", show_alert=True)
         return
 
     await _safe_edit_text(callback, "⏳ Перегенерирую черновик поста...")
-    from modules.content_generator import generate_post
 
     try:
         post = await generate_post(
-            cluster_id, session, post_type=_UNIFIED_POST_TYPE
+            cluster_id, session, post_type=_UNIFIED_POST_TYPE, cluster=cluster
         )
     except Exception as e:
         logger.error(
@@ -532,10 +541,24 @@ async def regen_post_handler(callback: CallbackQuery, session: AsyncSession) ->
 
 @router.callback_query(F.data.startswith("delete_draft_"))
 async def delete_draft_handler(callback: CallbackQuery, session: AsyncSession) -> None:
-    """Delete a draft post."""
+    """Delete a draft post owned by the caller."""
     post_id = int(callback.data.split("_")[-1])
-    await session.execute(delete(GeneratedPost).where(GeneratedPost.id == post_id))
+    owned_cluster_ids = (
+        select(PainCluster.id)
+        .join(Program, PainCluster.program_id == Program.id)
+        .where(Program.user_id == callback.from_user.id)
+    )
+    result = await session.execute(
+        delete(GeneratedPost).where(
+            GeneratedPost.id == post_id,
+            GeneratedPost.cluster_id.in_(owned_cluster_ids),
+        )
+    )
     await session.commit()
+    if not result.rowcount:
+        await callback.answer("Черновик не найден.", show_alert=True)
+        return
+
     await callback.answer("🗑 Черновик удалён.")
     await my_drafts_handler(callback, session)
 
@@ -1,5 +1,6 @@
 import logging
 import re
+from functools import lru_cache
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
@@ -13,12 +14,18 @@ from bot.ui.main_menu import get_main_menu_keyboard, get_main_menu_text
 from bot.models.program import Program, ProgramChat
 from bot.models.user import User
 from bot.scheduler import schedule_program_job
+from bot.services import program_cache
 from bot.services.subscription import check_program_limit
 
 router = Router()
 
+_CHAT_RE = re.compile(r'@(\w+)|t\.me/(\w+)')
+
 
 # --- Keyboards ---
+# Markups are pure functions of their arguments and never mutated after
+# creation, so one shared instance per argument set is reused across users.
+@lru_cache(maxsize=8)
 def get_step_keyboard(back_callback: str = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     if back_callback:
@@ -27,6 +34,7 @@ def get_step_keyboard(back_callback: str = None) -> InlineKeyboardMarkup:
     builder.adjust(2)
     return builder.as_markup()
 
+@lru_cache(maxsize=1)
 def get_chats_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="➕ Добавить ещё", callback_data="add_more_chats")
@@ -36,6 +44,7 @@ def get_chats_keyboard() -> InlineKeyboardMarkup:
     builder.adjust(2, 2)
     return builder.as_markup()
 
+@lru_cache(maxsize=1)
 def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     # builder.button(text="🎚 Изменить настройки", callback_data="edit_settings") # TODO
@@ -93,9 +102,8 @@ async def enter_name(message: Message, state: FSMContext):
 @router.message(StateFilter(ProgramCreate.enter_niche_description))
 async def enter_niche_description(message: Message, state: FSMContext):
     logging.info(f"FSM 'create_program': entered niche description '{message.text}'")
-    await state.update_data(niche_description=message.text)
+    data = await state.update_data(niche_description=message.text)
     await state.set_state(ProgramCreate.enter_chats)
-    data = await state.get_data()
     await message.answer(
         f"➕ Новая программа: \"{data['name']}\"\n\n"
         "💬 Шаг 3 из 4: Чаты для парсинга\n\n"
@@ -108,8 +116,8 @@ async def enter_niche_description(message: Message, state: FSMContext):
 # Step 4: Confirm Settings
 @router.message(StateFilter(ProgramCreate.enter_chats))
 async def enter_chats(message: Message, state: FSMContext):
-    chat_usernames = re.findall(r'@(\w+)|t\.me/(\w+)', message.text)
-    chats = [item for tpl in chat_usernames for item in tpl if item]
+    # dict.fromkeys drops repeated usernames in O(n) while keeping order.
+    chats = list(dict.fromkeys(at or link for at, link in _CHAT_RE.findall(message.text)))
     
     if not chats:
         logging.warning("User provided message with no valid chat usernames.")
@@ -119,11 +127,10 @@ async def enter_chats(message: Message, state: FSMContext):
         return
 
     logging.info(f"FSM 'create_program': entered chats {chats}")
-    await state.update_data(chats=chats)
+    data = await state.update_data(chats=chats)
     await state.set_state(ProgramCreate.confirm_settings)
-    data = await state.get_data()
 
-    chats_list_str = "\n".join([f"• @{chat}" for chat in data.get('chats', [])])
+    chats_list_str = "\n".join(f"• @{chat}" for chat in data.get('chats', []))
     text = (
         f"➕ Новая программа: \"{data['name']}\"\n\n"
         f"⚙️ Шаг 4 из 4: Подтверждение\n\n"
@@ -198,14 +205,16 @@ async def save_program(callback: CallbackQuery, state: FSMContext, session: Asyn
         niche_description=data['niche_description'],
         auto_collect_enabled=False,
         owner_chat_id=owner_chat_id,
+        chats=[
+            ProgramChat(chat_username=chat_username)
+            for chat_username in data.get('chats', [])
+        ],
     )
 
-    for chat_username in data.get('chats', []):
-        new_program.chats.append(ProgramChat(chat_username=chat_username))
-
     session.add(new_program)
     await session.commit()
     await session.refresh(new_program)
+    program_cache.invalidate(callback.from_user.id)
 
     schedule_program_job(new_program.id, owner_chat_id, new_program.schedule_time)
 
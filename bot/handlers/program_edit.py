@@ -1,20 +1,91 @@
+import asyncio
 import logging
+import re
+from functools import lru_cache
+from typing import Any
+
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import load_only, selectinload
 
 from bot.models.program import Program, ProgramChat
 from bot.scheduler import schedule_program_job, remove_program_job
+from bot.services import programs
 from bot.states import ProgramEdit
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# One chat per line: @username, t.me/username or a bare Telegram username.
+_CHAT_LINE_RE = re.compile(r"^\s*(?:https?://)?(?:t\.me/|@)?([A-Za-z0-9_]{4,32})\s*$")
+
+# Callback data prefixes; handlers slice the id off instead of splitting.
+_P_EDIT_PROGRAM = "edit_program_"
+_P_EDIT_NAME = "edit_name_"
+_P_EDIT_NICHE = "edit_niche_"
+_P_EDIT_CHATS = "edit_chats_"
+_P_DONE_CHATS = "done_chats_"
+_P_EDIT_SETTINGS = "edit_settings_"
+_P_SAVE_SETTINGS = "save_settings_"
+
+# One compiled pattern routes every settings button; only score/max carry a value.
+_SETTING_RE = re.compile(
+    r"^(set_score|set_max|toggle_enrich|toggle_autocollect)_(\d+)(?:_(\d+))?$"
+)
+
+# Settings button action -> (FSM key, new value from current data and suffix).
+_SETTING_UPDATES = {
+    "set_score": ("min_score", lambda data, value: int(value)),
+    "set_max": ("max_leads", lambda data, value: int(value)),
+    "toggle_enrich": ("enrich", lambda data, value: not data.get('enrich', False)),
+    "toggle_autocollect": (
+        "auto_collect",
+        lambda data, value: not data.get('auto_collect', True),
+    ),
+}
+
+_SCORE_VALUES = (1, 2, 3, 4, 5)
+_MAX_VALUES = (10, 20, 50)
+
+_SETTINGS_TPL = (
+    "⚙️ Настройки программы{title}\n\n"
+    "Минимальный скор: {min_score}\n"
+    "Лидов за запуск: {max_leads}\n"
+    "Web-обогащение: {enrich}\n"
+    "Автосбор по расписанию: {auto_collect}"
+)
+
+
+def _render_settings(
+    min_score: int,
+    max_leads: int,
+    enrich: bool,
+    auto_collect: bool,
+    name: str | None = None,
+) -> str:
+    """Renders the settings editor text."""
+    return _SETTINGS_TPL.format(
+        title=f": {name}" if name else "",
+        min_score=min_score,
+        max_leads=max_leads,
+        enrich="Вкл" if enrich else "Выкл",
+        auto_collect="Вкл" if auto_collect else "Выкл",
+    )
+
+
+async def _enter_state(state: FSMContext, new_state: State, **data: Any) -> None:
+    """Starts an edit step with fresh data; both storage writes run concurrently."""
+    await asyncio.gather(state.set_state(new_state), state.set_data(data))
+
 
+# Keyboards are pure functions of their arguments and never mutated after
+# creation, so one shared markup per argument set is reused across callbacks.
+@lru_cache(maxsize=1024)
 def get_edit_menu_keyboard(program_id: int) -> InlineKeyboardMarkup:
     """Creates the edit menu keyboard."""
     builder = InlineKeyboardBuilder()
@@ -27,6 +98,7 @@ def get_edit_menu_keyboard(program_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1024)
 def get_back_keyboard(program_id: int) -> InlineKeyboardMarkup:
     """Generic back button keyboard."""
     builder = InlineKeyboardBuilder()
@@ -35,6 +107,17 @@ def get_back_keyboard(program_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1024)
+def get_chats_keyboard(program_id: int) -> InlineKeyboardMarkup:
+    """Done/back keyboard for the chats editor."""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="✅ Готово", callback_data=f"done_chats_{program_id}")
+    builder.button(text="◀️ Назад", callback_data=f"edit_program_{program_id}")
+    builder.adjust(1)
+    return builder.as_markup()
+
+
+@lru_cache(maxsize=1024)
 def get_settings_keyboard(
     program_id: int,
     min_score: int,
@@ -46,19 +129,15 @@ def get_settings_keyboard(
     builder = InlineKeyboardBuilder()
 
     # Min score buttons
-    for score in [1, 2, 3, 4, 5]:
+    for score in _SCORE_VALUES:
         marker = "✅" if score == min_score else ""
         builder.button(text=f"{score}{marker}", callback_data=f"set_score_{program_id}_{score}")
 
-    builder.adjust(5)  # All scores in one row
-
     # Max leads buttons
-    for count in [10, 20, 50]:
+    for count in _MAX_VALUES:
         marker = "✅" if count == max_leads else ""
         builder.button(text=f"{count}{marker}", callback_data=f"set_max_{program_id}_{count}")
 
-    builder.adjust(6, 3)  # Scores, then max leads
-
     # Web enrichment toggle
     enrich_text = "Web-обогащение: Вкл ✅" if enrich else "Web-обогащение: Выкл"
     builder.button(text=enrich_text, callback_data=f"toggle_enrich_{program_id}")
@@ -76,26 +155,24 @@ def get_settings_keyboard(
     builder.button(text="✅ Сохранить", callback_data=f"save_settings_{program_id}")
     builder.button(text="◀️ Назад", callback_data=f"edit_program_{program_id}")
 
-    builder.adjust(5, 3, 1, 1, 1, 1)
+    builder.adjust(len(_SCORE_VALUES), len(_MAX_VALUES), 1, 1, 1, 1)
 
     return builder.as_markup()
 
 
 # --- Edit Menu ---
 
-@router.callback_query(F.data.startswith("edit_program_"))
+@router.callback_query(F.data.startswith(_P_EDIT_PROGRAM))
 async def show_edit_menu(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
     """Shows the edit menu for a program."""
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_EDIT_PROGRAM):])
 
     # Clear any existing state
     await state.clear()
 
-    query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == callback.from_user.id,
+    program = await programs.get_owned_program(
+        session, program_id, callback.from_user.id
     )
-    program = (await session.execute(query)).scalars().first()
 
     if not program:
         await callback.answer("Программа не найдена.", show_alert=True)
@@ -112,13 +189,12 @@ async def show_edit_menu(callback: CallbackQuery, session: AsyncSession, state:
 
 # --- Edit Name ---
 
-@router.callback_query(F.data.startswith("edit_name_"))
+@router.callback_query(F.data.startswith(_P_EDIT_NAME))
 async def edit_name_start(callback: CallbackQuery, state: FSMContext):
     """Starts name editing."""
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_EDIT_NAME):])
 
-    await state.set_state(ProgramEdit.edit_name)
-    await state.update_data(program_id=program_id)
+    await _enter_state(state, ProgramEdit.edit_name, program_id=program_id)
 
     text = "📝 Введи новое название программы:"
 
@@ -137,14 +213,14 @@ async def edit_name_save(message: Message, state: FSMContext, session: AsyncSess
         await message.answer("Название не может быть пустым. Попробуй снова:")
         return
 
-    query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == message.from_user.id,
+    # Ownership is part of the UPDATE's WHERE; rowcount tells if it applied.
+    result = await session.execute(
+        update(Program)
+        .where(Program.id == program_id, Program.user_id == message.from_user.id)
+        .values(name=new_name)
     )
-    program = (await session.execute(query)).scalars().first()
 
-    if program:
-        program.name = new_name
+    if result.rowcount:
         await session.commit()
         await message.answer(f"✅ Название изменено на: {new_name}")
 
@@ -157,13 +233,12 @@ async def edit_name_save(message: Message, state: FSMContext, session: AsyncSess
 
 # --- Edit Niche ---
 
-@router.callback_query(F.data.startswith("edit_niche_"))
+@router.callback_query(F.data.startswith(_P_EDIT_NICHE))
 async def edit_niche_start(callback: CallbackQuery, state: FSMContext):
     """Starts niche editing."""
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_EDIT_NICHE):])
 
-    await state.set_state(ProgramEdit.edit_niche)
-    await state.update_data(program_id=program_id)
+    await _enter_state(state, ProgramEdit.edit_niche, program_id=program_id)
 
     text = "🎯 Введи новое описание ниши:"
 
@@ -182,45 +257,48 @@ async def edit_niche_save(message: Message, state: FSMContext, session: AsyncSes
         await message.answer("Описание не может быть пустым. Попробуй снова:")
         return
 
-    query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == message.from_user.id,
-    )
-    program = (await session.execute(query)).scalars().first()
+    program_name = (
+        await session.execute(
+            update(Program)
+            .where(Program.id == program_id, Program.user_id == message.from_user.id)
+            .values(niche_description=new_niche)
+            .returning(Program.name)
+        )
+    ).scalar_one_or_none()
 
-    if program:
-        program.niche_description = new_niche
+    if program_name is not None:
         await session.commit()
         await message.answer(f"✅ Описание ниши изменено")
 
     await state.clear()
 
     # Show edit menu again
-    text = f"✏️ Редактирование: {program.name}\n\nЧто ещё изменить?"
+    title = f"✏️ Редактирование: {program_name}" if program_name else "✏️ Редактирование"
+    text = f"{title}\n\nЧто ещё изменить?"
     await message.answer(text, reply_markup=get_edit_menu_keyboard(program_id))
 
 
 # --- Edit Chats ---
 
-@router.callback_query(F.data.startswith("edit_chats_"))
+@router.callback_query(F.data.startswith(_P_EDIT_CHATS))
 async def edit_chats_start(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Shows current chats and allows adding/removing."""
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_EDIT_CHATS):])
 
-    query = select(Program).options(selectinload(Program.chats)).where(
-        Program.id == program_id,
-        Program.user_id == callback.from_user.id,
+    program = await programs.get_owned_program(
+        session,
+        program_id,
+        callback.from_user.id,
+        options=[selectinload(Program.chats).load_only(ProgramChat.chat_username)],
     )
-    program = (await session.execute(query)).scalars().first()
 
     if not program:
         await callback.answer("Программа не найдена.", show_alert=True)
         return
 
-    await state.set_state(ProgramEdit.edit_chats)
-    await state.update_data(program_id=program_id)
+    await _enter_state(state, ProgramEdit.edit_chats, program_id=program_id)
 
-    chats_list = "\n".join([f"• @{chat.chat_username}" for chat in program.chats]) if program.chats else "Чатов нет"
+    chats_list = "\n".join(f"• @{chat.chat_username}" for chat in program.chats) if program.chats else "Чатов нет"
 
     text = (
         f"💬 Чаты программы: {program.name}\n\n"
@@ -230,12 +308,7 @@ async def edit_chats_start(callback: CallbackQuery, state: FSMContext, session:
         "Для удаления чата отправь: удалить @username"
     )
 
-    builder = InlineKeyboardBuilder()
-    builder.button(text="✅ Готово", callback_data=f"done_chats_{program_id}")
-    builder.button(text="◀️ Назад", callback_data=f"edit_program_{program_id}")
-    builder.adjust(1)
-
-    await callback.message.edit_text(text, reply_markup=builder.as_markup())
+    await callback.message.edit_text(text, reply_markup=get_chats_keyboard(program_id))
     await callback.answer()
 
 
@@ -247,11 +320,13 @@ async def edit_chats_process(message: Message, state: FSMContext, session: Async
 
     text = message.text.strip()
 
-    query = select(Program).options(selectinload(Program.chats)).where(
-        Program.id == program_id,
-        Program.user_id == message.from_user.id,
+    # Both branches hit program_chats directly; only ownership is needed here.
+    program = await programs.get_owned_program(
+        session,
+        program_id,
+        message.from_user.id,
+        options=[load_only(Program.id, Program.user_id)],
     )
-    program = (await session.execute(query)).scalars().first()
 
     if not program:
         await message.answer("Программа не найдена.")
@@ -261,32 +336,37 @@ async def edit_chats_process(message: Message, state: FSMContext, session: Async
     if text.lower().startswith("удалить"):
         chat_username = text.replace("удалить", "").strip().lstrip("@")
 
-        chat_to_delete = next((c for c in program.chats if c.chat_username == chat_username), None)
-        if chat_to_delete:
-            await session.delete(chat_to_delete)
+        result = await session.execute(
+            delete(ProgramChat).where(
+                ProgramChat.program_id == program_id,
+                ProgramChat.chat_username == chat_username,
+            )
+        )
+        if result.rowcount:
             await session.commit()
             await message.answer(f"✅ Чат @{chat_username} удалён")
         else:
             await message.answer(f"❌ Чат @{chat_username} не найден")
     else:
         # Add new chats
-        lines = text.split("\n")
-        added = []
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            # Extract username
-            chat_username = line.replace("t.me/", "").replace("@", "").strip()
-
-            # Check if already exists
-            exists = any(c.chat_username == chat_username for c in program.chats)
-            if not exists:
-                new_chat = ProgramChat(program_id=program_id, chat_username=chat_username)
-                session.add(new_chat)
-                added.append(f"@{chat_username}")
+        matches = (_CHAT_LINE_RE.match(line) for line in text.split("\n"))
+        usernames = list(dict.fromkeys(m.group(1) for m in matches if m))
+
+        existing: set[str] = set()
+        if usernames:
+            existing_query = select(ProgramChat.chat_username).where(
+                ProgramChat.program_id == program_id,
+                ProgramChat.chat_username.in_(usernames),
+            )
+            existing = set((await session.scalars(existing_query)).all())
+
+        new_chats = [
+            ProgramChat(program_id=program_id, chat_username=chat_username)
+            for chat_username in usernames
+            if chat_username not in existing
+        ]
+        session.add_all(new_chats)
+        added = [f"@{chat.chat_username}" for chat in new_chats]
 
         if added:
             await session.commit()
@@ -295,10 +375,10 @@ async def edit_chats_process(message: Message, state: FSMContext, session: Async
             await message.answer("Чаты уже существуют или некорректный формат")
 
 
-@router.callback_query(F.data.startswith("done_chats_"))
+@router.callback_query(F.data.startswith(_P_DONE_CHATS))
 async def edit_chats_done(callback: CallbackQuery, state: FSMContext):
     """Finishes chat editing."""
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_DONE_CHATS):])
     await state.clear()
 
     text = "✏️ Редактирование\n\nЧто ещё изменить?"
@@ -308,23 +388,22 @@ async def edit_chats_done(callback: CallbackQuery, state: FSMContext):
 
 # --- Edit Settings ---
 
-@router.callback_query(F.data.startswith("edit_settings_"))
+@router.callback_query(F.data.startswith(_P_EDIT_SETTINGS))
 async def edit_settings_show(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
     """Shows settings editor."""
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_EDIT_SETTINGS):])
 
-    query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == callback.from_user.id,
+    program = await programs.get_owned_program(
+        session, program_id, callback.from_user.id
     )
-    program = (await session.execute(query)).scalars().first()
 
     if not program:
         await callback.answer("Программа не найдена.", show_alert=True)
         return
 
-    await state.set_state(ProgramEdit.edit_settings)
-    await state.update_data(
+    await _enter_state(
+        state,
+        ProgramEdit.edit_settings,
         program_id=program_id,
         min_score=program.min_score,
         max_leads=program.max_leads_per_run,
@@ -332,165 +411,88 @@ async def edit_settings_show(callback: CallbackQuery, session: AsyncSession, sta
         auto_collect=program.auto_collect_enabled,
     )
 
-    text = (
-        f"⚙️ Настройки программы: {program.name}\n\n"
-        f"Минимальный скор: {program.min_score}\n"
-        f"Лидов за запуск: {program.max_leads_per_run}\n"
-        f"Web-обогащение: {'Вкл' if program.enrich else 'Выкл'}\n"
-        f"Автосбор по расписанию: "
-        f"{'Вкл' if program.auto_collect_enabled else 'Выкл'}"
-    )
-
-    keyboard = get_settings_keyboard(
-        program_id,
+    text = _render_settings(
         program.min_score,
         program.max_leads_per_run,
         program.enrich,
         program.auto_collect_enabled,
-    )
-    await callback.message.edit_text(text, reply_markup=keyboard)
-    await callback.answer()
-
-
-@router.callback_query(F.data.startswith("set_score_"))
-async def set_min_score(callback: CallbackQuery, state: FSMContext):
-    """Updates min score in state."""
-    parts = callback.data.split("_")
-    program_id = int(parts[2])
-    new_score = int(parts[3])
-
-    data = await state.get_data()
-    await state.update_data(min_score=new_score)
-
-    text = (
-        f"⚙️ Настройки программы\n\n"
-        f"Минимальный скор: {new_score}\n"
-        f"Лидов за запуск: {data.get('max_leads', 50)}\n"
-        f"Web-обогащение: {'Вкл' if data.get('enrich', False) else 'Выкл'}\n"
-        f"Автосбор по расписанию: "
-        f"{'Вкл' if data.get('auto_collect', True) else 'Выкл'}"
+        name=program.name,
     )
 
     keyboard = get_settings_keyboard(
         program_id,
-        new_score,
-        data.get('max_leads', 50),
-        data.get('enrich', False),
-        data.get('auto_collect', True),
-    )
-    await callback.message.edit_text(text, reply_markup=keyboard)
-    await callback.answer()
-
-
-@router.callback_query(F.data.startswith("set_max_"))
-async def set_max_leads(callback: CallbackQuery, state: FSMContext):
-    """Updates max leads in state."""
-    parts = callback.data.split("_")
-    program_id = int(parts[2])
-    new_max = int(parts[3])
-
-    data = await state.get_data()
-    await state.update_data(max_leads=new_max)
-
-    text = (
-        f"⚙️ Настройки программы\n\n"
-        f"Минимальный скор: {data.get('min_score', 5)}\n"
-        f"Лидов за запуск: {new_max}\n"
-        f"Web-обогащение: {'Вкл' if data.get('enrich', False) else 'Выкл'}\n"
-        f"Автосбор по расписанию: "
-        f"{'Вкл' if data.get('auto_collect', True) else 'Выкл'}"
-    )
-
-    keyboard = get_settings_keyboard(
-        program_id,
-        data.get('min_score', 5),
-        new_max,
-        data.get('enrich', False),
-        data.get('auto_collect', True),
-    )
-    await callback.message.edit_text(text, reply_markup=keyboard)
-    await callback.answer()
-
-
-@router.callback_query(F.data.startswith("toggle_enrich_"))
-async def toggle_enrichment(callback: CallbackQuery, state: FSMContext):
-    """Toggles web enrichment setting."""
-    program_id = int(callback.data.split("_")[-1])
-
-    data = await state.get_data()
-    new_enrich = not data.get('enrich', False)
-    await state.update_data(enrich=new_enrich)
-
-    text = (
-        f"⚙️ Настройки программы\n\n"
-        f"Минимальный скор: {data.get('min_score', 5)}\n"
-        f"Лидов за запуск: {data.get('max_leads', 50)}\n"
-        f"Web-обогащение: {'Вкл' if new_enrich else 'Выкл'}\n"
-        f"Автосбор по расписанию: "
-        f"{'Вкл' if data.get('auto_collect', True) else 'Выкл'}"
-    )
-
-    keyboard = get_settings_keyboard(
-        program_id,
-        data.get('min_score', 5),
-        data.get('max_leads', 50),
-        new_enrich,
-        data.get('auto_collect', True),
+        program.min_score,
+        program.max_leads_per_run,
+        program.enrich,
+        program.auto_collect_enabled,
     )
     await callback.message.edit_text(text, reply_markup=keyboard)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("toggle_autocollect_"))
-async def toggle_auto_collect(callback: CallbackQuery, state: FSMContext):
-    """Toggles scheduled auto-collection setting."""
-    program_id = int(callback.data.split("_")[-1])
+@router.callback_query(F.data.regexp(_SETTING_RE).as_("setting_match"))
+async def apply_setting(callback: CallbackQuery, state: FSMContext, setting_match: re.Match):
+    """Applies a score/max/toggle button press to the settings in state."""
+    action, program_id, value = setting_match.groups()
+    key, compute = _SETTING_UPDATES[action]
 
-    data = await state.get_data()
-    new_auto_collect = not data.get('auto_collect', True)
-    await state.update_data(auto_collect=new_auto_collect)
-
-    text = (
-        f"⚙️ Настройки программы\n\n"
-        f"Минимальный скор: {data.get('min_score', 5)}\n"
-        f"Лидов за запуск: {data.get('max_leads', 50)}\n"
-        f"Web-обогащение: {'Вкл' if data.get('enrich', False) else 'Выкл'}\n"
-        f"Автосбор по расписанию: {'Вкл' if new_auto_collect else 'Выкл'}"
-    )
+    # Score/max buttons carry their value; only toggles read the state first.
+    current = {} if value is not None else await state.get_data()
+    data = await state.update_data({key: compute(current, value)})
 
-    keyboard = get_settings_keyboard(
-        program_id,
+    settings = (
         data.get('min_score', 5),
         data.get('max_leads', 50),
         data.get('enrich', False),
-        new_auto_collect,
+        data.get('auto_collect', True),
     )
+    text = _render_settings(*settings)
+    keyboard = get_settings_keyboard(int(program_id), *settings)
     await callback.message.edit_text(text, reply_markup=keyboard)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("save_settings_"))
+@router.callback_query(F.data.startswith(_P_SAVE_SETTINGS))
 async def save_settings(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Saves the settings to database."""
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_SAVE_SETTINGS):])
     data = await state.get_data()
 
-    query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == callback.from_user.id,
-    )
-    program = (await session.execute(query)).scalars().first()
+    values = {
+        "min_score": data.get('min_score', 5),
+        "max_leads_per_run": data.get('max_leads', 50),
+        "enrich": data.get('enrich', False),
+    }
+    # An enabled program needs a chat to notify; fall back to the owner's.
+    owner_chat_id = func.coalesce(Program.owner_chat_id, callback.from_user.id)
+    auto_collect = data.get('auto_collect')
+    if auto_collect is None:
+        values["owner_chat_id"] = case(
+            (Program.auto_collect_enabled, owner_chat_id),
+            else_=Program.owner_chat_id,
+        )
+    else:
+        values["auto_collect_enabled"] = auto_collect
+        if auto_collect:
+            values["owner_chat_id"] = owner_chat_id
+
+    program = (
+        await session.execute(
+            update(Program)
+            .where(Program.id == program_id, Program.user_id == callback.from_user.id)
+            .values(**values)
+            .returning(
+                Program.id,
+                Program.owner_chat_id,
+                Program.schedule_time,
+                Program.auto_collect_enabled,
+            )
+        )
+    ).first()
 
     if program:
-        program.min_score = data.get('min_score', 5)
-        program.max_leads_per_run = data.get('max_leads', 50)
-        program.enrich = data.get('enrich', False)
-        auto_collect = data.get('auto_collect', program.auto_collect_enabled)
-        program.auto_collect_enabled = auto_collect
-        if auto_collect:
-            owner_chat_id = program.owner_chat_id or callback.from_user.id
-            program.owner_chat_id = owner_chat_id
-            schedule_program_job(program.id, owner_chat_id, program.schedule_time)
+        if program.auto_collect_enabled:
+            schedule_program_job(program.id, program.owner_chat_id, program.schedule_time)
         else:
             remove_program_job(program.id)
         await session.commit()
@@ -3,11 +3,10 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import func, select
 
-from bot.models.program import Program
-from bot.i18n import get_locale, pick, t
+from bot.models.program import Program, ProgramChat
+from bot.i18n import get_locale, pick, picker, t
 from bot.ui.main_menu import get_main_menu_keyboard
 
 router = Router()
@@ -42,15 +41,16 @@ async def my_programs_handler(callback: CallbackQuery, session: AsyncSession):
     logging.info("Handling 'my_programs' callback.")
     locale = get_locale(callback.from_user.language_code)
     
-    # Use selectinload to eagerly load the 'chats' relationship
+    # Chat counts are aggregated in SQL; the list never shows usernames.
     query = (
-        select(Program)
-        .options(selectinload(Program.chats))
+        select(Program, func.count(ProgramChat.id).label("chats_count"))
+        .outerjoin(ProgramChat, ProgramChat.program_id == Program.id)
         .where(Program.user_id == callback.from_user.id)
+        .group_by(Program.id)
         .order_by(Program.id)
     )
-    result = await session.execute(query)
-    programs = result.scalars().all()
+    rows = (await session.execute(query)).all()
+    programs = [program for program, _ in rows]
 
     if not programs:
         text = pick(
@@ -67,21 +67,25 @@ async def my_programs_handler(callback: CallbackQuery, session: AsyncSession):
             ),
         )
     else:
-        text = pick(locale, "📋 Мои программы\n\n", "📋 My Programs\n\n")
-        for i, program in enumerate(programs):
+        choose = picker(locale)
+        chats_label = choose(('чат(а/ов)', 'chat(s)'))
+        score_label = choose(('скор ≥', 'score ≥'))
+        disabled_label = choose(("⏸ выключено", "⏸ disabled"))
+        parts = [choose(("📋 Мои программы\n\n", "📋 My Programs\n\n"))]
+        for i, (program, chats_count) in enumerate(rows):
             schedule_status = (
                 f"⏰ {program.schedule_time}"
                 if program.auto_collect_enabled else
-                pick(locale, "⏸ выключено", "⏸ disabled")
+                disabled_label
             )
-            text += (
+            parts.append(
                 f"{i+1}️⃣ {program.name}\n"
-                f"   {len(program.chats)} "
-                f"{pick(locale, 'чат(а/ов)', 'chat(s)')} • "
-                f"{pick(locale, 'скор ≥', 'score ≥')}{program.min_score} • "
+                f"   {chats_count} {chats_label} • "
+                f"{score_label}{program.min_score} • "
                 f"{schedule_status}\n"
                 "\n"
             )
+        text = "".join(parts)
 
     await callback.message.edit_text(
         text,
@@ -1,13 +1,14 @@
 import logging
 import asyncio
+from functools import lru_cache
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import load_only, selectinload
 
-from bot.models.program import Program
+from bot.models.program import Program, ProgramChat
 from bot.models.lead import Lead
 from bot.models.user import User
 from bot.ui.main_menu import get_main_menu_keyboard
@@ -16,13 +17,23 @@ from bot.tasks import enqueue_program_job
 from bot.services.subscription import check_weekly_analysis_limit
 from bot.ui.lead_card import format_lead_card, get_lead_card_keyboard
 from bot.scheduler import remove_program_job
+from bot.services import program_cache, programs
 from sqlalchemy import delete
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Callback data prefixes; handlers slice the id off instead of splitting.
+_P_SHOW_PROGRAM = "show_program_"
+_P_RUN_PROGRAM = "run_program_"
+_P_DELETE_PROGRAM = "delete_program_"
+_P_CONFIRM_DELETE = "confirm_delete_"
+_P_CLEAR_LEADS = "clear_leads_"
+_P_CONFIRM_CLEAR_LEADS = "confirm_clear_leads_"
+
 # --- Keyboards ---
 
+@lru_cache(maxsize=1024)
 def get_program_card_keyboard(program_id: int, leads_count: int = 0) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     if leads_count > 0:
@@ -51,49 +62,24 @@ def get_clear_leads_confirmation_keyboard(program_id: int) -> InlineKeyboardMark
 
 # --- View / Main Card Handler ---
 
-@router.callback_query(F.data.startswith("show_program_"))
+@router.callback_query(F.data.startswith(_P_SHOW_PROGRAM))
 async def show_program_handler(callback: CallbackQuery, session: AsyncSession):
     logging.info(f"Handling 'show_program' callback: {callback.data}")
-    locale = get_locale(callback.from_user.language_code)
-    program_id = int(callback.data.split("_")[-1])
-
-    program_query = (
-        select(Program)
-        .options(selectinload(Program.chats))
-        .where(
-            Program.id == program_id,
-            Program.user_id == callback.from_user.id,
-        )
+    await _show_program_card(
+        callback, session, int(callback.data[len(_P_SHOW_PROGRAM):])
     )
-    program = (await session.execute(program_query)).scalars().first()
-
-    if not program:
-        text = pick(locale, "Программа не найдена.", "Program not found.")
-        await callback.message.edit_text(
-            text,
-            reply_markup=get_main_menu_keyboard(callback.from_user.language_code),
-        )
-        await callback.answer(text, show_alert=True)
-        return
-
-    leads_count_query = select(func.count(Lead.id)).where(Lead.program_id == program.id)
-    leads_count = (await session.execute(leads_count_query)).scalar_one()
-    logger.info(f"Querying lead count for program_id={program.id}. Found: {leads_count} leads.")
 
-    # DEBUG: Let's also check all leads in the database
-    all_leads_query = select(Lead.id, Lead.program_id, Lead.telegram_username)
-    all_leads_result = await session.execute(all_leads_query)
-    all_leads = all_leads_result.all()
-    logger.info(f"All leads in database: {all_leads}")
 
-    chats_list_str = "\n".join([f"• @{chat.chat_username}" for chat in program.chats]) if program.chats else "Нет чатов."
+def _format_program_card(program: Program, leads_count: int) -> str:
+    """Build the program card text from a program with its chats loaded."""
+    chats_list_str = "\n".join(f"• @{chat.chat_username}" for chat in program.chats) if program.chats else "Нет чатов."
     schedule_status = "✅" if program.auto_collect_enabled else "❌"
     schedule_label = (
         f"ежедневно в {program.schedule_time}"
         if program.auto_collect_enabled else
         "выключено"
     )
-    text = (
+    return (
         f"📁 {program.name}\n\n"
         f"🎯 Ниша: {program.niche_description}\n\n"
         f"💬 Чаты:\n{chats_list_str}\n\n"
@@ -106,25 +92,61 @@ async def show_program_handler(callback: CallbackQuery, session: AsyncSession):
         f"• 🧑 Всего найдено: {leads_count} лидов\n"
     )
 
-    await callback.message.edit_text(text, reply_markup=get_program_card_keyboard(program.id, leads_count))
+
+async def _show_program_card(
+    callback: CallbackQuery, session: AsyncSession, program_id: int
+) -> None:
+    """Render the program card into the callback message."""
+    locale = get_locale(callback.from_user.language_code)
+
+    # Lead count rides along as a correlated subquery: one round trip.
+    leads_count_subquery = (
+        select(func.count(Lead.id))
+        .where(Lead.program_id == Program.id)
+        .scalar_subquery()
+    )
+    program_query = (
+        select(Program, leads_count_subquery.label("leads_count"))
+        .options(selectinload(Program.chats).load_only(ProgramChat.chat_username))
+        .where(
+            Program.id == program_id,
+            Program.user_id == callback.from_user.id,
+        )
+    )
+    row = (await session.execute(program_query)).first()
+
+    if not row:
+        text = pick(locale, "Программа не найдена.", "Program not found.")
+        await callback.message.edit_text(
+            text,
+            reply_markup=get_main_menu_keyboard(callback.from_user.language_code),
+        )
+        await callback.answer(text, show_alert=True)
+        return
+
+    program, leads_count = row
+    logger.info(f"Querying lead count for program_id={program.id}. Found: {leads_count} leads.")
+
+    await callback.message.edit_text(
+        _format_program_card(program, leads_count),
+        reply_markup=get_program_card_keyboard(program.id, leads_count),
+    )
     await callback.answer()
 
 # --- 'Run Now' Handler (Non-blocking) ---
 
-@router.callback_query(F.data.startswith("run_program_"))
+@router.callback_query(F.data.startswith(_P_RUN_PROGRAM))
 async def run_program_handler(callback: CallbackQuery, session: AsyncSession):
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_RUN_PROGRAM):])
     locale = get_locale(callback.from_user.language_code)
     logging.info(f"Starting immediate job for program_id={program_id}")
 
-    owned_program = (
-        await session.execute(
-            select(Program.id).where(
-                Program.id == program_id,
-                Program.user_id == callback.from_user.id,
-            )
-        )
-    ).scalar_one_or_none()
+    owned_program = await programs.get_owned_program(
+        session,
+        program_id,
+        callback.from_user.id,
+        options=[load_only(Program.id, Program.user_id)],
+    )
     if not owned_program:
         await callback.answer(
             pick(locale, "Программа не найдена.", "Program not found."),
@@ -192,14 +214,15 @@ async def run_program_handler(callback: CallbackQuery, session: AsyncSession):
 
 # --- Delete Flow Handlers ---
 
-@router.callback_query(F.data.startswith("delete_program_"))
+@router.callback_query(F.data.startswith(_P_DELETE_PROGRAM))
 async def delete_program_confirmation(callback: CallbackQuery, session: AsyncSession):
-    program_id = int(callback.data.split("_")[-1])
-    query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == callback.from_user.id,
+    program_id = int(callback.data[len(_P_DELETE_PROGRAM):])
+    program = await programs.get_owned_program(
+        session,
+        program_id,
+        callback.from_user.id,
+        options=[load_only(Program.id, Program.user_id, Program.name)],
     )
-    program = (await session.execute(query)).scalars().first()
     if not program:
         await callback.answer("Программа уже удалена.", show_alert=True)
         return
@@ -208,20 +231,25 @@ async def delete_program_confirmation(callback: CallbackQuery, session: AsyncSes
     await callback.message.edit_text(text, reply_markup=get_delete_confirmation_keyboard(program_id))
     await callback.answer()
 
-@router.callback_query(F.data.startswith("confirm_delete_"))
+@router.callback_query(F.data.startswith(_P_CONFIRM_DELETE))
 async def delete_program_confirmed(callback: CallbackQuery, session: AsyncSession):
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_CONFIRM_DELETE):])
     locale = get_locale(callback.from_user.language_code)
-    query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == callback.from_user.id,
-    )
-    program = (await session.execute(query)).scalars().first()
+    # Chats cascade in the database, so a single owner-scoped DELETE suffices.
+    program_name = (
+        await session.execute(
+            delete(Program)
+            .where(
+                Program.id == program_id,
+                Program.user_id == callback.from_user.id,
+            )
+            .returning(Program.name)
+        )
+    ).scalar_one_or_none()
 
-    if program:
-        program_name = program.name
-        await session.delete(program)
+    if program_name is not None:
         await session.commit()
+        program_cache.invalidate(callback.from_user.id)
         remove_program_job(program_id)
         await callback.message.edit_text(
             pick(
@@ -244,16 +272,17 @@ async def delete_program_confirmed(callback: CallbackQuery, session: AsyncSessio
 
 # --- Clear Leads Flow Handlers ---
 
-@router.callback_query(F.data.startswith("clear_leads_"))
+@router.callback_query(F.data.startswith(_P_CLEAR_LEADS))
 async def clear_leads_confirmation(callback: CallbackQuery, session: AsyncSession):
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_CLEAR_LEADS):])
 
     # Get program and count leads
-    program_query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == callback.from_user.id,
+    program = await programs.get_owned_program(
+        session,
+        program_id,
+        callback.from_user.id,
+        options=[load_only(Program.id, Program.user_id, Program.name)],
     )
-    program = (await session.execute(program_query)).scalars().first()
 
     if not program:
         await callback.answer("Программа не найдена.", show_alert=True)
@@ -276,38 +305,38 @@ async def clear_leads_confirmation(callback: CallbackQuery, session: AsyncSessio
     await callback.message.edit_text(text, reply_markup=get_clear_leads_confirmation_keyboard(program_id))
     await callback.answer()
 
-@router.callback_query(F.data.startswith("confirm_clear_leads_"))
+@router.callback_query(F.data.startswith(_P_CONFIRM_CLEAR_LEADS))
 async def clear_leads_confirmed(callback: CallbackQuery, session: AsyncSession):
-    program_id = int(callback.data.split("_")[-1])
+    program_id = int(callback.data[len(_P_CONFIRM_CLEAR_LEADS):])
 
-    # Get program
-    program_query = select(Program).where(
-        Program.id == program_id,
-        Program.user_id == callback.from_user.id,
+    program = await programs.get_owned_program(
+        session,
+        program_id,
+        callback.from_user.id,
+        options=[selectinload(Program.chats).load_only(ProgramChat.chat_username)],
     )
-    program = (await session.execute(program_query)).scalars().first()
 
     if not program:
         await callback.answer("Программа не найдена.", show_alert=True)
         return
 
-    # Count leads before deletion
-    leads_count_query = select(func.count(Lead.id)).where(Lead.program_id == program.id)
-    leads_count = (await session.execute(leads_count_query)).scalar_one()
-
-    # Delete all leads for this program
-    delete_query = delete(Lead).where(
-        Lead.program_id == program_id,
-        Lead.user_id == callback.from_user.id,
+    result = await session.execute(
+        delete(Lead).where(
+            Lead.program_id == program_id,
+            Lead.user_id == callback.from_user.id,
+        )
     )
-    result = await session.execute(delete_query)
     await session.commit()
+    leads_count = result.rowcount
 
     logger.info(f"Deleted {leads_count} leads for program_id={program_id} ({program.name})")
 
-    # Show updated program card
+    # The card is rebuilt from the program in hand; no leads remain.
     await callback.answer(f"✅ Удалено лидов: {leads_count}", show_alert=True)
-    await show_program_handler(callback, session)
+    await callback.message.edit_text(
+        _format_program_card(program, 0),
+        reply_markup=get_program_card_keyboard(program.id, 0),
+    )
 
 # --- Edit Stub ---
 
@@ -1,33 +1,176 @@
+import asyncio
+import inspect
 import logging
-import datetime
+import time
+from functools import lru_cache
+from typing import Any
 from aiogram import Router, F, Bot
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import config
 from bot.i18n import get_locale, pick, t
 from bot.ui.main_menu import get_main_menu_keyboard, get_main_menu_text
-from bot.models.user import User
+from bot.models.user import User, utc_now_sql
+from bot.services import activity
 from bot.states import UserProfile
 
+logger = logging.getLogger(__name__)
+
 router = Router()
 
-REQUIRED_CHANNEL = "@post_cybercore"
+REQUIRED_CHANNEL = config.REQUIRED_CHANNEL
+
+
+# Localized static copy, resolved once at import: handlers index by locale
+# and format in the single dynamic field where there is one.
+_TEXTS: dict[str, dict[str, str]] = {
+    "not_set": {"ru": "Не заполнено", "en": "Not set"},
+    "settings": {
+        "ru": (
+            "👤 Профиль\n"
+            "━━━━━━━━━━━\n\n"
+            "💼 Мои услуги:\n"
+            "\"{current}\"\n\n"
+            "Выберите действие:"
+        ),
+        "en": (
+            "👤 Profile\n"
+            "━━━━━━━━━━━\n\n"
+            "💼 My Services:\n"
+            "\"{current}\"\n\n"
+            "Choose an action:"
+        ),
+    },
+    "onboarding": {
+        "ru": (
+            "👋 Привет! Я LeadCore — нахожу клиентов в Telegram-чатах.\n\n"
+            "🎯 Чтобы настроить поиск под тебя, напиши одним сообщением:\n"
+            "• 💼 Какие услуги ты продаёшь?\n"
+            "• 👥 Кто твои клиенты?\n\n"
+            "💡 Пример: «Делаю сайты и лендинги для малого бизнеса»."
+        ),
+        "en": (
+            "👋 Hi! I’m LeadCore — I find clients in Telegram chats.\n\n"
+            "🎯 To personalize lead search for you, send one message:\n"
+            "• 💼 What services do you sell?\n"
+            "• 👥 Who are your clients?\n\n"
+            "💡 Example: “I build websites and landing pages for SMBs.”"
+        ),
+    },
+    "access_restricted": {
+        "ru": (
+            f"🔒 Доступ закрыт\n\n"
+            f"Чтобы пользоваться ботом, подпишись на канал "
+            f"{REQUIRED_CHANNEL} — там делюсь инсайтами по "
+            "лидогенерации в Telegram.\n\n"
+            "После подписки нажми кнопку ниже 👇"
+        ),
+        "en": (
+            f"🔒 Access Restricted\n\n"
+            f"To use this bot, subscribe to {REQUIRED_CHANNEL} — "
+            "I share Telegram lead generation insights there.\n\n"
+            "After subscribing, tap the button below 👇"
+        ),
+    },
+    "not_subscribed": {
+        "ru": (
+            f"❌ Вы ещё не подписаны на {REQUIRED_CHANNEL}.\n"
+            "Подпишитесь и попробуйте снова."
+        ),
+        "en": (
+            f"❌ You are not subscribed to {REQUIRED_CHANNEL} yet.\n"
+            "Subscribe and try again."
+        ),
+    },
+    "statistics_stub": {
+        "ru": "Вы выбрали 'Статистика'. Этот раздел в разработке.",
+        "en": "You selected 'Statistics'. This section is under development.",
+    },
+    "edit_services_prompt": {
+        "ru": (
+            "✏️ Введите новое описание услуг одним сообщением.\n\n"
+            "💡 Пример: «Настраиваю AI-автоматизацию для e-commerce»."
+        ),
+        "en": (
+            "✏️ Enter your new services description in one message.\n\n"
+            "💡 Example: “I implement AI automation for e-commerce.”"
+        ),
+    },
+    "description_too_short": {
+        "ru": "⚠️ Описание слишком короткое. Напишите подробнее (10+ символов).",
+        "en": "⚠️ Description is too short. Please provide at least 10 characters.",
+    },
+    "description_saved": {
+        "ru": (
+            "🎉 Отлично! Сохранил описание услуг.\n"
+            "🤖 Теперь буду использовать его при квалификации лидов."
+        ),
+        "en": (
+            "🎉 Great! Services description saved.\n"
+            "🤖 I will now use it while qualifying leads."
+        ),
+    },
+    "description_updated": {
+        "ru": "✅ Описание услуг обновлено.",
+        "en": "✅ Services description updated.",
+    },
+}
+
+
+# Members are trusted for a few minutes; non-members are re-checked almost
+# immediately so a fresh subscription is picked up on the next tap.
+MEMBERSHIP_TTL = 180.0
+MEMBERSHIP_NEGATIVE_TTL = 5.0
+MEMBERSHIP_MAXSIZE = 10_000
+# Upper bound on how long /start waits for Telegram before falling back to
+# the last known answer.
+MEMBERSHIP_CHECK_TIMEOUT = 2.0
+_NON_MEMBER_STATUSES = frozenset({"left", "kicked", "banned"})
+
+# user_id -> (checked_at, is_member); read on every /start and re-check tap.
+_membership_cache: dict[int, tuple[float, bool]] = {}
 
 
 async def _is_channel_member(bot: Bot, user_id: int) -> bool:
+    now = time.monotonic()
+    cached = _membership_cache.get(user_id)
+    if cached:
+        checked_at, is_member = cached
+        ttl = MEMBERSHIP_TTL if is_member else MEMBERSHIP_NEGATIVE_TTL
+        if now - checked_at < ttl:
+            return is_member
+
     try:
-        member = await bot.get_chat_member(REQUIRED_CHANNEL, user_id)
-        return member.status not in ("left", "kicked", "banned")
+        member = await asyncio.wait_for(
+            bot.get_chat_member(REQUIRED_CHANNEL, user_id),
+            timeout=MEMBERSHIP_CHECK_TIMEOUT,
+        )
     except Exception:
-        return False
+        # Timeouts and API errors are not cached; a stale answer beats
+        # stalling or locking out a known member.
+        return cached[1] if cached else False
+    is_member = member.status not in _NON_MEMBER_STATUSES
+
+    if len(_membership_cache) >= MEMBERSHIP_MAXSIZE:
+        _membership_cache.clear()
+    _membership_cache[user_id] = (now, is_member)
+    return is_member
 
 
 def _channel_check_keyboard(language_code: str | None) -> object:
-    locale = get_locale(language_code)
+    return _build_channel_check_keyboard(get_locale(language_code))
+
+
+# Keyboards depend only on the locale and are never mutated after creation,
+# so one shared markup per locale is reused.
+@lru_cache(maxsize=8)
+def _build_channel_check_keyboard(locale: str) -> object:
     builder = InlineKeyboardBuilder()
     builder.button(
         text=pick(locale, "📢 Подписаться на канал", "📢 Subscribe to Channel"),
@@ -42,7 +185,11 @@ def _channel_check_keyboard(language_code: str | None) -> object:
 
 
 def _get_settings_keyboard(language_code: str | None) -> object:
-    locale = get_locale(language_code)
+    return _build_settings_keyboard(get_locale(language_code))
+
+
+@lru_cache(maxsize=8)
+def _build_settings_keyboard(locale: str) -> object:
     builder = InlineKeyboardBuilder()
     builder.button(
         text=pick(locale, "💎 Подписка", "💎 Subscription"),
@@ -56,7 +203,7 @@ def _get_settings_keyboard(language_code: str | None) -> object:
         ),
         callback_data="edit_services_description",
     )
-    builder.button(text=t("btn_back", language_code), callback_data="main_menu")
+    builder.button(text=t("btn_back", locale), callback_data="main_menu")
     builder.adjust(1)
     return builder.as_markup()
 
@@ -65,43 +212,35 @@ def _render_settings_text(
     services_description: str | None, language_code: str | None
 ) -> str:
     locale = get_locale(language_code)
-    current = services_description or pick(locale, "Не заполнено", "Not set")
-    return pick(
-        locale,
-        (
-            "👤 Профиль\n"
-            "━━━━━━━━━━━\n\n"
-            "💼 Мои услуги:\n"
-            f"\"{current}\"\n\n"
-            "Выберите действие:"
-        ),
-        (
-            "👤 Profile\n"
-            "━━━━━━━━━━━\n\n"
-            "💼 My Services:\n"
-            f"\"{current}\"\n\n"
-            "Choose an action:"
-        ),
-    )
+    current = services_description or _TEXTS["not_set"][locale]
+    return _TEXTS["settings"][locale].format(current=current)
 
 
 async def _touch_user(user, session: AsyncSession) -> User:
-    existing = (
-        await session.execute(select(User).where(User.telegram_id == user.id))
-    ).scalars().first()
-    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
-    if existing:
-        existing.username = user.username
-        existing.last_active_at = now
-    else:
-        existing = User(
-            telegram_id=user.id,
-            username=user.username,
-            last_active_at=now,
+    """Creates or refreshes the user's row in one INSERT ... ON CONFLICT.
+
+    last_active_at is stamped by the database: the column default covers the
+    insert, and the conflict branch sets it from the same server-side
+    expression. The caller's transaction is left open:
+    it is committed with the handler's other writes, or by the session
+    middleware.
+    """
+    insert_stmt = pg_insert(User).values(
+        telegram_id=user.id,
+        username=user.username,
+    )
+    stmt = (
+        insert_stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "username": insert_stmt.excluded.username,
+                "last_active_at": utc_now_sql(),
+            },
         )
-        session.add(existing)
-    await session.commit()
-    return existing
+        .returning(User)
+        .execution_options(populate_existing=True)
+    )
+    return (await session.execute(stmt)).scalar_one()
 
 
 async def _continue_onboarding(
@@ -109,31 +248,15 @@ async def _continue_onboarding(
     send_fn,
     session: AsyncSession,
     state: FSMContext,
+    user: User | None = None,
 ) -> None:
     locale = get_locale(getattr(tg_user, "language_code", None))
-    user = await _touch_user(tg_user, session)
-    if not (user.services_description or "").strip():
+    if user is None:
+        user = await _touch_user(tg_user, session)
+    if not user.has_services_description:
         await state.set_state(UserProfile.enter_services_description)
         await state.update_data(profile_flow="onboarding")
-        await send_fn(
-            pick(
-                locale,
-                (
-                    "👋 Привет! Я LeadCore — нахожу клиентов в Telegram-чатах.\n\n"
-                    "🎯 Чтобы настроить поиск под тебя, напиши одним сообщением:\n"
-                    "• 💼 Какие услуги ты продаёшь?\n"
-                    "• 👥 Кто твои клиенты?\n\n"
-                    "💡 Пример: «Делаю сайты и лендинги для малого бизнеса»."
-                ),
-                (
-                    "👋 Hi! I’m LeadCore — I find clients in Telegram chats.\n\n"
-                    "🎯 To personalize lead search for you, send one message:\n"
-                    "• 💼 What services do you sell?\n"
-                    "• 👥 Who are your clients?\n\n"
-                    "💡 Example: “I build websites and landing pages for SMBs.”"
-                ),
-            ),
-        )
+        await send_fn(_TEXTS["onboarding"][locale])
         return
     await send_fn(
         get_main_menu_text(getattr(tg_user, "language_code", None)),
@@ -146,88 +269,78 @@ async def start_handler(
     message: Message, bot: Bot, session: AsyncSession, state: FSMContext
 ) -> None:
     """Handler for the /start command."""
-    logging.info("Handling /start command")
+    logger.debug("Handling /start for user %s", message.from_user.id)
     locale = get_locale(message.from_user.language_code)
 
-    if not await _is_channel_member(bot, message.from_user.id):
+    if not config.REQUIRE_CHANNEL_SUBSCRIPTION:
+        await _continue_onboarding(message.from_user, message.answer, session, state)
+        return
+
+    # The membership check (Bot API) and the upsert (DB) are independent, so
+    # they overlap; a row touched for a non-member is harmless.
+    is_member, user = await asyncio.gather(
+        _is_channel_member(bot, message.from_user.id),
+        _touch_user(message.from_user, session),
+    )
+    if not is_member:
         await message.answer(
-            pick(
-                locale,
-                (
-                    f"🔒 Доступ закрыт\n\n"
-                    f"Чтобы пользоваться ботом, подпишись на канал "
-                    f"{REQUIRED_CHANNEL} — там делюсь инсайтами по "
-                    "лидогенерации в Telegram.\n\n"
-                    "После подписки нажми кнопку ниже 👇"
-                ),
-                (
-                    f"🔒 Access Restricted\n\n"
-                    f"To use this bot, subscribe to {REQUIRED_CHANNEL} — "
-                    "I share Telegram lead generation insights there.\n\n"
-                    "After subscribing, tap the button below 👇"
-                ),
-            ),
+            _TEXTS["access_restricted"][locale],
             reply_markup=_channel_check_keyboard(message.from_user.language_code),
         )
         return
 
-    await _continue_onboarding(message.from_user, message.answer, session, state)
+    await _continue_onboarding(
+        message.from_user, message.answer, session, state, user=user
+    )
 
 
-@router.callback_query(F.data == "check_channel_subscription")
 async def check_channel_subscription_handler(
     callback: CallbackQuery, bot: Bot, session: AsyncSession, state: FSMContext
 ) -> None:
     """Re-checks channel membership and continues onboarding if passed."""
     locale = get_locale(callback.from_user.language_code)
-    if not await _is_channel_member(bot, callback.from_user.id):
-        await callback.answer(
-            pick(
-                locale,
-                f"❌ Вы ещё не подписаны на {REQUIRED_CHANNEL}.\n"
-                "Подпишитесь и попробуйте снова.",
-                f"❌ You are not subscribed to {REQUIRED_CHANNEL} yet.\n"
-                "Subscribe and try again.",
-            ),
-            show_alert=True,
-        )
+    if config.REQUIRE_CHANNEL_SUBSCRIPTION and not await _is_channel_member(
+        bot, callback.from_user.id
+    ):
+        await callback.answer(_TEXTS["not_subscribed"][locale], show_alert=True)
         return
 
     await callback.message.delete()
     await _continue_onboarding(callback.from_user, callback.message.answer, session, state)
     await callback.answer()
 
-@router.callback_query(F.data == "main_menu")
 async def main_menu_callback_handler(
     callback: CallbackQuery, session: AsyncSession, state: FSMContext
 ):
     """Handler for the 'Back to Main Menu' button."""
-    logging.info("Handling 'main_menu' callback")
-    await _touch_user(callback.from_user, session)
+    logger.debug("Handling 'main_menu' callback for user %s", callback.from_user.id)
+    # Stop the client spinner first; nothing below needs the answer.
+    await callback.answer()
+    activity.mark_active(callback.from_user.id)
     await state.clear()
     await callback.message.edit_text(
         get_main_menu_text(callback.from_user.language_code),
         reply_markup=get_main_menu_keyboard(callback.from_user.language_code),
     )
-    await callback.answer()
 
 # --- Stub handlers for main menu buttons ---
 
-@router.callback_query(F.data == "statistics")
 async def statistics_stub(callback: CallbackQuery):
-    logging.warning("Handler 'statistics' is a stub.")
+    logger.debug("Handler 'statistics' is a stub.")
     locale = get_locale(callback.from_user.language_code)
-    await callback.answer(
-        pick(
-            locale,
-            "Вы выбрали 'Статистика'. Этот раздел в разработке.",
-            "You selected 'Statistics'. This section is under development.",
-        )
-    )
+    await callback.answer(_TEXTS["statistics_stub"][locale])
 
-@router.callback_query(F.data.in_({"settings", "profile_menu"}))
 async def profile_menu_handler(callback: CallbackQuery, session: AsyncSession):
-    user = await _touch_user(callback.from_user, session)
+    # Navigation only needs the row; the write is left to the activity flusher.
+    # The lookup and the callback answer hit different backends, so they
+    # overlap instead of holding the spinner for the DB round trip.
+    user, _ = await asyncio.gather(
+        session.get(User, callback.from_user.id), callback.answer()
+    )
+    if user:
+        activity.mark_active(callback.from_user.id)
+    else:
+        user = await _touch_user(callback.from_user, session)
     await callback.message.edit_text(
         _render_settings_text(
             user.services_description,
@@ -235,7 +348,6 @@ async def profile_menu_handler(callback: CallbackQuery, session: AsyncSession):
         ),
         reply_markup=_get_settings_keyboard(callback.from_user.language_code),
     )
-    await callback.answer()
 
 
 async def settings_handler(callback: CallbackQuery, session: AsyncSession):
@@ -243,24 +355,41 @@ async def settings_handler(callback: CallbackQuery, session: AsyncSession):
     await profile_menu_handler(callback, session)
 
 
-@router.callback_query(F.data == "edit_services_description")
 async def edit_services_description_handler(
     callback: CallbackQuery, state: FSMContext
 ):
     locale = get_locale(callback.from_user.language_code)
+    await callback.answer()
     await state.set_state(UserProfile.enter_services_description)
     await state.update_data(profile_flow="settings")
     await callback.message.edit_text(
-        pick(
-            locale,
-            "✏️ Введите новое описание услуг одним сообщением.\n\n"
-            "💡 Пример: «Настраиваю AI-автоматизацию для e-commerce».",
-            "✏️ Enter your new services description in one message.\n\n"
-            "💡 Example: “I implement AI automation for e-commerce.”",
-        ),
+        _TEXTS["edit_services_prompt"][locale],
         reply_markup=_get_settings_keyboard(callback.from_user.language_code),
     )
-    await callback.answer()
+
+
+# callback_data -> handler. One filter and a dict lookup replace a filter per
+# button; each handler gets only the injected arguments it declares.
+_CALLBACK_HANDLERS = {
+    "check_channel_subscription": check_channel_subscription_handler,
+    "main_menu": main_menu_callback_handler,
+    "statistics": statistics_stub,
+    "settings": profile_menu_handler,
+    "profile_menu": profile_menu_handler,
+    "edit_services_description": edit_services_description_handler,
+}
+_CALLBACK_PARAMS = {
+    data: tuple(inspect.signature(handler).parameters)[1:]
+    for data, handler in _CALLBACK_HANDLERS.items()
+}
+
+
+@router.callback_query(F.data.in_(_CALLBACK_HANDLERS.keys()))
+async def dispatch_callback(callback: CallbackQuery, **data: Any) -> Any:
+    """Routes the start/profile buttons through ``_CALLBACK_HANDLERS``."""
+    handler = _CALLBACK_HANDLERS[callback.data]
+    kwargs = {name: data[name] for name in _CALLBACK_PARAMS[callback.data]}
+    return await handler(callback, **kwargs)
 
 
 @router.message(UserProfile.enter_services_description)
@@ -269,53 +398,39 @@ async def save_services_description_handler(
 ):
     locale = get_locale(message.from_user.language_code)
     description = (message.text or "").strip()
-    if len(description) < 10:
-        await message.answer(
-            pick(
-                locale,
-                "⚠️ Описание слишком короткое. Напишите подробнее "
-                "(10+ символов).",
-                "⚠️ Description is too short. Please provide at least "
-                "10 characters.",
-            )
-        )
-        return
 
-    user = await _touch_user(message.from_user, session)
+    # The user reached this state through /start, so the row normally exists
+    # and a primary-key get suffices; the upsert covers a missing row.
+    user = await session.get(User, message.from_user.id)
+    if user is None:
+        user = await _touch_user(message.from_user, session)
+    user.username = message.from_user.username
     user.services_description = description
-    user.last_active_at = datetime.datetime.now(datetime.timezone.utc).replace(
-        tzinfo=None
-    )
-    await session.commit()
+    user.has_services_description = True
+    user.last_active_at = utc_now_sql()
+    try:
+        await session.commit()
+    except IntegrityError:
+        # ck_users_services_description_len rejected the text.
+        await session.rollback()
+        await message.answer(_TEXTS["description_too_short"][locale])
+        return
 
     data = await state.get_data()
     flow = data.get("profile_flow")
     await state.clear()
 
+    # One message per outcome: the confirmation leads the next screen.
     if flow == "onboarding":
         await message.answer(
-            pick(
-                locale,
-                "🎉 Отлично! Сохранил описание услуг.\n"
-                "🤖 Теперь буду использовать его при квалификации лидов.",
-                "🎉 Great! Services description saved.\n"
-                "🤖 I will now use it while qualifying leads.",
-            )
-        )
-        await message.answer(
-            get_main_menu_text(message.from_user.language_code),
+            f"{_TEXTS['description_saved'][locale]}\n\n"
+            f"{get_main_menu_text(message.from_user.language_code)}",
             reply_markup=get_main_menu_keyboard(message.from_user.language_code),
         )
         return
 
     await message.answer(
-        pick(
-            locale,
-            "✅ Описание услуг обновлено.",
-            "✅ Services description updated.",
-        ),
-    )
-    await message.answer(
-        _render_settings_text(description, message.from_user.language_code),
+        f"{_TEXTS['description_updated'][locale]}\n\n"
+        f"{_render_settings_text(description, message.from_user.language_code)}",
         reply_markup=_get_settings_keyboard(message.from_user.language_code),
     )
@@ -1,4 +1,7 @@
+import asyncio
 import logging
+import re
+from functools import lru_cache
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, LabeledPrice, Message, PreCheckoutQuery
@@ -8,11 +11,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from bot.models.user import User
 from bot.services.subscription import (
     STARS_PRICES,
-    activate_paid_subscription,
+    activate_paid_subscription_by_id,
     check_weekly_analysis_limit,
+    downgrade_expired_subscription,
     is_paid_user,
     normalize_subscription,
 )
+from bot.services import user_cache
 from bot.i18n import get_locale, pick
 from bot.ui.main_menu import get_main_menu_keyboard
 
@@ -28,17 +33,38 @@ def _period_label(period_key: str) -> str:
     return _PERIOD_LABELS.get(period_key, period_key)
 
 
+def _period_button_text(period_key: str) -> str:
+    discount = _PERIOD_DISCOUNTS[period_key]
+    discount_str = f" (-{discount}%)" if discount else ""
+    return f"{_period_label(period_key)} — ⭐ {STARS_PRICES[period_key]}{discount_str}"
+
+
+# (text, callback_data) for each paid period, in menu order.
+_PERIOD_BUTTONS: tuple[tuple[str, str], ...] = tuple(
+    (_period_button_text(period_key), f"buy_sub_{period_key}")
+    for period_key in ("1m", "3m", "6m", "12m")
+)
+
+# Invoice payload built in buy_subscription_handler; the period alternation
+# comes from STARS_PRICES so unknown periods fail the match.
+_PAYLOAD_PREFIX = "subscription:"
+_PERIOD_ALTERNATION = "|".join(map(re.escape, STARS_PRICES))
+_PAYLOAD_RE = re.compile(
+    rf"{re.escape(_PAYLOAD_PREFIX)}(?P<user_id>-?\d{{1,19}}):"
+    rf"(?P<period>{_PERIOD_ALTERNATION})"
+)
+
+
 def _subscription_menu_keyboard(language_code: str | None) -> object:
-    locale = get_locale(language_code)
+    return _build_subscription_menu_keyboard(get_locale(language_code))
+
+
+# Prices and labels are fixed at import, so one markup per locale is shared.
+@lru_cache(maxsize=8)
+def _build_subscription_menu_keyboard(locale: str) -> object:
     builder = InlineKeyboardBuilder()
-    for period_key in ("1m", "3m", "6m", "12m"):
-        stars = STARS_PRICES[period_key]
-        discount = _PERIOD_DISCOUNTS[period_key]
-        discount_str = f" (-{discount}%)" if discount else ""
-        builder.button(
-            text=f"{_period_label(period_key)} — ⭐ {stars}{discount_str}",
-            callback_data=f"buy_sub_{period_key}",
-        )
+    for text, callback_data in _PERIOD_BUTTONS:
+        builder.button(text=text, callback_data=callback_data)
     builder.button(
         text="🆘 Поддержка оплаты",
         callback_data="subscription_support",
@@ -52,7 +78,7 @@ def _subscription_menu_keyboard(language_code: str | None) -> object:
 
 
 def _render_subscription_text(user: User) -> str:
-    normalize_subscription(user)
+    # is_paid_user normalizes an expired plan itself.
     paid = is_paid_user(user)
     if paid and user.subscription_expires_at:
         status = f"💚 Paid до {user.subscription_expires_at.strftime('%d.%m.%Y')}"
@@ -80,7 +106,7 @@ async def subscription_menu_handler(
     callback: CallbackQuery, session: AsyncSession
 ) -> None:
     locale = get_locale(callback.from_user.language_code)
-    user = await session.get(User, callback.from_user.id)
+    user = await user_cache.get_user(session, callback.from_user.id)
     if not user:
         await callback.answer(
             pick(
@@ -91,11 +117,15 @@ async def subscription_menu_handler(
             show_alert=True,
         )
         return
+    if normalize_subscription(user):
+        # Write the downgrade back so stats stop counting the expired plan.
+        await downgrade_expired_subscription(session, user.telegram_id)
+        await session.commit()
+        user_cache.invalidate(user.telegram_id)
     await callback.message.edit_text(
         _render_subscription_text(user),
         reply_markup=_subscription_menu_keyboard(callback.from_user.language_code),
     )
-    await session.commit()
     await callback.answer()
 
 
@@ -104,7 +134,7 @@ async def buy_subscription_handler(
     callback: CallbackQuery, session: AsyncSession
 ) -> None:
     locale = get_locale(callback.from_user.language_code)
-    user = await session.get(User, callback.from_user.id)
+    user = await user_cache.get_user(session, callback.from_user.id)
     if not user:
         await callback.answer(
             pick(
@@ -116,7 +146,7 @@ async def buy_subscription_handler(
         )
         return
 
-    period_key = callback.data.split("_")[-1]
+    period_key = callback.data.removeprefix("buy_sub_")
     if period_key not in STARS_PRICES:
         await callback.answer(
             pick(
@@ -134,7 +164,7 @@ async def buy_subscription_handler(
         f"LeadCore — подписка {_period_label(period_key)}",
         f"LeadCore — subscription {_period_label(period_key)}",
     )
-    payload = f"subscription:{user.telegram_id}:{period_key}"
+    payload = f"{_PAYLOAD_PREFIX}{user.telegram_id}:{period_key}"
 
     await callback.message.answer_invoice(
         title=title,
@@ -150,9 +180,24 @@ async def buy_subscription_handler(
     await callback.answer(pick(locale, "Инвойс отправлен.", "Invoice sent."))
 
 
+# Strong references to in-flight background answers; the loop keeps only
+# weak ones, so an unreferenced task could be collected before it runs.
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _on_background_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error("Pre-checkout answer failed", exc_info=task.exception())
+
+
 @router.pre_checkout_query()
 async def pre_checkout_handler(pre_checkout_query: PreCheckoutQuery) -> None:
-    await pre_checkout_query.answer(ok=True)
+    # Nothing is checked before approving, so the answer is sent in the
+    # background and the update slot is released right away.
+    task = asyncio.create_task(pre_checkout_query.answer(ok=True))
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_done)
 
 
 @router.message(F.successful_payment)
@@ -164,30 +209,19 @@ async def successful_payment_handler(
     if not payment:
         return
 
-    payload = payment.invoice_payload or ""
-    parts = payload.split(":")
-    if len(parts) != 3 or parts[0] != "subscription":
+    match = _PAYLOAD_RE.fullmatch(payment.invoice_payload or "")
+    if match is None:
         await message.answer("Платёж получен, но payload не распознан.")
         return
+    user_id = int(match["user_id"])
+    period_key = match["period"]
 
-    _, user_id_raw, period_key = parts
-    if period_key not in STARS_PRICES:
-        await message.answer("Платёж получен, но период не распознан.")
-        return
-
-    try:
-        user_id = int(user_id_raw)
-    except ValueError:
-        await message.answer("Платёж получен, но user_id не распознан.")
-        return
-
-    user = await session.get(User, user_id)
-    if not user:
+    expires_at = await activate_paid_subscription_by_id(session, user_id, period_key)
+    if expires_at is None:
         await message.answer("Платёж получен, но профиль не найден.")
         return
-
-    expires_at = activate_paid_subscription(user, period_key)
     await session.commit()
+    user_cache.invalidate(user_id)
 
     await message.answer(
         pick(
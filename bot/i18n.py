@@ -1,6 +1,7 @@
 """Simple i18n helpers with optional fluentogram integration."""
 from __future__ import annotations
 
+from operator import itemgetter
 from pathlib import Path
 from typing import Any
 import logging
@@ -52,6 +53,18 @@ def pick(locale: str, ru: str, en: str) -> str:
     return en if locale == "en" else ru
 
 
+_PICKERS: dict[str, Any] = {"ru": itemgetter(0), "en": itemgetter(1)}
+
+
+def picker(locale: str) -> Any:
+    """Return a selector for ``(ru, en)`` pairs, resolved once per locale.
+
+    Handlers that choose several strings compute it once and then index each
+    pair instead of calling ``pick`` with the locale every time.
+    """
+    return _PICKERS.get(locale, _PICKERS["ru"])
+
+
 class _FluentogramAdapter:
     """Optional fluentogram wrapper with graceful fallback."""
 
@@ -19,12 +19,15 @@ from bot.handlers import (
     admin_panel,
 )
 from bot.middleware.db_session import DbSessionMiddleware
+from bot.middleware.rate_limit import SendRateLimitMiddleware
 from bot.models.base import Base
 from bot.models.program import Program, ProgramChat
 from bot.models.lead import Lead
 from bot.models.pain import Pain, PainCluster, GeneratedPost
 from bot.models.user import User
-from bot.scheduler import scheduler, schedule_program_job
+from bot.models.stats import STATS_SNAPSHOT_DDL, StatsSnapshot
+from bot.scheduler import scheduler, schedule_program_job, schedule_stats_refresh
+from bot.services import activity
 
 
 async def create_tables() -> None:
@@ -33,6 +36,200 @@ async def create_tables() -> None:
         await conn.run_sync(Base.metadata.create_all)
 
 
+# Idempotent DDL for schema changes that create_all() does not apply to
+# tables which already exist.
+_MIGRATIONS: tuple[str, ...] = (
+    "CREATE INDEX IF NOT EXISTS ix_lead_program_user_created "
+    "ON leads (program_id, user_id, created_at DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_pain_clusters_program "
+    "ON pain_clusters (program_id, last_seen)",
+    "DROP INDEX IF EXISTS ix_pain_clusters_program_id",
+    "CREATE INDEX IF NOT EXISTS ix_pains_program_cluster_time "
+    "ON pains (program_id, cluster_id, collected_at)",
+    "CREATE INDEX IF NOT EXISTS ix_pains_cluster_id ON pains (cluster_id)",
+    "CREATE INDEX IF NOT EXISTS ix_generated_posts_cluster_generated "
+    "ON generated_posts (cluster_id, generated_at DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_programs_user_id_id ON programs (user_id, id)",
+    "DROP INDEX IF EXISTS ix_programs_user_id",
+    "CREATE INDEX IF NOT EXISTS ix_programs_active_autocollect "
+    "ON programs (owner_chat_id) "
+    "WHERE auto_collect_enabled = true AND owner_chat_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_program_chats_program_username "
+    "ON program_chats (program_id, chat_username)",
+    "ALTER TABLE users ALTER COLUMN last_active_at "
+    "SET DEFAULT timezone('utc', now())",
+    "ALTER TABLE users ALTER COLUMN created_at "
+    "SET DEFAULT timezone('utc', now())",
+    "ALTER TABLE programs ALTER COLUMN created_at "
+    "SET DEFAULT timezone('utc', now())",
+    "ALTER TABLE leads ALTER COLUMN created_at "
+    "SET DEFAULT timezone('utc', now())",
+    "ALTER TABLE pains ALTER COLUMN collected_at "
+    "SET DEFAULT timezone('utc', now())",
+    "ALTER TABLE generated_posts ALTER COLUMN generated_at "
+    "SET DEFAULT timezone('utc', now())",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS "
+    "has_services_description boolean NOT NULL DEFAULT false",
+    "UPDATE users SET has_services_description = true "
+    "WHERE NOT has_services_description "
+    "AND btrim(coalesce(services_description, '')) <> ''",
+    # Widens INT4 keys (and the columns pointing at them) to bigint and lifts
+    # the serial sequences' INT4 cap. Only columns still typed integer are
+    # altered, so the table rewrites happen once.
+    """
+    DO $$
+    DECLARE
+        col record;
+        seq text;
+    BEGIN
+        FOR col IN
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND data_type = 'integer'
+              AND (table_name, column_name) IN (
+                  ('programs', 'id'),
+                  ('program_chats', 'program_id'),
+                  ('leads', 'id'),
+                  ('leads', 'program_id'),
+                  ('pain_clusters', 'id'),
+                  ('pain_clusters', 'program_id'),
+                  ('pains', 'id'),
+                  ('pains', 'program_id'),
+                  ('pains', 'cluster_id'),
+                  ('pains', 'source_message_id'),
+                  ('pains', 'source_user_id'),
+                  ('generated_posts', 'id'),
+                  ('generated_posts', 'cluster_id')
+              )
+        LOOP
+            EXECUTE format(
+                'ALTER TABLE %I ALTER COLUMN %I TYPE bigint',
+                col.table_name, col.column_name
+            );
+            seq := pg_get_serial_sequence(
+                quote_ident(col.table_name), col.column_name
+            );
+            IF seq IS NOT NULL THEN
+                EXECUTE format('ALTER SEQUENCE %s AS bigint', seq);
+            END IF;
+        END LOOP;
+    END
+    $$
+    """,
+    # Leads' raw blobs move from json to jsonb; guarded so the USING cast
+    # (which rewrites the table) only runs while a column is still json.
+    """
+    DO $$
+    DECLARE
+        col record;
+    BEGIN
+        FOR col IN
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'leads'
+              AND data_type = 'json'
+              AND column_name IN (
+                  'raw_qualification_data', 'raw_user_profile_data'
+              )
+        LOOP
+            EXECUTE format(
+                'ALTER TABLE leads ALTER COLUMN %1$I TYPE jsonb USING %1$I::jsonb',
+                col.column_name
+            );
+        END LOOP;
+    END
+    $$
+    """,
+    # Lead usernames are stored case-folded without "@". One-shot backfill,
+    # skipped once the case-insensitive index exists: rows collapsing into
+    # the same key are merged into the newest one, which inherits the most
+    # recent non-"new" outreach status of the rows it absorbs.
+    """
+    DO $$
+    DECLARE
+        merged integer;
+    BEGIN
+        IF to_regclass('uq_lead_program_username_ci') IS NOT NULL THEN
+            RETURN;
+        END IF;
+
+        ALTER TABLE leads DROP CONSTRAINT IF EXISTS uq_lead_program_username;
+
+        WITH ranked AS (
+            SELECT
+                id,
+                status,
+                first_value(id) OVER w AS keep_id,
+                row_number() OVER w AS rn
+            FROM leads
+            WHERE program_id IS NOT NULL
+            WINDOW w AS (
+                PARTITION BY program_id, lower(ltrim(telegram_username, '@'))
+                ORDER BY created_at DESC NULLS LAST, id DESC
+            )
+        ),
+        carried AS (
+            UPDATE leads AS kept
+            SET status = dup.status
+            FROM (
+                SELECT DISTINCT ON (keep_id) keep_id, status
+                FROM ranked
+                WHERE rn > 1 AND coalesce(status, 'new') <> 'new'
+                ORDER BY keep_id, rn
+            ) AS dup
+            WHERE kept.id = dup.keep_id
+              AND coalesce(kept.status, 'new') = 'new'
+        )
+        DELETE FROM leads
+        WHERE id IN (SELECT id FROM ranked WHERE rn > 1);
+        GET DIAGNOSTICS merged = ROW_COUNT;
+        RAISE NOTICE 'leads: merged % case-duplicate rows', merged;
+
+        UPDATE leads SET telegram_username = lower(ltrim(telegram_username, '@'))
+        WHERE telegram_username <> lower(ltrim(telegram_username, '@'));
+
+        CREATE UNIQUE INDEX uq_lead_program_username_ci
+        ON leads (program_id, lower(telegram_username));
+    END
+    $$
+    """,
+    # NOT VALID: enforced for new writes without rejecting legacy rows.
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = 'ck_users_services_description_len'
+        ) THEN
+            ALTER TABLE users ADD CONSTRAINT ck_users_services_description_len
+            CHECK (
+                services_description IS NULL
+                OR char_length(services_description) >= 10
+            ) NOT VALID;
+        END IF;
+    END
+    $$
+    """,
+    *STATS_SNAPSHOT_DDL,
+)
+
+
+async def run_migrations() -> None:
+    """Applies startup migrations to an existing database schema.
+
+    The statements are sent as one script over asyncpg's simple query
+    protocol, which takes a single round trip and runs the whole script in
+    one implicit transaction. SQLAlchemy's execute() prepares statements and
+    so cannot carry more than one.
+    """
+    script = ";\n".join(statement.strip() for statement in _MIGRATIONS)
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.execute(script)
+
+
 async def restore_scheduled_jobs() -> None:
     """Re-registers APScheduler jobs for programs that have no active job.
 
@@ -40,27 +237,37 @@ async def restore_scheduled_jobs() -> None:
     are already there. This function handles the case where the jobstore was
     reset or a program was created before scheduling was implemented.
     """
+    # Jobs the store already has are excluded in SQL, so a warm jobstore
+    # makes the query return nothing instead of one row per program.
+    scheduled_ids = [
+        int(job.id.removeprefix("program_"))
+        for job in scheduler.get_jobs()
+        if job.id.startswith("program_")
+    ]
+    query = select(
+        Program.id, Program.owner_chat_id, Program.schedule_time, Program.name
+    ).where(
+        Program.auto_collect_enabled.is_(True),
+        Program.owner_chat_id.isnot(None),
+    )
+    if scheduled_ids:
+        query = query.where(Program.id.notin_(scheduled_ids))
+
     async with async_session() as session:
-        query = select(Program).where(
-            Program.auto_collect_enabled.is_(True),
-            Program.owner_chat_id.isnot(None),
-        )
-        programs = (await session.execute(query)).scalars().all()
-
-    for program in programs:
-        job_id = f"program_{program.id}"
-        if not scheduler.get_job(job_id):
-            schedule_program_job(program.id, program.owner_chat_id, program.schedule_time)
-            logging.info(
-                f"[Startup] Restored job for program '{program.name}' (id={program.id})"
-            )
+        rows = (await session.execute(query)).all()
+
+    for row in rows:
+        schedule_program_job(row.id, row.owner_chat_id, row.schedule_time)
+        logging.info(f"[Startup] Restored job for program '{row.name}' (id={row.id})")
 
 
 async def main(bot_token: str) -> None:
     """Bot entry point."""
     await create_tables()
+    await run_migrations()
 
     bot = Bot(token=bot_token, parse_mode="HTML")
+    bot.session.middleware(SendRateLimitMiddleware())
     dp = Dispatcher(
         storage=MemoryStorage(),
         bot=bot,
@@ -81,10 +288,16 @@ async def main(bot_token: str) -> None:
     dp.include_router(admin_panel.router)
 
     dp.shutdown.register(scheduler.shutdown)
+    dp.shutdown.register(activity.stop)
 
     scheduler.start()
-    await restore_scheduled_jobs()
+    schedule_stats_refresh()
+    activity.start()
+    # Job restore (DB) and webhook removal (Bot API) are independent.
+    await asyncio.gather(
+        restore_scheduled_jobs(),
+        bot.delete_webhook(drop_pending_updates=True),
+    )
 
     logging.info("Starting bot...")
-    await bot.delete_webhook(drop_pending_updates=True)
     await dp.start_polling(bot)
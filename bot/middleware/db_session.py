@@ -16,4 +16,10 @@ class DbSessionMiddleware(BaseMiddleware):
     ) -> Any:
         async with self.session_pool() as session:
             data["session"] = session
-            return await handler(event, data)
+            result = await handler(event, data)
+            # One commit for whatever the handler left pending; handlers that
+            # already committed leave no transaction open. On error the
+            # session closes and rolls back.
+            if session.in_transaction():
+                await session.commit()
+            return result
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any
+
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.methods import Response, TelegramMethod
+
+from bot.services.telegram_send import send_with_retry
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+# Bot API guidance: ~30 messages/s overall and ~1 message/s per chat.
+GLOBAL_RATE = 30.0
+PER_CHAT_RATE = 1.0
+PER_CHAT_BURST = 3.0
+PER_CHAT_MAXSIZE = 10_000
+MAX_REQUEST_ATTEMPTS = 8
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SendRateLimitMiddleware(BaseRequestMiddleware):
+    """Throttles outgoing chat requests before Telegram answers with 429.
+
+    Every request addressed to a chat takes a token from the global bucket;
+    ``send*`` methods also take one from that chat's bucket. Flood-control
+    replies that still get through are waited out and retried.
+    """
+
+    def __init__(self) -> None:
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self.chat_buckets: dict[Any, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= PER_CHAT_MAXSIZE:
+                self.chat_buckets.clear()
+            bucket = TokenBucket(PER_CHAT_RATE, PER_CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[Any],
+        bot: "Bot",
+        method: TelegramMethod[Any],
+    ) -> Response[Any]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None:
+            await self.global_bucket.acquire()
+            if method.__api_method__.startswith("send"):
+                await self._chat_bucket(chat_id).acquire()
+        return await send_with_retry(
+            make_request, bot, method, max_attempts=MAX_REQUEST_ATTEMPTS
+        )
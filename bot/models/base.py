@@ -1,5 +1,13 @@
+import datetime
+
+from sqlalchemy import ColumnElement, DateTime, func
 from sqlalchemy.orm import DeclarativeBase
 
 
 class Base(DeclarativeBase):
     pass
+
+
+def utc_now_sql() -> ColumnElement[datetime.datetime]:
+    """SQL expression for the database's current time as naive UTC."""
+    return func.timezone("utc", func.now(), type_=DateTime)
@@ -5,20 +5,37 @@ from sqlalchemy import (
     String,
     DateTime,
     ForeignKey,
+    Identity,
     Text,
-    JSON,
-    UniqueConstraint,
+    Index,
+    desc,
+    text,
 )
-from sqlalchemy.orm import mapped_column, Mapped, relationship
-from .base import Base
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import mapped_column, Mapped, relationship, validates
+from .base import Base, utc_now_sql
 
 class Lead(Base):
     __tablename__ = 'leads'
     __table_args__ = (
-        UniqueConstraint("program_id", "telegram_username", name="uq_lead_program_username"),
+        # Telegram usernames are case-insensitive; lookups go through
+        # lower() so they are served by this index.
+        Index(
+            "uq_lead_program_username_ci",
+            "program_id",
+            text("lower(telegram_username)"),
+            unique=True,
+        ),
+        # Backs the lead viewer: filter by program+user, newest first.
+        Index(
+            "ix_lead_program_user_created",
+            "program_id",
+            "user_id",
+            desc("created_at"),
+        ),
     )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
     program_id: Mapped[int] = mapped_column(ForeignKey('programs.id', ondelete='SET NULL'), nullable=True)
 
@@ -37,13 +54,22 @@ class Lead(Base):
     recommended_message: Mapped[str] = mapped_column(Text, nullable=True)
     
     # Raw data for full context
-    raw_qualification_data: Mapped[dict] = mapped_column(JSON, nullable=True)
-    raw_user_profile_data: Mapped[dict] = mapped_column(JSON, nullable=True)
+    raw_qualification_data: Mapped[dict] = mapped_column(JSONB, nullable=True)
+    raw_user_profile_data: Mapped[dict] = mapped_column(JSONB, nullable=True)
     raw_llm_input: Mapped[str] = mapped_column(Text, nullable=True)
     
-    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=utc_now_sql())
 
     program: Mapped["Program"] = relationship("Program")
 
+    @staticmethod
+    def normalize_username(username: str) -> str:
+        """Returns the case-folded form usernames are stored and matched in."""
+        return username.lstrip("@").lower()
+
+    @validates("telegram_username")
+    def _validate_telegram_username(self, key: str, value: str) -> str:
+        return self.normalize_username(value)
+
     def __repr__(self) -> str:
         return f"<Lead(id={self.id}, username='{self.telegram_username}', score={self.qualification_score})>"
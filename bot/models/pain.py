@@ -6,20 +6,27 @@ from sqlalchemy import (
     String,
     DateTime,
     ForeignKey,
+    Identity,
     Boolean,
+    Index,
     Text,
     UniqueConstraint,
+    desc,
 )
 from sqlalchemy.orm import mapped_column, Mapped, relationship
-from .base import Base
+from .base import Base, utc_now_sql
 
 
 class PainCluster(Base):
     """Cluster of similar pains grouped by topic."""
 
     __tablename__ = "pain_clusters"
+    __table_args__ = (
+        # Per-program cluster lists; also serves plain program_id filters.
+        Index("ix_pain_clusters_program", "program_id", "last_seen"),
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
     program_id: Mapped[int] = mapped_column(
         ForeignKey("programs.id", ondelete="CASCADE"), nullable=False
@@ -66,9 +73,16 @@ class Pain(Base):
             "source_message_id", "source_chat", "original_quote",
             name="uq_pain_message_quote",
         ),
+        # Unclustered-pain fetches and per-program roll-ups in time order.
+        Index(
+            "ix_pains_program_cluster_time",
+            "program_id",
+            "cluster_id",
+            "collected_at",
+        ),
     )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
     program_id: Mapped[int] = mapped_column(
         ForeignKey("programs.id", ondelete="CASCADE"), nullable=False
@@ -82,13 +96,13 @@ class Pain(Base):
     )
     source_chat: Mapped[str] = mapped_column(String(100), nullable=False)
     source_message_id: Mapped[int] = mapped_column(
-        Integer, nullable=False
+        BigInteger, nullable=False
     )
     source_message_link: Mapped[str | None] = mapped_column(
         String(255), nullable=True
     )
     source_user_id: Mapped[int | None] = mapped_column(
-        Integer, nullable=True
+        BigInteger, nullable=True
     )
     source_username: Mapped[str | None] = mapped_column(
         String(100), nullable=True
@@ -97,10 +111,12 @@ class Pain(Base):
         DateTime, nullable=True
     )
     collected_at: Mapped[datetime.datetime] = mapped_column(
-        DateTime, default=datetime.datetime.utcnow
+        DateTime, server_default=utc_now_sql()
     )
     cluster_id: Mapped[int | None] = mapped_column(
-        ForeignKey("pain_clusters.id", ondelete="SET NULL"), nullable=True
+        ForeignKey("pain_clusters.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
     )
     used_in_post: Mapped[bool] = mapped_column(Boolean, default=False)
 
@@ -120,8 +136,16 @@ class GeneratedPost(Base):
     """Draft post generated from a pain cluster."""
 
     __tablename__ = "generated_posts"
+    __table_args__ = (
+        # Drafts list: filter by cluster, newest first without a sort step.
+        Index(
+            "ix_generated_posts_cluster_generated",
+            "cluster_id",
+            desc("generated_at"),
+        ),
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
     cluster_id: Mapped[int] = mapped_column(
         ForeignKey("pain_clusters.id", ondelete="CASCADE"),
@@ -134,7 +158,7 @@ class GeneratedPost(Base):
         String(20), default="draft"
     )
     generated_at: Mapped[datetime.datetime] = mapped_column(
-        DateTime, default=datetime.datetime.utcnow
+        DateTime, server_default=utc_now_sql()
     )
     published_at: Mapped[datetime.datetime | None] = mapped_column(
         DateTime, nullable=True
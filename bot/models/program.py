@@ -5,18 +5,34 @@ from sqlalchemy import (
     String,
     DateTime,
     ForeignKey,
+    Identity,
     Boolean,
-    Text
+    Index,
+    Text,
+    text,
 )
 from sqlalchemy.orm import mapped_column, Mapped, relationship
-from .base import Base
+from .base import Base, utc_now_sql
 import config
 
 class Program(Base):
     __tablename__ = 'programs'
+    __table_args__ = (
+        # Lets per-user program id lookups be served by an index-only scan; it
+        # also covers plain user_id filters, so user_id has no index of its own.
+        Index("ix_programs_user_id_id", "user_id", "id"),
+        # Holds only the rows the startup job restore looks for.
+        Index(
+            "ix_programs_active_autocollect",
+            "owner_chat_id",
+            postgresql_where=text(
+                "auto_collect_enabled = true AND owner_chat_id IS NOT NULL"
+            ),
+        ),
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     niche_description: Mapped[str] = mapped_column(Text, nullable=False)
     
@@ -32,7 +48,7 @@ class Program(Base):
     # Telegram chat ID for scheduler notifications
     owner_chat_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
 
-    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, server_default=utc_now_sql())
     
     chats: Mapped[list["ProgramChat"]] = relationship("ProgramChat", back_populates="program", cascade="all, delete-orphan")
 
@@ -41,6 +57,10 @@ class Program(Base):
 
 class ProgramChat(Base):
     __tablename__ = 'program_chats'
+    # Serves the per-program duplicate check and delete-by-username.
+    __table_args__ = (
+        Index("ix_program_chats_program_username", "program_id", "chat_username"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     program_id: Mapped[int] = mapped_column(ForeignKey('programs.id', ondelete='CASCADE'), nullable=False)
@@ -0,0 +1,62 @@
+import datetime
+
+from sqlalchemy import BigInteger, DateTime, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+STATS_SNAPSHOT_ID = 1
+
+
+class StatsSnapshot(Base):
+    """Single-row table of global counters refreshed on a schedule.
+
+    Lets the admin dashboard read totals in O(1) instead of running
+    COUNT(*) scans over users, programs, leads and clusters on every open.
+    """
+
+    __tablename__ = "stats_snapshot"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    total_users: Mapped[int] = mapped_column(BigInteger, default=0)
+    paid_users: Mapped[int] = mapped_column(BigInteger, default=0)
+    total_programs: Mapped[int] = mapped_column(BigInteger, default=0)
+    total_leads: Mapped[int] = mapped_column(BigInteger, default=0)
+    total_clusters: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime, nullable=True
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<StatsSnapshot(users={self.total_users}, "
+            f"leads={self.total_leads})>"
+        )
+
+
+# Exact totals, written into the single row. Run at startup and then
+# periodically by the scheduler, off the write path of the counted tables.
+STATS_SNAPSHOT_REFRESH_SQL = """
+    INSERT INTO stats_snapshot (
+        id, total_users, paid_users, total_programs, total_leads,
+        total_clusters, updated_at
+    )
+    SELECT 1,
+        count(*),
+        count(*) FILTER (WHERE subscription_type = 'paid'),
+        (SELECT count(*) FROM programs),
+        (SELECT count(*) FROM leads),
+        (SELECT count(*) FROM pain_clusters),
+        timezone('utc', now())
+    FROM users
+    ON CONFLICT (id) DO UPDATE SET
+        total_users = EXCLUDED.total_users,
+        paid_users = EXCLUDED.paid_users,
+        total_programs = EXCLUDED.total_programs,
+        total_leads = EXCLUDED.total_leads,
+        total_clusters = EXCLUDED.total_clusters,
+        updated_at = EXCLUDED.updated_at
+"""
+
+# Idempotent startup DDL: seeds the snapshot row with exact counts.
+STATS_SNAPSHOT_DDL: tuple[str, ...] = (STATS_SNAPSHOT_REFRESH_SQL,)
@@ -1,17 +1,37 @@
 import datetime
 
-from sqlalchemy import BigInteger, DateTime, String, Text
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    CheckConstraint,
+    DateTime,
+    String,
+    Text,
+    false,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
-from .base import Base
+from .base import Base, utc_now_sql
 
 
 class User(Base):
     __tablename__ = "users"
+    # Minimum services description length, enforced where it is stored.
+    __table_args__ = (
+        CheckConstraint(
+            "services_description IS NULL OR char_length(services_description) >= 10",
+            name="ck_users_services_description_len",
+        ),
+    )
 
     telegram_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     username: Mapped[str | None] = mapped_column(String(100), nullable=True)
     services_description: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Set together with services_description so /start can branch on a flag
+    # instead of loading and stripping the text.
+    has_services_description: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
     subscription_type: Mapped[str] = mapped_column(String(20), default="free")
     subscription_expires_at: Mapped[datetime.datetime | None] = mapped_column(
         DateTime, nullable=True
@@ -20,8 +40,11 @@ class User(Base):
         DateTime, nullable=True
     )
     created_at: Mapped[datetime.datetime] = mapped_column(
-        DateTime, default=datetime.datetime.utcnow
+        DateTime, server_default=utc_now_sql()
     )
+    # Stamped by PostgreSQL (naive UTC, like the other timestamps) on insert.
+    # Later stamps are written explicitly where the user is active, so admin
+    # edits of the row do not count as activity.
     last_active_at: Mapped[datetime.datetime] = mapped_column(
-        DateTime, default=datetime.datetime.utcnow
+        DateTime, server_default=utc_now_sql()
     )
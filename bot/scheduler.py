@@ -48,3 +48,18 @@ def remove_program_job(program_id: int) -> None:
     if scheduler.get_job(job_id):
         scheduler.remove_job(job_id)
         logger.info(f"[Scheduler] Job removed: program_id={program_id}")
+
+
+def schedule_stats_refresh() -> None:
+    """Schedules the periodic recount of the admin dashboard totals."""
+    from bot.services.stats import STATS_REFRESH_INTERVAL, refresh_stats_snapshot
+
+    scheduler.add_job(
+        refresh_stats_snapshot,
+        trigger="interval",
+        seconds=STATS_REFRESH_INTERVAL,
+        id="stats_snapshot_refresh",
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+    )
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+from sqlalchemy import update
+
+from bot.db_config import async_session
+from bot.models.user import User, utc_now_sql
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 5.0
+
+# Users seen since the last flush; repeated taps by one user coalesce into a
+# single pending entry. The whole batch is stamped by the database at flush
+# time, which is at most FLUSH_INTERVAL later than the actual tap.
+_pending: set[int] = set()
+_flusher: asyncio.Task | None = None
+
+
+def mark_active(user_id: int) -> None:
+    """Record that a user was active without touching the database."""
+    _pending.add(user_id)
+
+
+async def flush() -> int:
+    """Write pending last_active_at stamps in one UPDATE.
+
+    Returns:
+        Number of users whose activity was written.
+    """
+    if not _pending:
+        return 0
+    user_ids = list(_pending)
+    _pending.clear()
+
+    stmt = (
+        update(User)
+        .where(User.telegram_id.in_(user_ids))
+        .values(last_active_at=utc_now_sql())
+    )
+    async with async_session() as session:
+        await session.execute(stmt)
+        await session.commit()
+    return len(user_ids)
+
+
+async def _run_flusher(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush()
+        except Exception:
+            logger.exception("Failed to flush user activity")
+
+
+def start(interval: float = FLUSH_INTERVAL) -> None:
+    """Start the background flusher on the running event loop."""
+    global _flusher
+    if _flusher is None or _flusher.done():
+        _flusher = asyncio.create_task(_run_flusher(interval))
+
+
+async def stop() -> None:
+    """Cancel the flusher and write whatever is still pending."""
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+    await flush()
@@ -0,0 +1,42 @@
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.models.program import Program
+
+PROGRAM_IDS_TTL = 30.0
+PROGRAM_IDS_MAXSIZE = 10_000
+
+# user_id -> (cached_at, program_ids); read on every Pains & Content callback.
+_program_ids_cache: dict[int, tuple[float, list[int]]] = {}
+
+
+async def get_program_ids(user_id: int, session: AsyncSession) -> list[int]:
+    """Return the user's program IDs, reusing a result cached within the TTL."""
+    now = time.monotonic()
+    cached = _program_ids_cache.get(user_id)
+    if cached and now - cached[0] < PROGRAM_IDS_TTL:
+        return cached[1]
+
+    result = await session.execute(
+        select(Program.id)
+        .where(Program.user_id == user_id)
+        .order_by(Program.id)
+    )
+    program_ids = [row[0] for row in result.all()]
+
+    if len(_program_ids_cache) >= PROGRAM_IDS_MAXSIZE:
+        _program_ids_cache.clear()
+    _program_ids_cache[user_id] = (now, program_ids)
+    return program_ids
+
+
+def invalidate(user_id: int) -> None:
+    """Drop the cached program IDs after a program is created or deleted."""
+    _program_ids_cache.pop(user_id, None)
+
+
+def clear() -> None:
+    """Drop every cached entry."""
+    _program_ids_cache.clear()
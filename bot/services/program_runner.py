@@ -236,11 +236,11 @@ async def run_program_pipeline(
         logger.info(f"SUCCESS: Qualified @{candidate['username']} with score {score}.")
         qualified_leads_count += 1
 
-        username = candidate['username']
+        username = Lead.normalize_username(candidate['username'])
         existing_lead_query = select(Lead).where(
             Lead.user_id == user_id,
             Lead.program_id == program_id,
-            Lead.telegram_username == username,
+            func.lower(Lead.telegram_username) == username,
         )
         lead = (await session.execute(existing_lead_query)).scalars().first()
 
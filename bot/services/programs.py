@@ -0,0 +1,29 @@
+from collections.abc import Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.base import ExecutableOption
+
+from bot.models.program import Program
+
+
+async def get_owned_program(
+    session: AsyncSession,
+    program_id: int,
+    user_id: int,
+    options: Sequence[ExecutableOption] | None = None,
+) -> Program | None:
+    """Fetch a program by primary key if it belongs to ``user_id``.
+
+    An identity-map hit would ignore ``options`` (e.g. an eager load of
+    ``Program.chats``), so when options are given the row is re-read and
+    populated with them.
+    """
+    program = await session.get(
+        Program,
+        program_id,
+        options=options,
+        populate_existing=bool(options),
+    )
+    if program is None or program.user_id != user_id:
+        return None
+    return program
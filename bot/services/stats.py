@@ -0,0 +1,19 @@
+import logging
+
+from sqlalchemy import text
+
+from bot.db_config import async_session
+from bot.models.stats import STATS_SNAPSHOT_REFRESH_SQL
+
+logger = logging.getLogger(__name__)
+
+# How stale the admin dashboard totals may get.
+STATS_REFRESH_INTERVAL = 600
+
+
+async def refresh_stats_snapshot() -> None:
+    """Recount the dashboard totals into the stats_snapshot row."""
+    async with async_session() as session:
+        await session.execute(text(STATS_SNAPSHOT_REFRESH_SQL))
+        await session.commit()
+    logger.debug("Stats snapshot refreshed")
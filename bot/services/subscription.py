@@ -1,10 +1,10 @@
 import datetime
 
-from sqlalchemy import func, select
+from sqlalchemy import Integer, cast, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.models.program import Program
-from bot.models.user import User
+from bot.models.user import User, utc_now_sql
 
 PAID_PERIODS_MONTHS = {
     "1m": 1,
@@ -25,7 +25,8 @@ def _utc_now() -> datetime.datetime:
     return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
 
 
-def normalize_subscription(user: User) -> None:
+def normalize_subscription(user: User) -> bool:
+    """Downgrade an expired paid subscription; return True if user changed."""
     if (
         user.subscription_type == "paid"
         and user.subscription_expires_at
@@ -33,6 +34,8 @@ def normalize_subscription(user: User) -> None:
     ):
         user.subscription_type = "free"
         user.subscription_expires_at = None
+        return True
+    return False
 
 
 def is_paid_user(user: User) -> bool:
@@ -46,11 +49,9 @@ async def check_program_limit(
     if is_paid_user(user):
         return True, None
 
-    program_count = (
-        await session.execute(
-            select(func.count(Program.id)).where(Program.user_id == user.telegram_id)
-        )
-    ).scalar_one()
+    program_count = await session.scalar(
+        select(func.count(Program.id)).where(Program.user_id == user.telegram_id)
+    )
     if program_count >= 1:
         return (
             False,
@@ -98,3 +99,52 @@ def activate_paid_subscription(user: User, period_key: str) -> datetime.datetime
     user.subscription_type = "paid"
     user.subscription_expires_at = new_expiry
     return new_expiry
+
+
+async def activate_paid_subscription_by_id(
+    session: AsyncSession, user_id: int, period_key: str
+) -> datetime.datetime | None:
+    """Extend a user's paid subscription in one UPDATE ... RETURNING.
+
+    Same rules as ``activate_paid_subscription``: the period starts at the
+    current expiry if it is still in the future, otherwise now, and the
+    expiry day is capped at 28. The caller commits.
+
+    Returns:
+        The new expiry, or None if the user does not exist.
+    """
+    months = PAID_PERIODS_MONTHS[period_key]
+    now = utc_now_sql()
+    start = func.greatest(now, func.coalesce(User.subscription_expires_at, now))
+    # Step back to day 28 at most before adding months, so the month
+    # arithmetic never has to clamp and the result matches add_months().
+    overflow_days = func.greatest(cast(func.extract("day", start), Integer) - 28, 0)
+    new_expiry = (
+        start
+        - func.make_interval(0, 0, 0, overflow_days)
+        + func.make_interval(0, months)
+    )
+    stmt = (
+        update(User)
+        .where(User.telegram_id == user_id)
+        .values(subscription_type="paid", subscription_expires_at=new_expiry)
+        .returning(User.subscription_expires_at)
+    )
+    return (await session.execute(stmt)).scalar_one_or_none()
+
+
+async def downgrade_expired_subscription(session: AsyncSession, user_id: int) -> None:
+    """Persist the free plan for a user whose paid subscription has expired.
+
+    The expiry is re-checked in SQL, so a renewal that landed after the
+    caller's snapshot was taken is left alone. The caller commits.
+    """
+    await session.execute(
+        update(User)
+        .where(
+            User.telegram_id == user_id,
+            User.subscription_type == "paid",
+            User.subscription_expires_at <= utc_now_sql(),
+        )
+        .values(subscription_type="free", subscription_expires_at=None)
+    )
@@ -0,0 +1,37 @@
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable
+
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+MAX_SEND_ATTEMPTS = 3
+
+
+async def send_with_retry(
+    send: Callable[..., Awaitable[Any]],
+    *args: Any,
+    max_attempts: int = MAX_SEND_ATTEMPTS,
+    **kwargs: Any,
+) -> Any:
+    """Call a Bot API send, waiting out flood control between attempts.
+
+    Telegram tells us how long to back off in ``retry_after``; a little
+    jitter keeps retries from several handlers from landing together.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return await send(*args, **kwargs)
+        except TelegramRetryAfter as exc:
+            if attempt == max_attempts:
+                raise
+            delay = exc.retry_after * (1 + random.random() / 10)
+            logger.warning(
+                "Flood control on attempt %s/%s, retrying in %.1fs",
+                attempt,
+                max_attempts,
+                delay,
+            )
+            await asyncio.sleep(delay)
@@ -0,0 +1,55 @@
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.models.user import User
+
+USER_TTL = 30.0
+USER_MAXSIZE = 10_000
+
+# telegram_id -> (cached_at, detached snapshot); read by subscription menus.
+_user_cache: dict[int, tuple[float, User]] = {}
+
+
+def _snapshot(user: User) -> User:
+    # A transient copy of just the fields the menus read; it is never
+    # attached to a session, so callers may normalize it freely.
+    return User(
+        telegram_id=user.telegram_id,
+        username=user.username,
+        subscription_type=user.subscription_type,
+        subscription_expires_at=user.subscription_expires_at,
+        last_analysis_at=user.last_analysis_at,
+    )
+
+
+async def get_user(session: AsyncSession, user_id: int) -> User | None:
+    """Return a read-only user snapshot, reusing one cached within the TTL.
+
+    Only for rendering; code that changes the user must load it from the
+    session instead.
+    """
+    now = time.monotonic()
+    cached = _user_cache.get(user_id)
+    if cached and now - cached[0] < USER_TTL:
+        return cached[1]
+
+    user = await session.get(User, user_id)
+    if user is None:
+        return None
+
+    snapshot = _snapshot(user)
+    if len(_user_cache) >= USER_MAXSIZE:
+        _user_cache.clear()
+    _user_cache[user_id] = (now, snapshot)
+    return snapshot
+
+
+def invalidate(user_id: int) -> None:
+    """Drop the cached snapshot after the user's subscription changes."""
+    _user_cache.pop(user_id, None)
+
+
+def clear() -> None:
+    """Drop every cached entry."""
+    _user_cache.clear()
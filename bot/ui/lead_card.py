@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from html import escape
@@ -11,6 +13,7 @@ _STATUS_LABEL = {
 }
 
 
+@lru_cache(maxsize=2048)
 def get_lead_card_keyboard(lead_id: int, status: str = "new") -> InlineKeyboardMarkup:
     """Returns outreach action buttons based on current lead status."""
     builder = InlineKeyboardBuilder()
@@ -25,6 +28,7 @@ def get_lead_card_keyboard(lead_id: int, status: str = "new") -> InlineKeyboardM
     return builder.as_markup()
 
 
+@lru_cache(maxsize=2048)
 def get_lead_navigation_keyboard(
     program_id: int,
     current_page: int,
@@ -79,9 +83,27 @@ def get_lead_navigation_keyboard(
     return builder.as_markup()
 
 
-def format_lead_card(lead: Lead, index: int, total: int) -> str:
-    """Formats a Lead object into a message string for the bot."""
-    program_name = lead.program.name if lead.program else "N/A"
+_CARD_HEADER_TMPL = (
+    "🎯 Лид #{index} из {total}\n"
+    "Программа: {program_name}\n"
+    "━━━━━━━━━━━━━\n\n"
+    "👤 @{username}\n"
+    "⭐ Оценка: {score}/5\n"
+    "{status_line}"
+)
+
+
+def format_lead_card(
+    lead: Lead, index: int, total: int, program_name: str | None = None
+) -> str:
+    """Formats a Lead (or a row with the same columns) into a message string.
+
+    `program_name` lets callers pass a pre-joined name instead of relying on
+    the `Lead.program` relationship being loaded.
+    """
+    if program_name is None and getattr(lead, "program", None):
+        program_name = lead.program.name
+    program_name = program_name or "N/A"
 
     raw_data = lead.raw_qualification_data or {}
     profile_data = lead.raw_user_profile_data or {}
@@ -90,30 +112,30 @@ def format_lead_card(lead: Lead, index: int, total: int) -> str:
     product_idea = raw_data.get("product_idea") or {}
 
     status_label = _STATUS_LABEL.get(lead.status, "")
-    status_line = f"{status_label}\n" if status_label else ""
-
-    card = (
-        f"🎯 Лид #{index} из {total}\n"
-        f"Программа: {program_name}\n"
-        f"━━━━━━━━━━━━━\n\n"
-        f"👤 @{lead.telegram_username}\n"
-        f"⭐ Оценка: {lead.qualification_score}/5\n"
-        f"{status_line}"
-    )
+    parts = [
+        _CARD_HEADER_TMPL.format(
+            index=index,
+            total=total,
+            program_name=program_name,
+            username=lead.telegram_username,
+            score=lead.qualification_score,
+            status_line=f"{status_label}\n" if status_label else "",
+        )
+    ]
 
     reasoning = qualification.get("reasoning")
     if reasoning:
-        card += f"💭 {reasoning}\n"
+        parts.append(f"💭 {reasoning}\n")
 
-    card += "\n"
+    parts.append("\n")
 
     business_scale = identification.get("business_scale")
-    card += f"💼 Бизнес:\n{lead.business_summary or 'Нет данных'}"
+    parts.append(f"💼 Бизнес:\n{lead.business_summary or 'Нет данных'}")
     if business_scale:
-        card += f" ({business_scale})"
-    card += "\n\n"
+        parts.append(f" ({business_scale})")
+    parts.append("\n\n")
 
-    card += f"😤 Боли:\n{lead.pains_summary or 'Нет данных'}\n\n"
+    parts.append(f"😤 Боли:\n{lead.pains_summary or 'Нет данных'}\n\n")
 
     source_chat_username = profile_data.get("source_chat_username")
     source_chat = profile_data.get("source_chat")
@@ -129,47 +151,44 @@ def format_lead_card(lead: Lead, index: int, total: int) -> str:
     elif source_chat_id:
         chat_label = f"id:{source_chat_id}"
 
-    card += "📍 Источник:\n"
-    card += f"• Чат: {chat_label}\n"
+    parts.append(f"📍 Источник:\n• Чат: {chat_label}\n")
     if messages_in_chat:
-        card += f"• Сообщений кандидата: {messages_in_chat}\n"
-    card += "\n"
+        parts.append(f"• Сообщений кандидата: {messages_in_chat}\n")
+    parts.append("\n")
 
     if messages_meta:
-        card += "💬 Сообщения из чата:\n"
+        parts.append("💬 Сообщения из чата:\n")
         for msg in messages_meta[:3]:
             text = str(msg.get("text") or "").strip()
             text_short = text[:180] + ("..." if len(text) > 180 else "")
             age = msg.get("age_display")
-            freshness = msg.get("freshness")
             link = msg.get("link")
 
-            prefix = ""
-            if freshness == "hot":
-                prefix = "🔥 "
-
+            prefix = "🔥 " if msg.get("freshness") == "hot" else ""
             age_label = f"[{age}] " if age else ""
             if text_short:
-                card += f"• {prefix}{age_label}\"{escape(text_short)}\"\n"
+                parts.append(f"• {prefix}{age_label}\"{escape(text_short)}\"\n")
             if link:
                 link_value = str(link)
                 if not link_value.startswith(("http://", "https://")):
                     link_value = f"https://{link_value}"
-                card += f"  🔗 {link_value}\n"
-        card += "\n"
+                parts.append(f"  🔗 {link_value}\n")
+        parts.append("\n")
 
-    card += f"💡 Что предложить:\n{lead.solution_idea or 'Нет данных'}\n"
+    parts.append(f"💡 Что предложить:\n{lead.solution_idea or 'Нет данных'}\n")
 
     pain_addressed = product_idea.get("pain_addressed")
     estimated_value = product_idea.get("estimated_value")
     if pain_addressed:
-        card += f"✅ Решает: {pain_addressed}\n"
+        parts.append(f"✅ Решает: {pain_addressed}\n")
     if estimated_value:
-        card += f"💰 Ценность: {estimated_value}\n"
+        parts.append(f"💰 Ценность: {estimated_value}\n")
 
     if lead.recommended_message:
-        card += f"\n📝 Сообщение для @{lead.telegram_username}:\n"
-        card += "━━━━━━━━━━━━━\n\n"
-        card += f"{lead.recommended_message}\n"
+        parts.append(
+            f"\n📝 Сообщение для @{lead.telegram_username}:\n"
+            "━━━━━━━━━━━━━\n\n"
+            f"{lead.recommended_message}\n"
+        )
 
-    return card
+    return "".join(parts)
@@ -1,7 +1,9 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from bot.i18n import t
+from bot.i18n import get_locale, t
 
 
 def get_main_menu_text(language_code: str | None = None) -> str:
@@ -11,6 +13,13 @@ def get_main_menu_text(language_code: str | None = None) -> str:
 
 def get_main_menu_keyboard(language_code: str | None = None) -> InlineKeyboardMarkup:
     """Returns inline keyboard for the main menu."""
+    return _build_main_menu_keyboard(get_locale(language_code))
+
+
+# Keyed on the normalized locale so arbitrary Telegram language codes share
+# one markup per supported language.
+@lru_cache(maxsize=8)
+def _build_main_menu_keyboard(language_code: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(
         text=t("btn_my_programs", language_code),
@@ -3,6 +3,7 @@ from datetime import datetime, timezone, timedelta
 
 from aiogram.types import InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy import ColumnElement, case, func
 
 from bot.models.pain import Pain, PainCluster, GeneratedPost
 
@@ -29,6 +30,28 @@ def cluster_score(cluster: PainCluster) -> float:
     return cluster.pain_count * 2 + freshness_bonus + intensity_bonus - already_posted_penalty
 
 
+def cluster_score_expr(now: datetime | None = None) -> ColumnElement[float]:
+    """SQL equivalent of `cluster_score` for ORDER BY in the database.
+
+    `last_seen` is stored as naive UTC, so the freshness bounds are naive too.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    freshness_bonus = case(
+        (PainCluster.last_seen > now - timedelta(days=3), 3),
+        (PainCluster.last_seen > now - timedelta(days=7), 1),
+        else_=0,
+    )
+    intensity_bonus = func.coalesce(func.nullif(PainCluster.avg_intensity, 0), 1) * 2
+    already_posted_penalty = case((PainCluster.post_generated, 10), else_=0)
+
+    return (
+        PainCluster.pain_count * 2
+        + freshness_bonus
+        + intensity_bonus
+        - already_posted_penalty
+    )
+
+
 # --- Keyboards ---
 
 def get_pains_menu_keyboard() -> InlineKeyboardMarkup:
@@ -100,12 +123,22 @@ def get_draft_keyboard(post_id: int, cluster_id: int) -> InlineKeyboardMarkup:
 
 
 def get_drafts_list_keyboard(
-    posts: list[GeneratedPost], page: int = 0, page_size: int = 5
+    posts: list[GeneratedPost],
+    page: int = 0,
+    page_size: int = 5,
+    total: int | None = None,
 ) -> InlineKeyboardMarkup:
-    """Paginated keyboard for the drafts list."""
+    """Paginated keyboard for the drafts list.
+
+    Pass `total` when `posts` is already the requested page (SQL-paginated).
+    """
     builder = InlineKeyboardBuilder()
     start = page * page_size
-    page_posts = posts[start : start + page_size]
+    if total is None:
+        total = len(posts)
+        page_posts = posts[start : start + page_size]
+    else:
+        page_posts = posts
 
     for p in page_posts:
         label = f"#{p.id} {p.title[:35]}…" if len(p.title) > 35 else f"#{p.id} {p.title}"
@@ -114,7 +147,7 @@ def get_drafts_list_keyboard(
     nav_row = []
     if page > 0:
         nav_row.append(("◀️", f"my_drafts_{page - 1}"))
-    if start + page_size < len(posts):
+    if start + page_size < total:
         nav_row.append(("▶️", f"my_drafts_{page + 1}"))
 
     for text, cb in nav_row:
@@ -210,12 +243,23 @@ def format_cluster_detail(cluster: PainCluster, sample_pains: list[Pain]) -> str
 
 
 def format_quotes_page(
-    cluster: PainCluster, pains: list[Pain], page: int, page_size: int = 5
+    cluster: PainCluster,
+    pains: list[Pain],
+    page: int,
+    page_size: int = 5,
+    total: int | None = None,
 ) -> str:
-    """Format a page of quotes for a cluster."""
+    """Format a page of quotes for a cluster.
+
+    Pass `total` when `pains` is already the requested page (SQL-paginated).
+    """
     start = page * page_size
-    page_pains = pains[start : start + page_size]
-    total_pages = (len(pains) + page_size - 1) // page_size
+    if total is None:
+        total = len(pains)
+        page_pains = pains[start : start + page_size]
+    else:
+        page_pains = pains
+    total_pages = (total + page_size - 1) // page_size
 
     lines = [f"💬 Цитаты: {cluster.name}\nСтраница {page + 1}/{total_pages}\n"]
     for i, p in enumerate(page_pains, start + 1):
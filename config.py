@@ -34,6 +34,13 @@ ADMIN_TELEGRAM_IDS = {
     if part.strip().isdigit()
 }
 
+# Channel users must join before using the bot; the gate can be switched off
+# (e.g. for staging bots) to skip the membership check entirely.
+REQUIRED_CHANNEL = os.getenv("REQUIRED_CHANNEL", "@post_cybercore")
+REQUIRE_CHANNEL_SUBSCRIPTION = os.getenv(
+    "REQUIRE_CHANNEL_SUBSCRIPTION", "true"
+).lower() in ("1", "true", "yes")
+
 #
 # Application Settings
 #
@@ -111,6 +111,7 @@ async def generate_post(
     cluster_id: int,
     session: AsyncSession,
     post_type: str = DEFAULT_POST_TYPE,
+    cluster: PainCluster | None = None,
 ) -> GeneratedPost:
     """Generate a draft Telegram post for a pain cluster.
 
@@ -118,6 +119,8 @@ async def generate_post(
         cluster_id: ID of the PainCluster to generate a post for.
         post_type: Post type label key. Defaults to a single unified mode.
         session: Active async SQLAlchemy session.
+        cluster: Already-loaded cluster (e.g. after an ownership check);
+            skips loading it again when provided.
 
     Returns:
         The saved GeneratedPost record (status="draft").
@@ -129,7 +132,8 @@ async def generate_post(
     if not _llm:
         raise ValueError("content_generator: LLM not initialized.")
 
-    cluster = await session.get(PainCluster, cluster_id)
+    if cluster is None:
+        cluster = await session.get(PainCluster, cluster_id)
     if not cluster:
         raise ValueError(f"PainCluster {cluster_id} not found.")
 
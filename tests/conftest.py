@@ -26,6 +26,7 @@ def user_factory():
             telegram_id=telegram_id,
             username=username,
             services_description=services_description,
+            has_services_description=bool((services_description or "").strip()),
             subscription_type=subscription_type,
             subscription_expires_at=subscription_expires_at,
             last_analysis_at=last_analysis_at,
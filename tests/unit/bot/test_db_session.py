@@ -0,0 +1,71 @@
+"""Unit tests for the per-update DB session middleware."""
+
+from __future__ import annotations
+
+import pytest
+
+from bot.middleware.db_session import DbSessionMiddleware
+
+
+class _Session:
+    def __init__(self) -> None:
+        self.open_transaction = False
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):  # noqa: ANN002
+        return False
+
+    def in_transaction(self) -> bool:
+        return self.open_transaction
+
+    async def commit(self) -> None:
+        self.commits += 1
+        self.open_transaction = False
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_commits_pending_work_once() -> None:
+    session = _Session()
+    middleware = DbSessionMiddleware(session_pool=lambda: session)
+
+    async def _handler(event, data):  # noqa: ANN001
+        data["session"].open_transaction = True
+        return "done"
+
+    assert await middleware(_handler, object(), {}) == "done"
+    assert session.commits == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_skips_commit_when_handler_already_committed() -> None:
+    session = _Session()
+    middleware = DbSessionMiddleware(session_pool=lambda: session)
+
+    async def _handler(event, data):  # noqa: ANN001
+        data["session"].open_transaction = True
+        await data["session"].commit()
+
+    await middleware(_handler, object(), {})
+
+    assert session.commits == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_does_not_commit_when_handler_fails() -> None:
+    session = _Session()
+    middleware = DbSessionMiddleware(session_pool=lambda: session)
+
+    async def _handler(event, data):  # noqa: ANN001
+        data["session"].open_transaction = True
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await middleware(_handler, object(), {})
+
+    assert session.commits == 0
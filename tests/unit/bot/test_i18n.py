@@ -22,6 +22,13 @@ def test_pick_returns_locale_variant() -> None:
     assert i18n.pick("en", "RUS", "ENG") == "ENG"
 
 
+@pytest.mark.unit
+def test_picker_selects_pair_member_for_locale() -> None:
+    assert i18n.picker("ru")(("RUS", "ENG")) == "RUS"
+    assert i18n.picker("en")(("RUS", "ENG")) == "ENG"
+    assert i18n.picker("de")(("RUS", "ENG")) == "RUS"
+
+
 @pytest.mark.unit
 def test_t_uses_fallback_table() -> None:
     assert "LeadCore" in i18n.t("main_menu_text", "ru")
@@ -5,6 +5,7 @@ from __future__ import annotations
 from types import SimpleNamespace
 
 import pytest
+from sqlalchemy.dialects import postgresql
 
 from bot import main as bot_main
 
@@ -12,6 +13,7 @@ from bot import main as bot_main
 class _BeginCtx:
     def __init__(self):
         self.run_sync_calls = 0
+        self.executed: list[str] = []
 
     async def __aenter__(self):
         return self
@@ -22,10 +24,17 @@ class _BeginCtx:
     async def run_sync(self, fn):  # noqa: ANN001
         self.run_sync_calls += 1
 
+    async def execute(self, statement):  # noqa: ANN001
+        self.executed.append(str(statement))
+
+    async def get_raw_connection(self):
+        return SimpleNamespace(driver_connection=self)
+
 
 class _SessionCtx:
     def __init__(self, result_rows):
         self.result_rows = result_rows
+        self.queries: list[object] = []
 
     async def __aenter__(self):
         return self
@@ -34,9 +43,8 @@ class _SessionCtx:
         return False
 
     async def execute(self, query):  # noqa: ANN001
-        return SimpleNamespace(
-            scalars=lambda: SimpleNamespace(all=lambda: self.result_rows)
-        )
+        self.queries.append(query)
+        return SimpleNamespace(all=lambda: self.result_rows)
 
 
 @pytest.mark.unit
@@ -50,14 +58,32 @@ async def test_create_tables_runs_metadata_create(monkeypatch) -> None:
     assert begin.run_sync_calls == 1
 
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_migrations_executes_idempotent_ddl(monkeypatch) -> None:
+    conn = _BeginCtx()
+    monkeypatch.setattr(bot_main, "engine", SimpleNamespace(connect=lambda: conn))
+
+    await bot_main.run_migrations()
+
+    # One script, one round trip.
+    assert len(conn.executed) == 1
+    script = conn.executed[0]
+    assert "ix_lead_program_user_created" in script
+    assert "stats_snapshot" in script
+    # The lead username backfill only runs until its unique index exists.
+    assert "IF to_regclass('uq_lead_program_username_ci') IS NOT NULL" in script
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_restore_scheduled_jobs_restores_only_missing(monkeypatch) -> None:
+    # program_2 is already scheduled, so the query only returns program 1.
     programs = [
         SimpleNamespace(id=1, name="P1", owner_chat_id=10, schedule_time="09:00"),
-        SimpleNamespace(id=2, name="P2", owner_chat_id=20, schedule_time="10:00"),
     ]
-    monkeypatch.setattr(bot_main, "async_session", lambda: _SessionCtx(programs))
+    session = _SessionCtx(programs)
+    monkeypatch.setattr(bot_main, "async_session", lambda: session)
 
     restored = []
     monkeypatch.setattr(
@@ -69,12 +95,19 @@ async def test_restore_scheduled_jobs_restores_only_missing(monkeypatch) -> None
         bot_main,
         "scheduler",
         SimpleNamespace(
-            get_job=lambda jid: object() if jid == "program_2" else None
+            get_jobs=lambda: [
+                SimpleNamespace(id="program_2"),
+                SimpleNamespace(id="stats_snapshot_refresh"),
+            ]
         ),
     )
 
     await bot_main.restore_scheduled_jobs()
 
+    compiled = session.queries[0].compile(dialect=postgresql.dialect())
+    assert "NOT IN" in str(compiled)
+    assert compiled.params["id_1"] == [2]
+
     assert restored == [(1, 10, "09:00")]
 
 
@@ -100,9 +133,16 @@ class _FakeDispatcher:
 
 
 class _FakeBot:
+    instances: list["_FakeBot"] = []
+
     def __init__(self, token: str, parse_mode: str):  # noqa: ARG002
+        _FakeBot.instances.append(self)
         self.token = token
         self.webhook_deleted = False
+        self.request_middlewares = []
+        self.session = SimpleNamespace(
+            middleware=lambda mw: self.request_middlewares.append(mw)
+        )
 
     async def delete_webhook(self, drop_pending_updates: bool):  # noqa: ARG002
         self.webhook_deleted = True
@@ -111,15 +151,19 @@ class _FakeBot:
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_main_wires_dispatcher_and_starts_polling(monkeypatch) -> None:
-    calls = {"create_tables": 0, "restore": 0, "scheduler_start": 0}
+    calls = {"create_tables": 0, "migrations": 0, "restore": 0, "scheduler_start": 0}
 
     async def _create_tables():
         calls["create_tables"] += 1
 
+    async def _run_migrations():
+        calls["migrations"] += 1
+
     async def _restore():
         calls["restore"] += 1
 
     monkeypatch.setattr(bot_main, "create_tables", _create_tables)
+    monkeypatch.setattr(bot_main, "run_migrations", _run_migrations)
     monkeypatch.setattr(bot_main, "restore_scheduled_jobs", _restore)
 
     fake_dp = _FakeDispatcher()
@@ -131,11 +175,19 @@ async def test_main_wires_dispatcher_and_starts_polling(monkeypatch) -> None:
         shutdown=lambda: None,
     )
     monkeypatch.setattr(bot_main, "scheduler", fake_scheduler)
+    monkeypatch.setattr(
+        bot_main,
+        "schedule_stats_refresh",
+        lambda: calls.__setitem__("stats_refresh", calls.get("stats_refresh", 0) + 1),
+    )
 
     await bot_main.main(bot_token="TOKEN")
 
     assert calls["create_tables"] == 1
+    assert calls["migrations"] == 1
     assert calls["restore"] == 1
     assert calls["scheduler_start"] == 1
+    assert calls["stats_refresh"] == 1
     assert fake_dp.polled is True
+    assert _FakeBot.instances[-1].webhook_deleted is True
     assert len(fake_dp.routers) >= 5
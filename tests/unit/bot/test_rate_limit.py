@@ -0,0 +1,62 @@
+"""Unit tests for the outgoing request rate limiter."""
+
+from __future__ import annotations
+
+import pytest
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, SendMessage
+
+from bot.middleware import rate_limit
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    clock = {"now": 0.0}
+    sleeps: list[float] = []
+
+    async def _sleep(delay: float) -> None:
+        sleeps.append(delay)
+        clock["now"] += delay
+
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", _sleep)
+    return sleeps
+
+
+async def _make_request(bot, method):  # noqa: ANN001
+    return method
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_token_bucket_waits_once_burst_is_spent(fake_clock) -> None:
+    bucket = rate_limit.TokenBucket(rate=1.0, capacity=2.0)
+
+    for _ in range(3):
+        await bucket.acquire()
+
+    assert fake_clock == [pytest.approx(1.0)]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_sends_to_one_chat_are_throttled(fake_clock) -> None:
+    middleware = rate_limit.SendRateLimitMiddleware()
+    method = SendMessage(chat_id=1, text="x")
+
+    for _ in range(int(rate_limit.PER_CHAT_BURST) + 1):
+        assert await middleware(_make_request, None, method) is method
+
+    assert sum(fake_clock) == pytest.approx(1 / rate_limit.PER_CHAT_RATE)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_edits_and_callback_answers_skip_per_chat_bucket(fake_clock) -> None:
+    middleware = rate_limit.SendRateLimitMiddleware()
+
+    for _ in range(5):
+        await middleware(_make_request, None, EditMessageText(chat_id=1, text="x"))
+        await middleware(_make_request, None, AnswerCallbackQuery(callback_query_id="q"))
+
+    assert fake_clock == []
+    assert middleware.chat_buckets == {}
@@ -51,3 +51,22 @@ def test_remove_program_job_when_exists(monkeypatch) -> None:
     sched_mod.remove_program_job(99)
 
     assert removed == ["program_3"]
+
+
+@pytest.mark.unit
+def test_schedule_stats_refresh_adds_interval_job(monkeypatch) -> None:
+    calls = {}
+
+    class _Sched:
+        def add_job(self, func, **kwargs):  # noqa: ANN001
+            calls["func"] = func
+            calls["kwargs"] = kwargs
+
+    monkeypatch.setattr(sched_mod, "scheduler", _Sched())
+
+    sched_mod.schedule_stats_refresh()
+
+    assert calls["func"].__name__ == "refresh_stats_snapshot"
+    assert calls["kwargs"]["trigger"] == "interval"
+    assert calls["kwargs"]["id"] == "stats_snapshot_refresh"
+    assert calls["kwargs"]["replace_existing"] is True
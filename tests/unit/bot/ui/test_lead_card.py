@@ -68,6 +68,7 @@ def test_get_lead_card_keyboard_skipped_status() -> None:
     kb = get_lead_card_keyboard(lead_id=7, status="skipped")
     texts = _flatten(kb)
     assert texts == ["↩️ Вернуть"]
+    assert get_lead_card_keyboard(lead_id=7, status="skipped") is kb
 
 
 @pytest.mark.unit
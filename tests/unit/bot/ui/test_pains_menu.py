@@ -9,6 +9,7 @@ import pytest
 
 from bot.ui.pains_menu import (
     cluster_score,
+    cluster_score_expr,
     format_cluster_detail,
     format_draft,
     format_pains_summary,
@@ -44,6 +45,15 @@ def test_cluster_score_accounts_for_freshness_and_penalty() -> None:
     assert cluster_score(fresh) > cluster_score(stale_posted)
 
 
+@pytest.mark.unit
+def test_cluster_score_expr_compiles_to_sql_ranking() -> None:
+    sql = str(cluster_score_expr(datetime(2026, 1, 10)))
+
+    assert "pain_clusters.pain_count" in sql
+    assert "CASE" in sql
+    assert "coalesce(nullif(pain_clusters.avg_intensity" in sql
+
+
 @pytest.mark.unit
 def test_format_pains_summary_contains_stats() -> None:
     text = format_pains_summary(10, 3, 2)
@@ -95,6 +105,17 @@ def test_format_cluster_detail_and_quotes_page() -> None:
     assert "Страница 1/2" in page
 
 
+@pytest.mark.unit
+def test_format_quotes_page_accepts_presliced_page() -> None:
+    cluster = SimpleNamespace(name="Cluster A")
+    pains = [SimpleNamespace(original_quote="Quote 6", source_message_link=None)]
+
+    page = format_quotes_page(cluster, pains, page=1, page_size=5, total=6)
+
+    assert "Страница 2/2" in page
+    assert "6. «Quote 6»" in page
+
+
 @pytest.mark.unit
 def test_format_draft_status_label() -> None:
     post = SimpleNamespace(
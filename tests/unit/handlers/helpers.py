@@ -22,8 +22,12 @@ class FakeState:
     async def set_state(self, state) -> None:  # noqa: ANN001
         self.state = state
 
-    async def update_data(self, **kwargs) -> None:  # noqa: ANN003
-        self.data.update(kwargs)
+    async def update_data(self, data: dict | None = None, **kwargs) -> dict:  # noqa: ANN003
+        self.data.update(data or {}, **kwargs)
+        return dict(self.data)
+
+    async def set_data(self, data: dict) -> None:
+        self.data = dict(data)
 
     async def get_data(self) -> dict:
         return dict(self.data)
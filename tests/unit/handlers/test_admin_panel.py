@@ -8,18 +8,26 @@ from types import SimpleNamespace
 import pytest
 
 from bot.handlers import admin_panel
+from bot.models.stats import StatsSnapshot
 from bot.models.user import User
 from tests.unit.handlers.helpers import FakeCallback, FakeMessage, FakeState, FakeUser
 
 
 class _Result:
-    def __init__(self, *, scalar=None, rows=None):
+    def __init__(self, *, scalar=None, rows=None, row=None):
         self._scalar = scalar
         self._rows = rows or []
+        self._row = row
 
     def scalar_one(self):
         return self._scalar
 
+    def one(self):
+        return self._row
+
+    def all(self):
+        return list(self._rows)
+
     def scalars(self):
         return SimpleNamespace(
             first=lambda: self._rows[0] if self._rows else None,
@@ -31,6 +39,7 @@ class _Session:
     def __init__(self):
         self.queue: list[_Result] = []
         self.users: dict[int, User] = {}
+        self.snapshot: StatsSnapshot | None = None
         self.commits = 0
 
     async def execute(self, query):  # noqa: ANN001
@@ -38,7 +47,12 @@ class _Session:
             raise AssertionError("No queued execute result")
         return self.queue.pop(0)
 
+    async def scalar(self, query):  # noqa: ANN001
+        return (await self.execute(query)).scalars().first()
+
     async def get(self, model, key):  # noqa: ANN001
+        if model is StatsSnapshot:
+            return self.snapshot
         return self.users.get(key)
 
     async def commit(self):
@@ -55,7 +69,10 @@ def test_admin_keyboards_and_admin_check(monkeypatch) -> None:
     texts = [b.text for r in menu.inline_keyboard for b in r]
     assert "🔄 Обновить" in texts
 
+    assert admin_panel._admin_menu_keyboard() is menu
+
     card = admin_panel._admin_user_card_keyboard(42)
+    assert admin_panel._admin_user_card_keyboard(42) is card
     ctexts = [b.text for r in card.inline_keyboard for b in r]
     assert "➕ 1 мес" in ctexts
     assert "📋 Программы пользователя" in ctexts
@@ -65,19 +82,37 @@ def test_admin_keyboards_and_admin_check(monkeypatch) -> None:
 @pytest.mark.asyncio
 async def test_render_admin_dashboard() -> None:
     session = _Session()
-    session.queue.extend(
-        [
-            _Result(scalar=10),  # users
-            _Result(scalar=3),   # paid
-            _Result(scalar=7),   # programs
-            _Result(scalar=99),  # leads
-            _Result(scalar=11),  # clusters
-        ]
-    )
+    # users, paid, programs, leads, clusters
+    session.queue.append(_Result(row=(10, 3, 7, 99, 11)))
     text = await admin_panel._render_admin_dashboard(session)
     assert "Пользователи: 10" in text
     assert "С подпиской: 3" in text
+    assert "Без подписки: 7" in text
     assert "Программы: 7" in text
+    assert "🕒 Данные на" in text
+    assert len(session.queue) == 0
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_render_admin_dashboard_reads_stats_snapshot() -> None:
+    session = _Session()
+    session.snapshot = StatsSnapshot(
+        id=1,
+        total_users=20,
+        paid_users=5,
+        total_programs=8,
+        total_leads=300,
+        total_clusters=12,
+        updated_at=datetime.datetime(2026, 10, 1, 9, 30),
+    )
+
+    text = await admin_panel._render_admin_dashboard(session)
+
+    assert "Пользователи: 20" in text
+    assert "Без подписки: 15" in text
+    assert "Лиды: 300" in text
+    assert "🕒 Данные на 01.10.2026 09:30 UTC" in text
 
 
 @pytest.mark.unit
@@ -91,7 +126,7 @@ async def test_admin_panel_command_access_paths(monkeypatch) -> None:
 
     allowed = FakeMessage(FakeUser(id=1), text="/admin_panel")
     session = _Session()
-    session.queue.extend([_Result(scalar=1), _Result(scalar=0), _Result(scalar=1), _Result(scalar=0), _Result(scalar=0)])
+    session.queue.append(_Result(row=(1, 0, 1, 0, 0)))
     await admin_panel.admin_panel_command(allowed, session, state)
     assert "Админка" in allowed.answers[0][0]
 
@@ -106,6 +141,31 @@ async def test_admin_panel_callback_denied(monkeypatch) -> None:
     assert "Доступ запрещен" in cb.answers[-1][0]
 
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_admin_panel_callback_skips_unchanged_edit(monkeypatch) -> None:
+    monkeypatch.setattr(admin_panel, "_is_admin", lambda uid: True)
+    session = _Session()
+    session.snapshot = StatsSnapshot(
+        id=1,
+        total_users=1,
+        paid_users=0,
+        total_programs=1,
+        total_leads=0,
+        total_clusters=0,
+        updated_at=datetime.datetime(2026, 10, 1, 9, 30),
+    )
+
+    cb = FakeCallback(FakeUser(id=1), data="admin_panel")
+    await admin_panel.admin_panel_callback(cb, session, FakeState())
+    assert len(cb.message.edits) == 1
+
+    cb.message.text = cb.message.edits[0][0]
+    await admin_panel.admin_panel_callback(cb, session, FakeState())
+    assert len(cb.message.edits) == 1
+    assert cb.answers[-1][0] == "Статистика пересчитывается раз в 10 мин."
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_admin_find_user_and_input_paths(monkeypatch) -> None:
@@ -138,10 +198,12 @@ async def test_admin_find_user_and_input_paths(monkeypatch) -> None:
     msg_ok = FakeMessage(FakeUser(id=1), text="123")
     session_ok = _Session()
     session_ok.users[123] = user
-    session_ok.queue.extend([_Result(scalar=2), _Result(scalar=5)])
+    session_ok.queue.append(_Result(row=(2, 5)))
     await admin_panel.admin_find_user_input(msg_ok, session_ok, state)
     assert "@u123" in msg_ok.answers[0][0]
     assert "Программ: 2" in msg_ok.answers[0][0]
+    assert "Лидов: 5" in msg_ok.answers[0][0]
+    assert session_ok.commits == 0
 
 
 @pytest.mark.unit
@@ -152,6 +214,10 @@ async def test_admin_grant_subscription_paths(monkeypatch) -> None:
     await admin_panel.admin_grant_subscription(cb_bad, _Session())
     assert cb_bad.answers[-1][1] is True
 
+    cb_bad_period = FakeCallback(FakeUser(id=1), data="admin_grant_2w_7")
+    await admin_panel.admin_grant_subscription(cb_bad_period, _Session())
+    assert "Некорректная команда" in cb_bad_period.answers[-1][0]
+
     cb_bad_id = FakeCallback(FakeUser(id=1), data="admin_grant_1m_badid")
     await admin_panel.admin_grant_subscription(cb_bad_id, _Session())
     assert "Некорректный user_id" in cb_bad_id.answers[-1][0]
@@ -5,29 +5,25 @@ from __future__ import annotations
 from types import SimpleNamespace
 
 import pytest
+from sqlalchemy.dialects import postgresql
 
 from bot.handlers import lead_viewer
 from tests.unit.handlers.helpers import FakeCallback, FakeSession, FakeUser
 
 
-class _LeadResult:
-    def __init__(self, rows):
-        self._rows = rows
-
-    def scalars(self):
-        return SimpleNamespace(
-            all=lambda: list(self._rows),
-            first=lambda: self._rows[0] if self._rows else None,
-        )
-
-
 class _LeadSession(FakeSession):
     def __init__(self, leads):
         super().__init__()
         self._leads = leads
+        self.queries: list = []
+
+    async def scalar(self, query):  # noqa: ANN001
+        self.queries.append(query)
+        return len(self._leads)
 
     async def execute(self, query):  # noqa: ANN001
-        return _LeadResult(self._leads)
+        self.queries.append(query)
+        return SimpleNamespace(first=lambda: self._leads[0] if self._leads else None)
 
 
 @pytest.mark.unit
@@ -40,6 +36,7 @@ async def test_show_lead_page_no_leads() -> None:
 
     assert callback.answers[-1][1] is True
     assert "лиды еще не найдены" in callback.answers[-1][0]
+    assert len(session.queries) == 1
 
 
 @pytest.mark.unit
@@ -57,13 +54,13 @@ async def test_show_lead_page_invalid_page() -> None:
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_show_lead_page_edit_and_answer_paths(monkeypatch) -> None:
-    monkeypatch.setattr(lead_viewer, "format_lead_card", lambda lead, i, t: "CARD")  # noqa: ARG005
+    monkeypatch.setattr(lead_viewer, "format_lead_card", lambda lead, i, t, **kw: "CARD")  # noqa: ARG005
     monkeypatch.setattr(
         lead_viewer,
         "get_lead_navigation_keyboard",
         lambda *args, **kwargs: "KB",  # noqa: ARG005
     )
-    lead = SimpleNamespace(id=1, status="new")
+    lead = SimpleNamespace(id=1, status="new", program_name="P")
     session = _LeadSession(leads=[lead])
 
     callback_a = FakeCallback(FakeUser(id=1))
@@ -73,6 +70,8 @@ async def test_show_lead_page_edit_and_answer_paths(monkeypatch) -> None:
     callback_b = FakeCallback(FakeUser(id=1))
     await lead_viewer.show_lead_page(callback_b, session, program_id=1, page=0, edit=True)
     assert callback_b.message.edits[0][0] == "CARD"
+    # count + single-row page fetch per render
+    assert len(session.queries) == 4
 
 
 @pytest.mark.unit
@@ -96,29 +95,99 @@ async def test_view_program_leads_and_pagination_handlers(monkeypatch) -> None:
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_mark_status_handlers(monkeypatch) -> None:
-    lead = SimpleNamespace(id=7, status="new")
-    session = FakeSession()
+    updates = []
 
-    async def _get_lead(sess, lead_id, user_id):  # noqa: ANN001, ARG001
-        return lead
+    async def _set_status(sess, lead_id, user_id, status):  # noqa: ANN001, ARG001
+        updates.append((lead_id, user_id, status))
+        return True
 
-    monkeypatch.setattr(lead_viewer, "_get_lead", _get_lead)
+    monkeypatch.setattr(lead_viewer, "_set_lead_status", _set_status)
     monkeypatch.setattr(lead_viewer, "get_lead_card_keyboard", lambda *a, **k: "KB")  # noqa: ARG005
 
     cb_contact = FakeCallback(FakeUser(id=1), data="lead_contacted_7")
-    await lead_viewer.mark_lead_contacted(cb_contact, session)
-    assert lead.status == "contacted"
-    assert session.commits == 1
-
+    await lead_viewer.mark_lead_contacted(cb_contact, session=None)
     cb_skip = FakeCallback(FakeUser(id=1), data="lead_skipped_7")
-    await lead_viewer.mark_lead_skipped(cb_skip, session)
-    assert lead.status == "skipped"
-    assert session.commits == 2
-
+    await lead_viewer.mark_lead_skipped(cb_skip, session=None)
     cb_restore = FakeCallback(FakeUser(id=1), data="lead_restore_7")
-    await lead_viewer.restore_lead(cb_restore, session)
-    assert lead.status == "new"
-    assert session.commits == 3
+    await lead_viewer.restore_lead(cb_restore, session=None)
+
+    assert updates == [(7, 1, "contacted"), (7, 1, "skipped"), (7, 1, "new")]
+    assert cb_restore.message.reply_markup_edits == [{"reply_markup": "KB"}]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_mark_status_handler_lead_not_found(monkeypatch) -> None:
+    async def _set_status(*args):  # noqa: ANN002, ARG001
+        return False
+
+    monkeypatch.setattr(lead_viewer, "_set_lead_status", _set_status)
+    callback = FakeCallback(FakeUser(id=1), data="lead_contacted_7")
+
+    await lead_viewer.mark_lead_contacted(callback, session=None)
+
+    assert callback.answers[-1] == ("Лид не найден.", True)
+    assert callback.message.reply_markup_edits == []
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_set_lead_status_uses_update_rowcount() -> None:
+    class _UpdateSession(FakeSession):
+        def __init__(self, rowcount):  # noqa: ANN001
+            super().__init__()
+            self.rowcount = rowcount
+
+        async def execute(self, query, params=None):  # noqa: ANN001
+            self.params = params
+            return SimpleNamespace(rowcount=self.rowcount)
+
+    found = _UpdateSession(rowcount=1)
+    assert await lead_viewer._set_lead_status(found, 7, 1, "contacted") is True
+    assert found.commits == 1
+    assert found.params == {"b_lead_id": 7, "b_user_id": 1, "b_status": "contacted"}
+
+    missing = _UpdateSession(rowcount=0)
+    assert await lead_viewer._set_lead_status(missing, 7, 1, "contacted") is False
+
+
+@pytest.mark.unit
+def test_update_lead_status_statement_compiles_with_its_params() -> None:
+    params = {"b_lead_id": 7, "b_user_id": 1, "b_status": "contacted"}
+
+    compiled = lead_viewer._UPDATE_LEAD_STATUS.compile(
+        dialect=postgresql.dialect(), column_keys=list(params)
+    )
+
+    assert str(compiled) == (
+        "UPDATE leads SET status=%(b_status)s "
+        "WHERE leads.id = %(b_lead_id)s AND leads.user_id = %(b_user_id)s"
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_lead_callback_dispatcher_routes_by_prefix(monkeypatch) -> None:
+    calls = []
+
+    async def _handler(callback, session):  # noqa: ANN001, ARG001
+        calls.append(callback.data)
+
+    monkeypatch.setitem(lead_viewer._PREFIX_HANDLERS, "lead_page", _handler)
+    callback = FakeCallback(FakeUser(id=1), data="lead_page_10_2")
+    match = lead_viewer._CALLBACK_PREFIX_RE.match(callback.data)
+
+    await lead_viewer.lead_callback_dispatcher(callback, None, match)
+
+    assert calls == ["lead_page_10_2"]
+    assert lead_viewer._CALLBACK_PREFIX_RE.match("noop") is None
+    assert set(lead_viewer._PREFIX_HANDLERS) == {
+        "view_program_leads",
+        "lead_page",
+        "lead_contacted",
+        "lead_skipped",
+        "lead_restore",
+    }
 
 
 @pytest.mark.unit
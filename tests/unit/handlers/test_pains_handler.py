@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import sys
 from types import SimpleNamespace
 
 import pytest
@@ -12,16 +11,26 @@ from tests.unit.handlers.helpers import FakeCallback, FakeSession, FakeUser
 
 
 class _Result:
-    def __init__(self, *, rows=None, scalar=None):
+    def __init__(self, *, rows=None, scalar=None, rowcount=0):
         self._rows = rows or []
         self._scalar = scalar
+        self.rowcount = rowcount
 
     def scalar_one(self):
         return self._scalar
 
+    def one(self):
+        return self._scalar
+
+    def scalar(self):
+        return self._rows[0] if self._rows else self._scalar
+
     def all(self):
         return list(self._rows)
 
+    def first(self):
+        return self._rows[0] if self._rows else None
+
     def scalars(self):
         return SimpleNamespace(
             all=lambda: list(self._rows),
@@ -40,6 +49,12 @@ class _Session(FakeSession):
             raise AssertionError("No queued execute result")
         return self.queue.pop(0)
 
+    async def scalar(self, query):  # noqa: ANN001
+        return (await self.execute(query)).scalar()
+
+    async def scalars(self, query):  # noqa: ANN001
+        return (await self.execute(query)).scalars()
+
     async def commit(self):
         self.commits += 1
 
@@ -53,10 +68,10 @@ def _async_return(value):
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_pains_menu_handler_no_programs(monkeypatch) -> None:
+async def test_pains_menu_handler_no_programs() -> None:
     callback = FakeCallback(FakeUser(id=1))
     session = _Session()
-    monkeypatch.setattr(pains_handler, "_get_program_ids_for_user", _async_return([]))
+    session.queue.append(_Result(scalar=(0, 0, 0, 0)))
 
     await pains_handler.pains_menu_handler(callback, session)
 
@@ -65,16 +80,15 @@ async def test_pains_menu_handler_no_programs(monkeypatch) -> None:
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_pains_menu_handler_with_stats(monkeypatch) -> None:
+async def test_pains_menu_handler_with_stats() -> None:
     callback = FakeCallback(FakeUser(id=1))
     session = _Session()
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1, 2])
-    )
-    session.queue.extend([_Result(scalar=10), _Result(scalar=3), _Result(scalar=4)])
+    session.queue.append(_Result(scalar=(2, 10, 3, 4)))
 
     await pains_handler.pains_menu_handler(callback, session)
 
+    assert not session.queue
+
     text = callback.message.edits[0][0]
     assert "Собрано болей: 10" in text
     assert "Кластеров: 3" in text
@@ -99,7 +113,7 @@ async def test_top_pains_handler_empty_clusters(monkeypatch) -> None:
     monkeypatch.setattr(
         pains_handler, "_get_program_ids_for_user", _async_return([1])
     )
-    session.queue.append(_Result(rows=[]))
+    session.queue.append(_Result(scalar=0))
 
     await pains_handler.top_pains_handler(callback, session)
 
@@ -126,21 +140,19 @@ async def test_top_pains_handler_with_clusters(monkeypatch) -> None:
             post_generated=False,
         )
     ]
-    session.queue.append(_Result(rows=clusters))
+    session.queue.extend([_Result(scalar=1), _Result(rows=clusters)])
 
     await pains_handler.top_pains_handler(callback, session)
 
     assert "C1" in callback.message.edits[0][0]
+    assert not session.queue
 
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_cluster_detail_not_found(monkeypatch) -> None:
+async def test_cluster_detail_not_found() -> None:
     callback = FakeCallback(FakeUser(id=1), data="cluster_detail_2")
     session = _Session()
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1])
-    )
     session.queue.append(_Result(rows=[]))
 
     await pains_handler.cluster_detail_handler(callback, session)
@@ -151,12 +163,9 @@ async def test_cluster_detail_not_found(monkeypatch) -> None:
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_cluster_detail_found(monkeypatch) -> None:
+async def test_cluster_detail_found() -> None:
     callback = FakeCallback(FakeUser(id=1), data="cluster_detail_2")
     session = _Session()
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1])
-    )
     cluster = SimpleNamespace(
         id=2,
         name="Cluster",
@@ -190,7 +199,7 @@ async def test_my_drafts_no_programs_and_empty(monkeypatch) -> None:
     monkeypatch.setattr(
         pains_handler, "_get_program_ids_for_user", _async_return([1])
     )
-    session.queue.append(_Result(rows=[]))
+    session.queue.append(_Result(scalar=0))
     await pains_handler.my_drafts_handler(cb_empty, session)
     assert "Пока нет черновиков" in cb_empty.message.edits[0][0]
 
@@ -200,7 +209,7 @@ async def test_my_drafts_no_programs_and_empty(monkeypatch) -> None:
 async def test_delete_draft_handler(monkeypatch) -> None:
     callback = FakeCallback(FakeUser(id=1), data="delete_draft_77")
     session = _Session()
-    session.queue.append(_Result(rows=[]))
+    session.queue.append(_Result(rowcount=1))
 
     called = {"my_drafts": 0}
 
@@ -215,6 +224,23 @@ async def test_delete_draft_handler(monkeypatch) -> None:
     assert callback.answers[-1][0].startswith("🗑")
 
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_delete_draft_handler_rejects_foreign_draft(monkeypatch) -> None:
+    callback = FakeCallback(FakeUser(id=1), data="delete_draft_77")
+    session = _Session()
+    session.queue.append(_Result(rowcount=0))
+
+    async def _my_drafts(cb, sess):  # noqa: ANN001
+        raise AssertionError("drafts list must not be re-rendered")
+
+    monkeypatch.setattr(pains_handler, "my_drafts_handler", _my_drafts)
+
+    await pains_handler.delete_draft_handler(callback, session)
+
+    assert callback.answers[-1] == ("Черновик не найден.", True)
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_main_menu_shortcut() -> None:
@@ -225,15 +251,13 @@ async def test_main_menu_shortcut() -> None:
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_cluster_quotes_handler_happy_path(monkeypatch) -> None:
+async def test_cluster_quotes_handler_happy_path() -> None:
     callback = FakeCallback(FakeUser(id=1), data="cluster_quotes_2_0")
     session = _Session()
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1])
-    )
     session.queue.extend(
         [
             _Result(rows=[SimpleNamespace(id=2, name="C2")]),
+            _Result(scalar=1),
             _Result(
                 rows=[
                     SimpleNamespace(
@@ -248,23 +272,21 @@ async def test_cluster_quotes_handler_happy_path(monkeypatch) -> None:
 
     assert callback.answers[-1] == ("", False)
     assert callback.message.edits
+    assert not session.queue
 
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_cluster_quotes_handler_not_found_and_no_quotes(monkeypatch) -> None:
+async def test_cluster_quotes_handler_not_found_and_no_quotes() -> None:
     cb_not_found = FakeCallback(FakeUser(id=1), data="cluster_quotes_2_0")
     session_not_found = _Session()
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1])
-    )
     session_not_found.queue.append(_Result(rows=[]))
     await pains_handler.cluster_quotes_handler(cb_not_found, session_not_found)
     assert cb_not_found.answers[-1] == ("Кластер не найден.", True)
 
     cb_no_quotes = FakeCallback(FakeUser(id=1), data="cluster_quotes_2_0")
     session_no_quotes = _Session()
-    session_no_quotes.queue.extend([_Result(rows=[SimpleNamespace(id=2)]), _Result(rows=[])])
+    session_no_quotes.queue.extend([_Result(rows=[SimpleNamespace(id=2)]), _Result(scalar=0)])
     await pains_handler.cluster_quotes_handler(cb_no_quotes, session_no_quotes)
     assert cb_no_quotes.answers[-1] == ("Нет цитат для этого кластера.", True)
 
@@ -277,7 +299,7 @@ async def test_generate_post_menu_handler_no_clusters(monkeypatch) -> None:
     monkeypatch.setattr(
         pains_handler, "_get_program_ids_for_user", _async_return([1])
     )
-    session.queue.append(_Result(rows=[]))
+    session.queue.append(_Result(scalar=0))
 
     await pains_handler.generate_post_menu_handler(callback, session)
 
@@ -291,16 +313,11 @@ async def test_generate_post_choose_type_success_and_error(monkeypatch) -> None:
     session_ok = _Session()
     cluster = SimpleNamespace(id=2, name="Cluster")
     session_ok.queue.append(_Result(rows=[cluster]))
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1])
-    )
     monkeypatch.setattr(pains_handler, "format_draft", lambda post, _: f"DRAFT:{post.id}")  # noqa: ARG005
     async def _gen_ok(*args, **kwargs):  # noqa: ANN002,ANN003
         return SimpleNamespace(id=99)
 
-    monkeypatch.setitem(
-        sys.modules, "modules.content_generator", SimpleNamespace(generate_post=_gen_ok)
-    )
+    monkeypatch.setattr(pains_handler, "generate_post", _gen_ok)
 
     await pains_handler.generate_post_choose_type(cb_ok, session_ok)
     assert "DRAFT:99" in cb_ok.message.edits[-1][0]
@@ -312,21 +329,16 @@ async def test_generate_post_choose_type_success_and_error(monkeypatch) -> None:
     async def _boom(*args, **kwargs):  # noqa: ANN002,ANN003
         raise RuntimeError("fail")
 
-    monkeypatch.setitem(
-        sys.modules, "modules.content_generator", SimpleNamespace(generate_post=_boom)
-    )
+    monkeypatch.setattr(pains_handler, "generate_post", _boom)
     await pains_handler.generate_post_choose_type(cb_err, session_err)
     assert "Ошибка при генерации поста" in cb_err.message.edits[-1][0]
 
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_generate_post_execute_cluster_not_found(monkeypatch) -> None:
+async def test_generate_post_execute_cluster_not_found() -> None:
     callback = FakeCallback(FakeUser(id=1), data="gen_scenario_7")
     session = _Session()
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1])
-    )
     session.queue.append(_Result(rows=[]))
 
     await pains_handler.generate_post_execute(callback, session)
@@ -339,9 +351,6 @@ async def test_generate_post_execute_cluster_not_found(monkeypatch) -> None:
 async def test_view_draft_handler_not_found_and_found(monkeypatch) -> None:
     cb_not_found = FakeCallback(FakeUser(id=1), data="view_draft_10")
     session_not_found = _Session()
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1])
-    )
     session_not_found.queue.append(_Result(rows=[]))
     await pains_handler.view_draft_handler(cb_not_found, session_not_found)
     assert cb_not_found.answers[-1] == ("Черновик не найден.", True)
@@ -349,8 +358,7 @@ async def test_view_draft_handler_not_found_and_found(monkeypatch) -> None:
     cb_ok = FakeCallback(FakeUser(id=1), data="view_draft_10")
     session_ok = _Session()
     post = SimpleNamespace(id=10, cluster_id=2)
-    cluster = SimpleNamespace(id=2, name="C2")
-    session_ok.queue.extend([_Result(rows=[post]), _Result(rows=[cluster])])
+    session_ok.queue.append(_Result(rows=[(post, "C2")]))
     monkeypatch.setattr(pains_handler, "format_draft", lambda p, c: f"{p.id}:{c}")  # noqa: ARG005
     await pains_handler.view_draft_handler(cb_ok, session_ok)
     assert "10:C2" in cb_ok.message.edits[-1][0]
@@ -361,9 +369,6 @@ async def test_view_draft_handler_not_found_and_found(monkeypatch) -> None:
 async def test_regen_post_handler_success_and_not_found(monkeypatch) -> None:
     cb_not_found = FakeCallback(FakeUser(id=1), data="regen_post_5")
     session_not_found = _Session()
-    monkeypatch.setattr(
-        pains_handler, "_get_program_ids_for_user", _async_return([1])
-    )
     session_not_found.queue.append(_Result(rows=[]))
     await pains_handler.regen_post_handler(cb_not_found, session_not_found)
     assert cb_not_found.answers[-1] == ("Кластер не найден.", True)
@@ -375,11 +380,42 @@ async def test_regen_post_handler_success_and_not_found(monkeypatch) -> None:
     async def _regen_ok(*args, **kwargs):  # noqa: ANN002,ANN003
         return SimpleNamespace(id=11)
 
-    monkeypatch.setitem(
-        sys.modules,
-        "modules.content_generator",
-        SimpleNamespace(generate_post=_regen_ok),
-    )
+    monkeypatch.setattr(pains_handler, "generate_post", _regen_ok)
     monkeypatch.setattr(pains_handler, "format_draft", lambda p, c: f"{p.id}:{c}")  # noqa: ARG005
     await pains_handler.regen_post_handler(cb_ok, session_ok)
     assert "11:C5" in cb_ok.message.edits[-1][0]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_get_owned_cluster_scopes_by_program_owner() -> None:
+    captured = []
+
+    class _CapturingSession(_Session):
+        async def execute(self, query):  # noqa: ANN001
+            captured.append(str(query))
+            return await super().execute(query)
+
+    session = _CapturingSession()
+    session.queue.append(_Result(rows=[SimpleNamespace(id=2)]))
+
+    cluster = await pains_handler._get_owned_cluster(2, 1, session)
+
+    assert cluster.id == 2
+    assert "JOIN programs" in captured[0]
+    assert "programs.user_id" in captured[0]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_safe_edit_text_skips_unchanged_content() -> None:
+    markup = pains_handler.get_pains_menu_keyboard()
+    callback = FakeCallback(FakeUser(id=1))
+    callback.message.text = "Same"
+    callback.message.reply_markup = markup
+
+    await pains_handler._safe_edit_text(callback, "Same", reply_markup=markup)
+    assert callback.message.edits == []
+
+    await pains_handler._safe_edit_text(callback, "Same")
+    assert len(callback.message.edits) == 1
@@ -34,6 +34,7 @@ def test_get_step_keyboard_contains_back_and_cancel() -> None:
     texts = [b.text for r in kb.inline_keyboard for b in r]
     assert "◀️ Back" in texts
     assert "❌ Cancel" in texts
+    assert program_create.get_step_keyboard("name") is kb
 
 
 @pytest.mark.unit
@@ -105,7 +106,7 @@ async def test_enter_chats_rejects_invalid_input() -> None:
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_enter_chats_accepts_valid_and_moves_to_confirm() -> None:
-    message = FakeMessage(FakeUser(id=4), text="@chat_one\nt.me/chat_two")
+    message = FakeMessage(FakeUser(id=4), text="@chat_one\nt.me/chat_two\n@chat_one")
     state = FakeState()
     await state.update_data(name="Prog")
     await state.set_state(ProgramCreate.enter_chats)
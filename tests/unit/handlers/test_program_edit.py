@@ -5,14 +5,22 @@ from __future__ import annotations
 from types import SimpleNamespace
 
 import pytest
+from sqlalchemy.dialects import postgresql
 
 from bot.handlers import program_edit
 from tests.unit.handlers.helpers import FakeCallback, FakeMessage, FakeState, FakeUser
 
 
 class _Result:
-    def __init__(self, rows=None):
+    def __init__(self, rows=None, rowcount=0):
         self._rows = rows or []
+        self.rowcount = rowcount
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def scalar_one_or_none(self):
+        return self._rows[0] if self._rows else None
 
     def scalars(self):
         return SimpleNamespace(
@@ -25,8 +33,14 @@ class _Session:
     def __init__(self):
         self.queue: list[_Result] = []
         self.commits = 0
+        self.programs: dict[int, object] = {}
+        self.executed: list[object] = []
+
+    async def get(self, model, key, options=None, populate_existing=False):  # noqa: ANN001, ARG002
+        return self.programs.get(key)
 
     async def execute(self, query):  # noqa: ANN001
+        self.executed.append(query)
         if not self.queue:
             raise AssertionError("No queued result")
         return self.queue.pop(0)
@@ -34,9 +48,15 @@ class _Session:
     async def commit(self):
         self.commits += 1
 
+    async def scalars(self, query):  # noqa: ANN001
+        return (await self.execute(query)).scalars()
+
     def add(self, obj):  # noqa: ANN001
         return None
 
+    def add_all(self, objs):  # noqa: ANN001
+        self.added = list(objs)
+
 
 def _program() -> SimpleNamespace:
     return SimpleNamespace(
@@ -69,6 +89,15 @@ def test_program_edit_keyboards() -> None:
     settings_texts = [b.text for r in settings.inline_keyboard for b in r]
     assert "5✅" in settings_texts
     assert "20✅" in settings_texts
+    assert program_edit.get_settings_keyboard(10, 5, 20, False, True) is settings
+    assert program_edit.get_edit_menu_keyboard(10) is kb
+
+    chats_kb = program_edit.get_chats_keyboard(10)
+    assert [b.callback_data for r in chats_kb.inline_keyboard for b in r] == [
+        "done_chats_10",
+        "edit_program_10",
+    ]
+    assert program_edit.get_chats_keyboard(10) is chats_kb
 
 
 @pytest.mark.unit
@@ -77,7 +106,6 @@ async def test_show_edit_menu_not_found() -> None:
     callback = FakeCallback(FakeUser(id=1), data="edit_program_10")
     state = FakeState()
     session = _Session()
-    session.queue.append(_Result(rows=[]))
 
     await program_edit.show_edit_menu(callback, session, state)
 
@@ -91,7 +119,7 @@ async def test_show_edit_menu_success() -> None:
     callback = FakeCallback(FakeUser(id=1), data="edit_program_10")
     state = FakeState()
     session = _Session()
-    session.queue.append(_Result(rows=[_program()]))
+    session.programs[10] = _program()
 
     await program_edit.show_edit_menu(callback, session, state)
 
@@ -114,13 +142,21 @@ async def test_edit_name_flow() -> None:
 
     # valid save
     session = _Session()
-    prog = _program()
-    session.queue.append(_Result(rows=[prog]))
+    session.queue.append(_Result(rowcount=1))
     msg = FakeMessage(FakeUser(id=1), text="NewName")
     await state.update_data(program_id=10)
     await program_edit.edit_name_save(msg, state, session)
     assert session.commits == 1
-    assert prog.name == "NewName"
+    assert msg.answers[0][0] == "✅ Название изменено на: NewName"
+
+    # foreign or missing program: UPDATE matches nothing
+    session_nf = _Session()
+    session_nf.queue.append(_Result(rowcount=0))
+    msg_nf = FakeMessage(FakeUser(id=2), text="NewName")
+    await state.update_data(program_id=10)
+    await program_edit.edit_name_save(msg_nf, state, session_nf)
+    assert session_nf.commits == 0
+    assert "изменено" not in msg_nf.answers[0][0]
 
 
 @pytest.mark.unit
@@ -136,13 +172,20 @@ async def test_edit_niche_flow() -> None:
     assert "не может быть пустым" in msg_empty.answers[0][0]
 
     session = _Session()
-    prog = _program()
-    session.queue.append(_Result(rows=[prog]))
+    session.queue.append(_Result(rows=["Prog"]))
     msg = FakeMessage(FakeUser(id=1), text="New niche")
     await state.update_data(program_id=10)
     await program_edit.edit_niche_save(msg, state, session)
     assert session.commits == 1
-    assert prog.niche_description == "New niche"
+    assert "Редактирование: Prog" in msg.answers[-1][0]
+
+    session_nf = _Session()
+    session_nf.queue.append(_Result(rows=[]))
+    msg_nf = FakeMessage(FakeUser(id=2), text="New niche")
+    await state.update_data(program_id=10)
+    await program_edit.edit_niche_save(msg_nf, state, session_nf)
+    assert session_nf.commits == 0
+    assert len(msg_nf.answers) == 1
 
 
 @pytest.mark.unit
@@ -151,7 +194,6 @@ async def test_edit_chats_not_found_and_done() -> None:
     callback = FakeCallback(FakeUser(id=1), data="edit_chats_10")
     state = FakeState()
     session = _Session()
-    session.queue.append(_Result(rows=[]))
     await program_edit.edit_chats_start(callback, state, session)
     assert "Программа не найдена" in callback.answers[-1][0]
 
@@ -161,6 +203,49 @@ async def test_edit_chats_not_found_and_done() -> None:
     assert "Что ещё изменить?" in callback_done.message.edits[0][0]
 
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_edit_chats_process_adds_only_new_chats() -> None:
+    state = FakeState()
+    await state.update_data(program_id=10)
+    session = _Session()
+    session.programs[10] = _program()
+    session.queue.append(_Result(rows=["chat1"]))
+
+    msg = FakeMessage(
+        FakeUser(id=1), text="@chat1\nhttps://t.me/chat2\n@chat2\nnot a chat\n@x"
+    )
+    await program_edit.edit_chats_process(msg, state, session)
+
+    assert [c.chat_username for c in session.added] == ["chat2"]
+    assert session.commits == 1
+    assert msg.answers[0][0] == "✅ Добавлено чатов: @chat2"
+
+    msg_junk = FakeMessage(FakeUser(id=1), text="a@b c\n@ab")
+    await program_edit.edit_chats_process(msg_junk, state, session)
+    assert msg_junk.answers[0][0] == "Чаты уже существуют или некорректный формат"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_edit_chats_process_delete_uses_rowcount() -> None:
+    state = FakeState()
+    await state.update_data(program_id=10)
+    session = _Session()
+    session.programs[10] = _program()
+    session.queue.extend([_Result(rowcount=1), _Result(rowcount=0)])
+
+    msg = FakeMessage(FakeUser(id=1), text="удалить @chat1")
+    await program_edit.edit_chats_process(msg, state, session)
+    assert msg.answers[0][0] == "✅ Чат @chat1 удалён"
+    assert session.commits == 1
+
+    msg_missing = FakeMessage(FakeUser(id=1), text="удалить @nope")
+    await program_edit.edit_chats_process(msg_missing, state, session)
+    assert msg_missing.answers[0][0] == "❌ Чат @nope не найден"
+    assert session.commits == 1
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_edit_settings_show_and_toggles(monkeypatch) -> None:
@@ -168,30 +253,28 @@ async def test_edit_settings_show_and_toggles(monkeypatch) -> None:
     state = FakeState()
     session = _Session()
     prog = _program()
-    session.queue.append(_Result(rows=[prog]))
+    session.programs[10] = prog
 
     await program_edit.edit_settings_show(callback, session, state)
     assert state.state is not None
     assert "Настройки программы" in callback.message.edits[0][0]
 
-    cb_score = FakeCallback(FakeUser(id=1), data="set_score_10_4")
+    async def _press(data: str) -> None:
+        cb = FakeCallback(FakeUser(id=1), data=data)
+        match = program_edit._SETTING_RE.match(data)
+        await program_edit.apply_setting(cb, state, match)
+
     await state.update_data(max_leads=20, enrich=False, auto_collect=True)
-    await program_edit.set_min_score(cb_score, state)
+    await _press("set_score_10_4")
     assert state.data["min_score"] == 4
 
-    cb_max = FakeCallback(FakeUser(id=1), data="set_max_10_50")
-    await state.update_data(min_score=4, enrich=False, auto_collect=True)
-    await program_edit.set_max_leads(cb_max, state)
+    await _press("set_max_10_50")
     assert state.data["max_leads"] == 50
 
-    cb_enrich = FakeCallback(FakeUser(id=1), data="toggle_enrich_10")
-    await state.update_data(min_score=4, max_leads=20, enrich=False, auto_collect=True)
-    await program_edit.toggle_enrichment(cb_enrich, state)
+    await _press("toggle_enrich_10")
     assert state.data["enrich"] is True
 
-    cb_auto = FakeCallback(FakeUser(id=1), data="toggle_autocollect_10")
-    await state.update_data(min_score=4, max_leads=20, enrich=False, auto_collect=True)
-    await program_edit.toggle_auto_collect(cb_auto, state)
+    await _press("toggle_autocollect_10")
     assert state.data["auto_collect"] is False
 
 
@@ -212,16 +295,46 @@ async def test_save_settings_not_found_and_success(monkeypatch) -> None:
     state_ok = FakeState()
     await state_ok.update_data(min_score=3, max_leads=10, enrich=True, auto_collect=False)
     session_ok = _Session()
-    prog = _program()
-    session_ok.queue.append(_Result(rows=[prog]))
+    session_ok.queue.append(
+        _Result(rows=[SimpleNamespace(
+            id=10, owner_chat_id=1, schedule_time="09:00", auto_collect_enabled=False,
+        )])
+    )
     removed = []
     monkeypatch.setattr(program_edit, "remove_program_job", lambda pid: removed.append(pid))
     monkeypatch.setattr(program_edit, "schedule_program_job", lambda *a, **k: None)
     await program_edit.save_settings(callback_ok, state_ok, session_ok)
 
     assert session_ok.commits == 1
-    assert prog.min_score == 3
-    assert prog.max_leads_per_run == 10
-    assert prog.enrich is True
-    assert prog.auto_collect_enabled is False
+    params = session_ok.executed[0].compile().params
+    assert params["min_score"] == 3
+    assert params["max_leads_per_run"] == 10
+    assert params["enrich"] is True
+    assert params["auto_collect_enabled"] is False
     assert removed == [10]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_save_settings_without_toggle_fills_owner_chat(monkeypatch) -> None:
+    callback = FakeCallback(FakeUser(id=1), data="save_settings_10")
+    state = FakeState()
+    await state.update_data(min_score=3, max_leads=10, enrich=True)
+    session = _Session()
+    session.queue.append(
+        _Result(rows=[SimpleNamespace(
+            id=10, owner_chat_id=1, schedule_time="09:00", auto_collect_enabled=True,
+        )])
+    )
+    scheduled = []
+    monkeypatch.setattr(
+        program_edit, "schedule_program_job", lambda *a: scheduled.append(a)
+    )
+
+    await program_edit.save_settings(callback, state, session)
+
+    sql = str(session.executed[0].compile(dialect=postgresql.dialect()))
+    assert "owner_chat_id=CASE WHEN programs.auto_collect_enabled" in sql
+    assert "coalesce(programs.owner_chat_id" in sql
+    assert "auto_collect_enabled=" not in sql
+    assert scheduled == [(10, 1, "09:00")]
@@ -14,8 +14,8 @@ class _Result:
     def __init__(self, rows):
         self._rows = rows
 
-    def scalars(self):
-        return SimpleNamespace(all=lambda: self._rows)
+    def all(self):
+        return list(self._rows)
 
 
 class _Session:
@@ -59,18 +59,15 @@ async def test_my_programs_handler_no_programs() -> None:
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_my_programs_handler_with_programs() -> None:
-    programs = [
-        SimpleNamespace(
-            id=1,
-            name="Alpha",
-            chats=[1, 2],
-            min_score=5,
-            auto_collect_enabled=True,
-            schedule_time="09:00",
-        )
-    ]
+    program = SimpleNamespace(
+        id=1,
+        name="Alpha",
+        min_score=5,
+        auto_collect_enabled=True,
+        schedule_time="09:00",
+    )
     callback = FakeCallback(FakeUser(id=1, language_code="ru"))
-    session = _Session(rows=programs)
+    session = _Session(rows=[(program, 2)])
 
     await program_list.my_programs_handler(callback, session)
 
@@ -78,3 +75,4 @@ async def test_my_programs_handler_with_programs() -> None:
     assert "📋 Мои программы" in text
     assert "Alpha" in text
     assert "скор ≥5" in text
+    assert "2 чат(а/ов)" in text
@@ -7,6 +7,7 @@ from types import SimpleNamespace
 import pytest
 
 from bot.handlers import program_view
+from bot.models.program import Program
 from bot.models.user import User
 from tests.unit.handlers.helpers import FakeCallback, FakeSession, FakeUser
 
@@ -32,12 +33,21 @@ class _Result:
     def all(self):
         return list(self._rows)
 
+    def first(self):
+        return self._rows[0] if self._rows else None
+
 
 class _Session(FakeSession):
     def __init__(self):
         super().__init__()
         self.queue: list[_Result] = []
         self.deleted: list[object] = []
+        self.programs: dict[int, object] = {}
+
+    async def get(self, model, key, options=None, populate_existing=False):  # noqa: ANN001, ARG002
+        if model is Program:
+            return self.programs.get(key)
+        return await super().get(model, key)
 
     async def execute(self, query):  # noqa: ANN001
         if not self.queue:
@@ -78,7 +88,6 @@ async def test_show_program_handler_not_found() -> None:
 async def test_run_program_handler_not_owned_program() -> None:
     callback = FakeCallback(FakeUser(id=1, language_code="en"), data="run_program_7")
     session = _Session()
-    session.queue.append(_Result(scalar_or_none=None))
 
     await program_view.run_program_handler(callback, session)
 
@@ -91,7 +100,7 @@ async def test_run_program_handler_not_owned_program() -> None:
 async def test_run_program_handler_user_missing() -> None:
     callback = FakeCallback(FakeUser(id=1, language_code="en"), data="run_program_7")
     session = _Session()
-    session.queue.append(_Result(scalar_or_none=7))
+    session.programs[7] = SimpleNamespace(id=7, user_id=1)
 
     await program_view.run_program_handler(callback, session)
 
@@ -104,7 +113,7 @@ async def test_run_program_handler_user_missing() -> None:
 async def test_run_program_handler_free_limit_block(monkeypatch) -> None:
     callback = FakeCallback(FakeUser(id=1, language_code="en"), data="run_program_7")
     session = _Session()
-    session.queue.append(_Result(scalar_or_none=7))
+    session.programs[7] = SimpleNamespace(id=7, user_id=1)
     session.users[1] = User(telegram_id=1, username="u", subscription_type="free")
 
     monkeypatch.setattr(
@@ -124,7 +133,7 @@ async def test_run_program_handler_free_limit_block(monkeypatch) -> None:
 async def test_run_program_handler_success(monkeypatch) -> None:
     callback = FakeCallback(FakeUser(id=1, language_code="en"), data="run_program_7")
     session = _Session()
-    session.queue.append(_Result(scalar_or_none=7))
+    session.programs[7] = SimpleNamespace(id=7, user_id=1)
     session.users[1] = User(telegram_id=1, username="u", subscription_type="free")
 
     monkeypatch.setattr(
@@ -152,18 +161,18 @@ async def test_run_program_handler_success(monkeypatch) -> None:
 async def test_delete_program_confirmed_deleted_and_already_deleted(monkeypatch) -> None:
     callback = FakeCallback(FakeUser(id=1, language_code="en"), data="confirm_delete_7")
     session = _Session()
-    prog = SimpleNamespace(name="P1")
-    session.queue.append(_Result(rows=[prog]))  # first run: found
+    session.queue.append(_Result(scalar_or_none="P1"))
     removed = []
     monkeypatch.setattr(program_view, "remove_program_job", lambda pid: removed.append(pid))
 
     await program_view.delete_program_confirmed(callback, session)
+    assert session.commits == 1
     assert removed == [7]
     assert "Program “P1” deleted" in callback.message.edits[0][0]
 
     callback2 = FakeCallback(FakeUser(id=1, language_code="en"), data="confirm_delete_7")
     session2 = _Session()
-    session2.queue.append(_Result(rows=[]))  # second run: not found
+    session2.queue.append(_Result(scalar_or_none=None))
     await program_view.delete_program_confirmed(callback2, session2)
     assert "already been deleted" in callback2.message.edits[0][0]
 
@@ -185,13 +194,7 @@ async def test_show_program_handler_success() -> None:
         max_leads_per_run=20,
         enrich=False,
     )
-    session.queue.extend(
-        [
-            _Result(rows=[program]),
-            _Result(scalar=2),
-            _Result(rows=[(1, 9, "u1"), (2, 9, "u2")]),
-        ]
-    )
+    session.queue.append(_Result(rows=[(program, 2)]))
 
     await program_view.show_program_handler(callback, session)
 
@@ -205,14 +208,13 @@ async def test_show_program_handler_success() -> None:
 async def test_delete_program_confirmation_found_and_missing() -> None:
     cb_missing = FakeCallback(FakeUser(id=1), data="delete_program_7")
     session_missing = _Session()
-    session_missing.queue.append(_Result(rows=[]))
 
     await program_view.delete_program_confirmation(cb_missing, session_missing)
     assert cb_missing.answers[-1] == ("Программа уже удалена.", True)
 
     cb_found = FakeCallback(FakeUser(id=1), data="delete_program_7")
     session_found = _Session()
-    session_found.queue.append(_Result(rows=[SimpleNamespace(name="ToDelete")]))
+    session_found.programs[7] = SimpleNamespace(user_id=1, name="ToDelete")
 
     await program_view.delete_program_confirmation(cb_found, session_found)
     assert "Точно удалить" in cb_found.message.edits[-1][0]
@@ -223,15 +225,14 @@ async def test_delete_program_confirmation_found_and_missing() -> None:
 async def test_clear_leads_confirmation_paths() -> None:
     cb_not_found = FakeCallback(FakeUser(id=1), data="clear_leads_5")
     session_not_found = _Session()
-    session_not_found.queue.append(_Result(rows=[]))
     await program_view.clear_leads_confirmation(cb_not_found, session_not_found)
     assert cb_not_found.answers[-1] == ("Программа не найдена.", True)
 
     cb_empty = FakeCallback(FakeUser(id=1), data="clear_leads_5")
     session_empty = _Session()
+    session_empty.programs[5] = SimpleNamespace(id=5, user_id=1, name="P")
     session_empty.queue.extend(
         [
-            _Result(rows=[SimpleNamespace(id=5, name="P")]),
             _Result(scalar=0),
         ]
     )
@@ -240,9 +241,9 @@ async def test_clear_leads_confirmation_paths() -> None:
 
     cb_ok = FakeCallback(FakeUser(id=1), data="clear_leads_5")
     session_ok = _Session()
+    session_ok.programs[5] = SimpleNamespace(id=5, user_id=1, name="P")
     session_ok.queue.extend(
         [
-            _Result(rows=[SimpleNamespace(id=5, name="P")]),
             _Result(scalar=3),
         ]
     )
@@ -252,31 +253,30 @@ async def test_clear_leads_confirmation_paths() -> None:
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_clear_leads_confirmed_paths(monkeypatch) -> None:
+async def test_clear_leads_confirmed_paths() -> None:
     cb_missing = FakeCallback(FakeUser(id=1), data="confirm_clear_leads_5")
     session_missing = _Session()
-    session_missing.queue.append(_Result(rows=[]))
     await program_view.clear_leads_confirmed(cb_missing, session_missing)
     assert cb_missing.answers[-1] == ("Программа не найдена.", True)
 
-    called = {"show": 0}
-
-    async def _show(cb, sess):  # noqa: ANN001
-        called["show"] += 1
-
-    monkeypatch.setattr(program_view, "show_program_handler", _show)
-
     cb_ok = FakeCallback(FakeUser(id=1), data="confirm_clear_leads_5")
     session_ok = _Session()
-    session_ok.queue.extend(
-        [
-            _Result(rows=[SimpleNamespace(id=5, name="P")]),
-            _Result(scalar=4),
-            _Result(rows=[]),
-        ]
+    session_ok.programs[5] = SimpleNamespace(
+        id=5,
+        user_id=1,
+        name="P",
+        niche_description="Niche",
+        chats=[],
+        auto_collect_enabled=False,
+        schedule_time="09:00",
+        min_score=5,
+        max_leads_per_run=20,
+        enrich=False,
     )
+    session_ok.queue.append(SimpleNamespace(rowcount=4))
     await program_view.clear_leads_confirmed(cb_ok, session_ok)
 
     assert session_ok.commits == 1
-    assert called["show"] == 1
+    assert not session_ok.queue
     assert cb_ok.answers[-1] == ("✅ Удалено лидов: 4", True)
+    assert "Всего найдено: 0 лидов" in cb_ok.message.edits[-1][0]
@@ -2,9 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
+import time
 from types import SimpleNamespace
 
 import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
 
 from bot.handlers import start
 from bot.models.user import User
@@ -17,6 +21,13 @@ from tests.unit.handlers.helpers import (
 )
 
 
+@pytest.fixture(autouse=True)
+def _clear_membership_cache():
+    start._membership_cache.clear()
+    yield
+    start._membership_cache.clear()
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_is_channel_member_true_and_false() -> None:
@@ -29,7 +40,50 @@ async def test_is_channel_member_true_and_false() -> None:
             return SimpleNamespace(status="left")
 
     assert await start._is_channel_member(_Bot(), 1) is True
-    assert await start._is_channel_member(_BotLeft(), 1) is False
+    assert await start._is_channel_member(_BotLeft(), 2) is False
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_is_channel_member_caches_by_ttl(monkeypatch) -> None:
+    clock = {"now": 100.0}
+    monkeypatch.setattr(start.time, "monotonic", lambda: clock["now"])
+    statuses = ["left", "member", "left"]
+    calls = []
+
+    class _Bot:
+        async def get_chat_member(self, channel: str, user_id: int):  # noqa: ARG002
+            calls.append(user_id)
+            return SimpleNamespace(status=statuses[len(calls) - 1])
+
+    bot = _Bot()
+    assert await start._is_channel_member(bot, 1) is False
+    clock["now"] += start.MEMBERSHIP_NEGATIVE_TTL + 1
+    assert await start._is_channel_member(bot, 1) is True
+    clock["now"] += start.MEMBERSHIP_TTL - 1
+    assert await start._is_channel_member(bot, 1) is True
+    assert len(calls) == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_is_channel_member_timeout_serves_last_known(monkeypatch) -> None:
+    monkeypatch.setattr(start, "MEMBERSHIP_CHECK_TIMEOUT", 0.01)
+
+    class _SlowBot:
+        async def get_chat_member(self, channel: str, user_id: int):  # noqa: ARG002
+            await asyncio.sleep(1)
+            return SimpleNamespace(status="left")
+
+    # An expired positive entry: the check is retried, times out, and the
+    # last known answer is served.
+    start._membership_cache[1] = (
+        time.monotonic() - start.MEMBERSHIP_TTL - 1,
+        True,
+    )
+
+    assert await start._is_channel_member(_SlowBot(), 1) is True
+    assert await start._is_channel_member(_SlowBot(), 2) is False
 
 
 @pytest.mark.unit
@@ -46,6 +100,7 @@ def test_settings_keyboard_contains_edit_and_back() -> None:
     texts = [b.text for r in kb.inline_keyboard for b in r]
     assert "✏️ Edit Services Description" in texts
     assert "◀️ Back" in texts
+    assert start._get_settings_keyboard("en-US") is kb
 
 
 @pytest.mark.unit
@@ -54,7 +109,11 @@ async def test_start_handler_access_closed(monkeypatch) -> None:
     async def _not_member(bot, user_id):  # noqa: ANN001, ARG001
         return False
 
+    async def _touch_user(user, session):  # noqa: ANN001, ARG001
+        return User(telegram_id=user.id)
+
     monkeypatch.setattr(start, "_is_channel_member", _not_member)
+    monkeypatch.setattr(start, "_touch_user", _touch_user)
     message = FakeMessage(FakeUser(id=1, language_code="en"))
 
     await start.start_handler(message, bot=None, session=FakeSession(), state=FakeState())
@@ -69,14 +128,41 @@ async def test_start_handler_member_calls_continue(monkeypatch) -> None:
     async def _member(bot, user_id):  # noqa: ANN001, ARG001
         return True
 
+    touched = User(telegram_id=2)
+    called = {}
+
+    async def _touch_user(user, session):  # noqa: ANN001, ARG001
+        return touched
+
+    async def _continue(tg_user, send_fn, session, state, user=None):  # noqa: ANN001
+        called["user"] = user
+
+    monkeypatch.setattr(start, "_is_channel_member", _member)
+    monkeypatch.setattr(start, "_touch_user", _touch_user)
+    monkeypatch.setattr(start, "_continue_onboarding", _continue)
+    message = FakeMessage(FakeUser(id=2, language_code="ru"))
+
+    await start.start_handler(message, bot=None, session=FakeSession(), state=FakeState())
+
+    # The row upserted alongside the membership check is handed on as is.
+    assert called["user"] is touched
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_start_handler_skips_check_when_gate_disabled(monkeypatch) -> None:
+    async def _never(bot, user_id):  # noqa: ANN001, ARG001
+        raise AssertionError("membership must not be checked")
+
     called = {"ok": False}
 
     async def _continue(user, send_fn, session, state):  # noqa: ANN001
         called["ok"] = True
 
-    monkeypatch.setattr(start, "_is_channel_member", _member)
+    monkeypatch.setattr(start.config, "REQUIRE_CHANNEL_SUBSCRIPTION", False)
+    monkeypatch.setattr(start, "_is_channel_member", _never)
     monkeypatch.setattr(start, "_continue_onboarding", _continue)
-    message = FakeMessage(FakeUser(id=2, language_code="ru"))
+    message = FakeMessage(FakeUser(id=3, language_code="en"))
 
     await start.start_handler(message, bot=None, session=FakeSession(), state=FakeState())
 
@@ -126,18 +212,23 @@ async def test_check_channel_subscription_member(monkeypatch) -> None:
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_main_menu_callback_handler(monkeypatch) -> None:
-    async def _touch_user(user, session):  # noqa: ANN001
-        return User(telegram_id=user.id, username=user.username)
-
-    monkeypatch.setattr(start, "_touch_user", _touch_user)
+async def test_main_menu_callback_handler() -> None:
     callback = FakeCallback(FakeUser(id=5, language_code="en"))
     state = FakeState()
 
+    async def _edit_text(text: str, **kwargs):  # noqa: ANN003
+        # The spinner is dismissed before the screen is redrawn.
+        assert callback.answers
+        callback.message.edits.append((text, kwargs))
+
+    callback.message.edit_text = _edit_text
+
     await start.main_menu_callback_handler(callback, session=FakeSession(), state=state)
 
     assert state.cleared is True
     assert "LeadCore" in callback.message.edits[0][0]
+    assert 5 in start.activity._pending
+    start.activity._pending.clear()
 
 
 @pytest.mark.unit
@@ -150,28 +241,42 @@ async def test_statistics_stub() -> None:
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_touch_user_existing_and_new() -> None:
-    existing = User(telegram_id=100, username="old")
-    session_existing = FakeSession(users={100: existing})
+async def test_touch_user_upserts_in_one_statement() -> None:
+    class _UpsertSession(FakeSession):
+        def __init__(self) -> None:
+            super().__init__()
+            self.statements: list[str] = []
+
+        async def execute(self, stmt):  # noqa: ANN001
+            compiled = stmt.compile(dialect=postgresql.dialect())
+            self.statements.append(str(compiled))
+            params = compiled.params
+            user = User(telegram_id=params["telegram_id"], username=params["username"])
+            return SimpleNamespace(scalar_one=lambda: user)
+
+    session = _UpsertSession()
     tg_user = SimpleNamespace(id=100, username="newname")
 
-    got_existing = await start._touch_user(tg_user, session_existing)
-    assert got_existing.username == "newname"
-    assert session_existing.commits == 1
+    got = await start._touch_user(tg_user, session)
 
-    session_new = FakeSession()
-    tg_new = SimpleNamespace(id=101, username="fresh")
-    got_new = await start._touch_user(tg_new, session_new)
-    assert got_new.telegram_id == 101
-    assert len(session_new.added) == 1
-    assert session_new.commits == 1
+    assert got.telegram_id == 100
+    assert got.username == "newname"
+    assert len(session.statements) == 1
+    assert "ON CONFLICT (telegram_id) DO UPDATE" in session.statements[0]
+    assert "last_active_at = timezone(" in session.statements[0]
+    assert session.commits == 0
 
 
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_continue_onboarding_prompts_profile(monkeypatch) -> None:
     async def _touch_user(user, session):  # noqa: ANN001
-        return User(telegram_id=user.id, username=user.username, services_description=" ")
+        return User(
+            telegram_id=user.id,
+            username=user.username,
+            services_description=" ",
+            has_services_description=False,
+        )
 
     monkeypatch.setattr(start, "_touch_user", _touch_user)
     state = FakeState()
@@ -196,6 +301,7 @@ async def test_continue_onboarding_shows_main_menu(monkeypatch) -> None:
             telegram_id=user.id,
             username=user.username,
             services_description="I do SEO",
+            has_services_description=True,
         )
 
     monkeypatch.setattr(start, "_touch_user", _touch_user)
@@ -241,14 +347,27 @@ async def test_settings_and_edit_services_handlers(monkeypatch) -> None:
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_save_services_description_short_text() -> None:
+    class _CheckedSession(FakeSession):
+        rollbacks = 0
+
+        async def commit(self):
+            raise IntegrityError("UPDATE users", {}, Exception("check violation"))
+
+        async def rollback(self):
+            self.rollbacks += 1
+
+    session = _CheckedSession(users={6: User(telegram_id=6)})
     message = FakeMessage(FakeUser(id=6, language_code="en"), text="short")
     state = FakeState()
+    await state.update_data(profile_flow="settings")
 
-    await start.save_services_description_handler(
-        message, state=state, session=FakeSession()
-    )
+    await start.save_services_description_handler(message, state=state, session=session)
 
+    assert len(message.answers) == 1
     assert "too short" in message.answers[0][0]
+    assert session.rollbacks == 1
+    # The user stays in the input state to try again.
+    assert state.data["profile_flow"] == "settings"
 
 
 @pytest.mark.unit
@@ -273,7 +392,9 @@ async def test_save_services_description_onboarding(monkeypatch) -> None:
     await start.save_services_description_handler(message, state=state, session=session)
 
     assert state.cleared is True
-    assert any("saved" in text for text, _ in message.answers)
+    assert len(message.answers) == 1
+    assert "saved" in message.answers[0][0]
+    assert "reply_markup" in message.answers[0][1]
     assert session.commits == 1
 
 
@@ -299,6 +420,51 @@ async def test_save_services_description_settings_flow(monkeypatch) -> None:
     await start.save_services_description_handler(message, state=state, session=session)
 
     assert state.cleared is True
-    assert message.answers[0][0] == "✅ Services description updated."
-    assert "My Services" in message.answers[1][0]
+    assert len(message.answers) == 1
+    assert message.answers[0][0].startswith("✅ Services description updated.")
+    assert "My Services" in message.answers[0][0]
+    assert session.commits == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_save_services_description_existing_user_single_commit() -> None:
+    existing = User(telegram_id=72, username="old", services_description="old")
+    session = FakeSession(users={72: existing})
+    message = FakeMessage(
+        FakeUser(id=72, username="new", language_code="en"),
+        text="I automate support for shops",
+    )
+    state = FakeState()
+    await state.update_data(profile_flow="settings")
+
+    await start.save_services_description_handler(message, state=state, session=session)
+
+    assert existing.services_description == "I automate support for shops"
+    assert existing.username == "new"
+    assert existing.has_services_description is True
+    assert "timezone" in str(existing.last_active_at)
     assert session.commits == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_dispatch_callback_routes_by_data_with_declared_kwargs(monkeypatch) -> None:
+    seen = {}
+
+    async def _profile(callback, session):  # noqa: ANN001
+        seen["profile"] = (callback.data, session)
+
+    monkeypatch.setitem(start._CALLBACK_HANDLERS, "settings", _profile)
+    monkeypatch.setitem(start._CALLBACK_PARAMS, "settings", ("session",))
+    session = FakeSession()
+    callback = FakeCallback(FakeUser(id=80, language_code="en"), data="settings")
+
+    await start.dispatch_callback(
+        callback, session=session, state=FakeState(), bot=None, event_router=None
+    )
+    assert seen["profile"] == ("settings", session)
+
+    stub = FakeCallback(FakeUser(id=81, language_code="en"), data="statistics")
+    await start.dispatch_callback(stub, session=session, state=FakeState(), bot=None)
+    assert "under development" in stub.answers[-1][0]
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime
 from types import SimpleNamespace
 
@@ -9,9 +10,17 @@ import pytest
 
 from bot.handlers import subscription as sub_h
 from bot.models.user import User
+from bot.services import user_cache
 from tests.unit.handlers.helpers import FakeCallback, FakeMessage, FakeSession, FakeUser
 
 
+@pytest.fixture(autouse=True)
+def _clear_user_cache():
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
+
 @pytest.mark.unit
 def test_render_subscription_text_free_and_paid() -> None:
     free_user = User(telegram_id=1, username="u1", subscription_type="free")
@@ -29,6 +38,17 @@ def test_render_subscription_text_free_and_paid() -> None:
     assert "💚 Paid" in paid_text
 
 
+@pytest.mark.unit
+def test_render_subscription_text_shows_expired_plan_as_free() -> None:
+    expired = User(
+        telegram_id=3,
+        subscription_type="paid",
+        subscription_expires_at=datetime.datetime(2000, 1, 1),
+    )
+
+    assert "🆓 Free" in sub_h._render_subscription_text(expired)
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_subscription_menu_handler_user_not_found() -> None:
@@ -53,7 +73,40 @@ async def test_subscription_menu_handler_success() -> None:
 
     assert callback.message.edits
     assert "💎 Подписка" in callback.message.edits[0][0]
+    assert session.commits == 0
+
+    # A second open within the TTL is served without touching the session.
+    session.users.clear()
+    again = FakeCallback(FakeUser(id=12, language_code="ru"))
+    await sub_h.subscription_menu_handler(again, session=session)
+    assert "💎 Подписка" in again.message.edits[0][0]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_subscription_menu_handler_persists_expired_downgrade() -> None:
+    user = User(
+        telegram_id=17,
+        username="u",
+        subscription_type="paid",
+        subscription_expires_at=datetime.datetime(2000, 1, 1),
+    )
+    callback = FakeCallback(FakeUser(id=17, language_code="ru"))
+    session = FakeSession(users={17: user})
+    executed = []
+
+    async def _execute(query):  # noqa: ANN001
+        executed.append(query)
+
+    session.execute = _execute
+
+    await sub_h.subscription_menu_handler(callback, session=session)
+
+    assert "🆓 Free" in callback.message.edits[0][0]
+    assert len(executed) == 1
+    assert str(executed[0]).startswith("UPDATE users SET subscription_type")
     assert session.commits == 1
+    assert 17 not in user_cache._user_cache
 
 
 @pytest.mark.unit
@@ -68,6 +121,11 @@ async def test_buy_subscription_handler_invalid_period() -> None:
     assert callback.answers[-1][1] is True
     assert "Invalid subscription period" in callback.answers[-1][0]
 
+    # Only the exact suffix after the prefix is a period key.
+    nested = FakeCallback(FakeUser(id=13, language_code="en"), data="buy_sub_x_1m")
+    await sub_h.buy_subscription_handler(nested, session=session)
+    assert "Invalid subscription period" in nested.answers[-1][0]
+
 
 @pytest.mark.unit
 @pytest.mark.asyncio
@@ -109,7 +167,10 @@ async def test_pre_checkout_handler_acks_ok() -> None:
 
     q = _PreCheckout()
     await sub_h.pre_checkout_handler(q)  # type: ignore[arg-type]
+    assert len(sub_h._background_tasks) == 1
+    await asyncio.gather(*sub_h._background_tasks)
     assert q.calls == [True]
+    assert not sub_h._background_tasks
 
 
 @pytest.mark.unit
@@ -126,7 +187,7 @@ async def test_successful_payment_handler_bad_payload() -> None:
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_successful_payment_handler_early_and_validation_paths() -> None:
+async def test_successful_payment_handler_early_and_validation_paths(monkeypatch) -> None:
     message_none = FakeMessage(FakeUser(id=151, language_code="ru"))
     session_none = FakeSession(users={})
     await sub_h.successful_payment_handler(message_none, session=session_none)
@@ -137,15 +198,19 @@ async def test_successful_payment_handler_early_and_validation_paths() -> None:
         invoice_payload="subscription:152:bad"
     )
     await sub_h.successful_payment_handler(message_bad_period, session=FakeSession())
-    assert "период не распознан" in message_bad_period.answers[0][0]
+    assert "payload не распознан" in message_bad_period.answers[0][0]
 
     message_bad_user_id = FakeMessage(FakeUser(id=153, language_code="ru"))
     message_bad_user_id.successful_payment = SimpleNamespace(
         invoice_payload="subscription:not_int:1m"
     )
     await sub_h.successful_payment_handler(message_bad_user_id, session=FakeSession())
-    assert "user_id не распознан" in message_bad_user_id.answers[0][0]
+    assert "payload не распознан" in message_bad_user_id.answers[0][0]
 
+    async def _no_user(session, user_id, period_key):  # noqa: ANN001, ARG001
+        return None
+
+    monkeypatch.setattr(sub_h, "activate_paid_subscription_by_id", _no_user)
     message_no_user = FakeMessage(FakeUser(id=154, language_code="ru"))
     message_no_user.successful_payment = SimpleNamespace(
         invoice_payload="subscription:154:1m"
@@ -157,25 +222,24 @@ async def test_successful_payment_handler_early_and_validation_paths() -> None:
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_successful_payment_handler_success(monkeypatch) -> None:
-    user = User(telegram_id=16, username="u", subscription_type="free")
     message = FakeMessage(FakeUser(id=16, language_code="en"))
     message.successful_payment = SimpleNamespace(
         invoice_payload="subscription:16:1m"
     )
-    session = FakeSession(users={16: user})
+    session = FakeSession()
+    calls = []
 
-    def _activate(u: User, period_key: str) -> datetime.datetime:
-        u.subscription_type = "paid"
-        dt = datetime.datetime(2026, 12, 31, 0, 0, 0)
-        u.subscription_expires_at = dt
-        return dt
+    async def _activate(sess, user_id: int, period_key: str) -> datetime.datetime:  # noqa: ANN001
+        calls.append((sess, user_id, period_key))
+        return datetime.datetime(2026, 12, 31, 0, 0, 0)
 
-    monkeypatch.setattr(sub_h, "activate_paid_subscription", _activate)
+    monkeypatch.setattr(sub_h, "activate_paid_subscription_by_id", _activate)
 
     await sub_h.successful_payment_handler(message, session=session)
 
+    assert calls == [(session, 16, "1m")]
     assert session.commits == 1
-    assert any("Subscription activated" in text for text, _ in message.answers)
+    assert any("31.12.2026" in text for text, _ in message.answers)
 
 
 @pytest.mark.unit
@@ -187,3 +251,18 @@ async def test_subscription_support_handler() -> None:
 
     assert callback.answers[-1][1] is True
     assert "@devcore_dev" in callback.answers[-1][0]
+
+
+@pytest.mark.unit
+def test_subscription_menu_keyboard_is_shared_per_locale() -> None:
+    ru = sub_h._subscription_menu_keyboard("ru")
+    assert sub_h._subscription_menu_keyboard("ru-RU") is ru
+    assert sub_h._subscription_menu_keyboard("en") is not ru
+
+
+@pytest.mark.unit
+def test_period_buttons_precomputed_with_discounts() -> None:
+    texts = {data: text for text, data in sub_h._PERIOD_BUTTONS}
+    assert list(texts) == ["buy_sub_1m", "buy_sub_3m", "buy_sub_6m", "buy_sub_12m"]
+    assert "%" not in texts["buy_sub_1m"]
+    assert texts["buy_sub_3m"].endswith("(-20%)")
@@ -2,8 +2,11 @@
 
 from __future__ import annotations
 
+from types import SimpleNamespace
+
 import pytest
 
+from modules import content_generator
 from modules.content_generator import anonymize_quotes, _parse_llm_json, _render_prompt
 
 
@@ -64,3 +67,41 @@ def test_render_prompt_replaces_known_placeholders_only() -> None:
     assert "name=Cluster 1" in rendered
     assert "count=3" in rendered
     assert "raw_json={\"k\":\"v\"}" in rendered
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_generate_post_reuses_passed_cluster(monkeypatch) -> None:
+    class _Session:
+        def __init__(self) -> None:
+            self.added: list[object] = []
+
+        async def get(self, *_args):  # noqa: ANN002
+            raise AssertionError("cluster must not be reloaded")
+
+        async def execute(self, _query):  # noqa: ANN001
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: []))
+
+        def add(self, obj):  # noqa: ANN001
+            self.added.append(obj)
+
+        async def commit(self) -> None:
+            return None
+
+        async def refresh(self, _obj) -> None:  # noqa: ANN001
+            return None
+
+    class _Llm:
+        async def ainvoke(self, _messages):  # noqa: ANN001
+            return SimpleNamespace(content='{"title":"T","body":"B"}')
+
+    monkeypatch.setattr(content_generator, "_llm", _Llm())
+    monkeypatch.setattr(content_generator, "_load_prompt", lambda: "{cluster_name}")
+    cluster = SimpleNamespace(
+        user_id=1, name="C", description="D", pain_count=2, post_generated=False
+    )
+
+    post = await content_generator.generate_post(3, _Session(), cluster=cluster)
+
+    assert post.title == "T"
+    assert cluster.post_generated is True
@@ -0,0 +1,63 @@
+"""Unit tests for batched user activity stamps."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from bot.services import activity
+
+
+class _Session:
+    def __init__(self) -> None:
+        self.calls: list[object] = []
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):  # noqa: ANN002
+        return False
+
+    async def execute(self, stmt):  # noqa: ANN001
+        self.calls.append(stmt)
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture(autouse=True)
+def _clear_pending():
+    activity._pending.clear()
+    yield
+    activity._pending.clear()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_flush_coalesces_users_into_one_update(monkeypatch) -> None:
+    session = _Session()
+    monkeypatch.setattr(activity, "async_session", lambda: session)
+
+    activity.mark_active(1)
+    activity.mark_active(2)
+    activity.mark_active(1)
+
+    assert await activity.flush() == 2
+    assert len(session.calls) == 1
+    compiled = session.calls[0].compile(dialect=postgresql.dialect())
+    assert sorted(compiled.params["telegram_id_1"]) == [1, 2]
+    assert "last_active_at=timezone(" in str(compiled)
+    assert session.commits == 1
+    assert activity._pending == set()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_flush_without_pending_skips_db(monkeypatch) -> None:
+    def _fail():
+        raise AssertionError("session should not be opened")
+
+    monkeypatch.setattr(activity, "async_session", _fail)
+
+    assert await activity.flush() == 0
@@ -0,0 +1,71 @@
+"""Unit tests for the per-user program IDs cache."""
+
+from __future__ import annotations
+
+import pytest
+
+from bot.services import program_cache
+
+
+class _Result:
+    def __init__(self, rows):  # noqa: ANN001
+        self._rows = rows
+
+    def all(self):
+        return list(self._rows)
+
+
+class _Session:
+    def __init__(self, ids: list[int]) -> None:
+        self.ids = ids
+        self.execute_calls = 0
+
+    async def execute(self, _query):  # noqa: ANN001
+        self.execute_calls += 1
+        return _Result([(i,) for i in self.ids])
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    program_cache.clear()
+    yield
+    program_cache.clear()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_get_program_ids_reuses_cached_result() -> None:
+    session = _Session([1, 2])
+
+    first = await program_cache.get_program_ids(7, session)
+    second = await program_cache.get_program_ids(7, session)
+
+    assert first == second == [1, 2]
+    assert session.execute_calls == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_invalidate_forces_reload() -> None:
+    session = _Session([1])
+    await program_cache.get_program_ids(7, session)
+
+    program_cache.invalidate(7)
+    session.ids = [1, 3]
+
+    assert await program_cache.get_program_ids(7, session) == [1, 3]
+    assert session.execute_calls == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_cache_expires_after_ttl(monkeypatch) -> None:
+    clock = {"now": 100.0}
+    monkeypatch.setattr(program_cache.time, "monotonic", lambda: clock["now"])
+    session = _Session([1])
+
+    await program_cache.get_program_ids(7, session)
+    clock["now"] += program_cache.PROGRAM_IDS_TTL + 1
+    await program_cache.get_program_ids(7, session)
+
+    assert session.execute_calls == 2
@@ -135,6 +135,10 @@ class _FakeSession:
         for criterion in getattr(query, "_where_criteria", []):
             left = getattr(criterion, "left", None)
             right = getattr(criterion, "right", None)
+            # Unwrap lower(column) comparisons.
+            clauses = getattr(left, "clauses", None)
+            if clauses is not None:
+                left = next(iter(clauses), None)
             if getattr(left, "name", None) != column_name:
                 continue
             return getattr(right, "value", None)
@@ -497,3 +501,11 @@ async def test_save_pains_from_lead_skips_existing(user_factory) -> None:
     )
 
     assert inserted == 0
+
+
+@pytest.mark.unit
+def test_lead_username_is_stored_case_folded() -> None:
+    lead = Lead(telegram_username="@Alice")
+
+    assert lead.telegram_username == "alice"
+    assert Lead.normalize_username("@Alice") == "alice"
@@ -0,0 +1,42 @@
+"""Unit tests for program lookup helpers."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from bot.services import programs
+
+
+class _GetSession:
+    def __init__(self, program) -> None:  # noqa: ANN001
+        self.program = program
+        self.calls: list[dict] = []
+
+    async def get(self, _model, key, options=None, populate_existing=False):  # noqa: ANN001
+        self.calls.append({"options": options, "populate_existing": populate_existing})
+        return self.program if key == self.program.id else None
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_get_owned_program_checks_owner() -> None:
+    program = SimpleNamespace(id=5, user_id=7)
+    session = _GetSession(program)
+
+    assert await programs.get_owned_program(session, 5, 7) is program
+    assert await programs.get_owned_program(session, 5, 8) is None
+    assert await programs.get_owned_program(session, 6, 7) is None
+    assert all(not call["populate_existing"] for call in session.calls)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_get_owned_program_repopulates_when_options_given() -> None:
+    session = _GetSession(SimpleNamespace(id=5, user_id=7))
+    options = [object()]
+
+    await programs.get_owned_program(session, 5, 7, options=options)
+
+    assert session.calls == [{"options": options, "populate_existing": True}]
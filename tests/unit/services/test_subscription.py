@@ -3,28 +3,22 @@
 from __future__ import annotations
 
 import datetime
+from types import SimpleNamespace
 
 import pytest
+from sqlalchemy.dialects import postgresql
 
 from bot.services import subscription as sub
 
 
-class _ScalarResult:
-    def __init__(self, value: int) -> None:
-        self._value = value
-
-    def scalar_one(self) -> int:
-        return self._value
-
-
 class _FakeSession:
     def __init__(self, count: int) -> None:
         self.count = count
         self.execute_calls = 0
 
-    async def execute(self, _query):  # noqa: ANN001
+    async def scalar(self, _query):  # noqa: ANN001
         self.execute_calls += 1
-        return _ScalarResult(self.count)
+        return self.count
 
 
 @pytest.mark.unit
@@ -35,7 +29,7 @@ def test_normalize_subscription_expires_paid_user(user_factory) -> None:
         subscription_expires_at=now - datetime.timedelta(minutes=1),
     )
 
-    sub.normalize_subscription(user)
+    assert sub.normalize_subscription(user) is True
 
     assert user.subscription_type == "free"
     assert user.subscription_expires_at is None
@@ -52,7 +46,7 @@ def test_normalize_subscription_keeps_active_paid_user(
         subscription_expires_at=now + datetime.timedelta(days=1),
     )
 
-    sub.normalize_subscription(user)
+    assert sub.normalize_subscription(user) is False
 
     assert user.subscription_type == "paid"
     assert user.subscription_expires_at is not None
@@ -217,3 +211,38 @@ def test_activate_paid_subscription_extends_from_current_expiry(
 
     assert expiry == datetime.datetime(2026, 9, 15, 9, 0, 0)
     assert user.subscription_expires_at == expiry
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_activate_paid_subscription_by_id_single_update_returning() -> None:
+    expiry = datetime.datetime(2026, 9, 15, 9, 0, 0)
+    statements: list[str] = []
+
+    class _Session:
+        async def execute(self, stmt):  # noqa: ANN001
+            statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+            return SimpleNamespace(scalar_one_or_none=lambda: expiry)
+
+    got = await sub.activate_paid_subscription_by_id(_Session(), 16, "3m")
+
+    assert got == expiry
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE users SET")
+    assert "RETURNING users.subscription_expires_at" in statements[0]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_downgrade_expired_subscription_rechecks_expiry_in_sql() -> None:
+    statements: list[str] = []
+
+    class _Session:
+        async def execute(self, stmt):  # noqa: ANN001
+            statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+
+    await sub.downgrade_expired_subscription(_Session(), 16)
+
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE users SET subscription_type")
+    assert "users.subscription_expires_at <= timezone(" in statements[0]
@@ -0,0 +1,53 @@
+"""Unit tests for the flood-control aware send helper."""
+
+from __future__ import annotations
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot.services import telegram_send
+
+
+def _retry_after(seconds: int) -> TelegramRetryAfter:
+    method = SendMessage(chat_id=1, text="x")
+    return TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=seconds)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_send_with_retry_waits_out_flood_control(monkeypatch) -> None:
+    sleeps: list[float] = []
+
+    async def _sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    monkeypatch.setattr(telegram_send.asyncio, "sleep", _sleep)
+    calls = []
+
+    async def _send(text: str, **kwargs):  # noqa: ANN003
+        calls.append((text, kwargs))
+        if len(calls) == 1:
+            raise _retry_after(2)
+        return "sent"
+
+    result = await telegram_send.send_with_retry(_send, "hi", reply_markup=None)
+
+    assert result == "sent"
+    assert len(calls) == 2
+    assert len(sleeps) == 1 and 2 <= sleeps[0] <= 2.2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_send_with_retry_gives_up_after_max_attempts(monkeypatch) -> None:
+    async def _sleep(delay: float) -> None:  # noqa: ARG001
+        return None
+
+    monkeypatch.setattr(telegram_send.asyncio, "sleep", _sleep)
+
+    async def _send(text: str):  # noqa: ARG001
+        raise _retry_after(1)
+
+    with pytest.raises(TelegramRetryAfter):
+        await telegram_send.send_with_retry(_send, "hi", max_attempts=2)
@@ -0,0 +1,61 @@
+"""Unit tests for the subscription-menu user cache."""
+
+from __future__ import annotations
+
+import pytest
+
+from bot.models.user import User
+from bot.services import user_cache
+
+
+class _Session:
+    def __init__(self, users: dict[int, User]) -> None:
+        self.users = users
+        self.get_calls = 0
+
+    async def get(self, _model, key):  # noqa: ANN001
+        self.get_calls += 1
+        return self.users.get(key)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_get_user_returns_cached_snapshot_within_ttl(monkeypatch) -> None:
+    clock = {"now": 100.0}
+    monkeypatch.setattr(user_cache.time, "monotonic", lambda: clock["now"])
+    row = User(telegram_id=7, username="u", subscription_type="paid")
+    session = _Session({7: row})
+
+    first = await user_cache.get_user(session, 7)
+    second = await user_cache.get_user(session, 7)
+
+    assert first is second
+    assert first is not row
+    assert first.subscription_type == "paid"
+    assert session.get_calls == 1
+
+    clock["now"] += user_cache.USER_TTL + 1
+    await user_cache.get_user(session, 7)
+    assert session.get_calls == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_invalidate_and_missing_users_are_not_cached() -> None:
+    session = _Session({})
+
+    assert await user_cache.get_user(session, 8) is None
+    session.users[8] = User(telegram_id=8, subscription_type="free")
+    assert (await user_cache.get_user(session, 8)).subscription_type == "free"
+
+    session.users[8] = User(telegram_id=8, subscription_type="paid")
+    user_cache.invalidate(8)
+    assert (await user_cache.get_user(session, 8)).subscription_type == "paid"
+    assert session.get_calls == 3